@@ -0,0 +1,155 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from instrumentation import Instrumentation
+from main import AnimeAnalyzer, generate_report
+from rendering import RenderCache, render_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class ReportConfig(NamedTuple):
+    name: str
+    min_anime_count: int = 10
+    top_n_genres: int = 5
+    side_min_count: int = 3
+    types: Optional[Tuple[str, ...]] = None  # None keeps every type
+
+
+def config_name(min_anime_count: int, top_n_genres: int, side_min_count: int,
+                types: Optional[Tuple[str, ...]]) -> str:
+    """Folder name for a configuration that was not given one"""
+    name = f"min{min_anime_count}_top{top_n_genres}_side{side_min_count}"
+    return f"{name}_{'-'.join(types)}" if types else name
+
+
+def parse_configs(entries: List[dict]) -> List[ReportConfig]:
+    """Build report configurations from JSON objects, rejecting duplicate folder names"""
+    configs = []
+    for entry in entries:
+        unknown = set(entry) - set(ReportConfig._fields)
+        if unknown:
+            raise ValueError(f"Unknown report config keys: {', '.join(sorted(unknown))}")
+
+        # A single type may be given as a plain string, which must not be iterated character by character
+        types = entry.get('types')
+        if isinstance(types, str):
+            types = [types]
+        elif types is not None and not (isinstance(types, list) and all(isinstance(t, str) for t in types)):
+            raise ValueError(f"Report config types must be a type name or a list of them, not {types!r}")
+        types = tuple(sorted(types)) if types else None
+        values = {
+            'min_anime_count': int(entry.get('min_anime_count', 10)),
+            'top_n_genres': int(entry.get('top_n_genres', 5)),
+            'side_min_count': int(entry.get('side_min_count', 3)),
+            'types': types,
+        }
+        configs.append(ReportConfig(name=entry.get('name') or config_name(**values), **values))
+
+    names = [config.name for config in configs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate report config names: {', '.join(duplicates)}")
+    return configs
+
+
+def load_configs(path: str) -> List[ReportConfig]:
+    """Read a JSON list of report configurations"""
+    with open(path, encoding='utf-8') as f:
+        return parse_configs(json.load(f))
+
+
+def run_batch(analyzer: AnimeAnalyzer, configs: List[ReportConfig], output_dir: str,
+              render_workers: Optional[int] = None, render_cache: Optional[RenderCache] = None,
+              analysis_workers: Optional[int] = 1) -> Dict[str, str]:
+    """Write one report per configuration from an already loaded analyzer
+
+    The dataset is indexed once per distinct type subset; configurations that
+    share a subset only re-filter its genre statistics. All charts and tables
+    are rendered in a single pool at the end. Returns {config name: folder}.
+    """
+    views: Dict[Optional[Tuple[str, ...]], AnimeAnalyzer] = {None: analyzer}
+    folders = {}
+    render_queue = []
+
+    for config in configs:
+        try:
+            view = views.get(config.types)
+            if view is None:
+                mask = analyzer.type_mask(list(config.types))
+                if not mask.any():
+                    logger.error(f"No anime of type {', '.join(config.types)}, skipping {config.name}")
+                    continue
+                with analyzer.tracer.stage('subset', rows_in=analyzer.anime_count,
+                                           types=list(config.types)) as span:
+                    view = views[config.types] = analyzer.subset(mask)
+                    span['rows_out'] = view.anime_count
+
+            with analyzer.tracer.stage('report', rows_in=view.anime_count, config=config.name):
+                view.analyze_genres(min_anime_count=config.min_anime_count)
+                folder = os.path.join(output_dir, config.name)
+                render_queue.extend(generate_report(view, folder, top_n_genres=config.top_n_genres,
+                                                    side_min_count=config.side_min_count,
+                                                    analysis_workers=analysis_workers))
+            folders[config.name] = folder
+            logger.info(f"Report {config.name} written to {folder}")
+
+        except Exception as e:
+            logger.error(f"Error generating report {config.name}: {e}")
+
+    with analyzer.tracer.stage('render_all', category='render_pool', rows_in=len(render_queue),
+                               workers=render_workers):
+        render_failures = render_jobs(render_queue, workers=render_workers, tracer=analyzer.tracer,
+                                      cache=render_cache)
+    if render_failures:
+        print(f"⚠️ {len(render_failures)} görsel oluşturulamadı:")
+        for job, error in render_failures:
+            print(f"   - {job.filename}: {error}")
+
+    return folders
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate several anime genre reports from one dataset load')
+    parser.add_argument('configs', help='JSON list of report configs: name, min_anime_count, top_n_genres, '
+                                        'side_min_count, types')
+    parser.add_argument('--data', default='./dataset/anime.csv', help='Path to anime.csv')
+    parser.add_argument('--output-dir', default=None,
+                        help='Parent folder of the per-config reports (default: ./anime_analysis_batch_<timestamp>)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Worker processes for the per-genre sections and for rendering')
+    parser.add_argument('--render-cache', default='./.render_cache',
+                        help='Folder of previously rendered images to reuse, empty to disable')
+    parser.add_argument('--render-cache-mb', type=int, default=512, help='Render cache size limit in MB')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore the on-disk dataset cache')
+    parser.add_argument('--trace', action='store_true', help='Write trace.jsonl / trace.json into the output folder')
+    args = parser.parse_args()
+
+    try:
+        configs = load_configs(args.configs)
+    except (OSError, ValueError) as e:
+        print(f"❌ Rapor yapılandırmaları okunamadı: {e}")
+        sys.exit(1)
+
+    tracer = Instrumentation(enabled=args.trace)
+    tracer.start()
+    analyzer = AnimeAnalyzer(args.data, use_cache=not args.no_cache, tracer=tracer)
+    if not analyzer.load_and_clean_data():
+        print("❌ Veri yüklenirken hata oluştu. Lütfen dosya yolunu kontrol edin.")
+        sys.exit(1)
+
+    output_dir = args.output_dir or f"./anime_analysis_batch_{analyzer.analysis_time}"
+    render_cache = RenderCache(args.render_cache, args.render_cache_mb * 2 ** 20) if args.render_cache else None
+    folders = run_batch(analyzer, configs, output_dir, render_workers=args.workers, render_cache=render_cache,
+                        analysis_workers=args.workers)
+    tracer.write(output_dir)
+
+    print(f"\n✅ {len(folders)}/{len(configs)} rapor oluşturuldu: {output_dir}")
+    for name, folder in folders.items():
+        print(f"   📁 {name}: {folder}")
+    if len(folders) < len(configs):
+        sys.exit(1)
@@ -0,0 +1,319 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import Instrumentation
+
+# Genre names and relative frequencies roughly shaped like the Kaggle anime.csv
+GENRE_WEIGHTS = {
+    'Comedy': 4645, 'Action': 2845, 'Adventure': 2348, 'Fantasy': 2309, 'Sci-Fi': 2070, 'Drama': 2016,
+    'Shounen': 1712, 'Kids': 1609, 'Romance': 1464, 'School': 1220, 'Slice of Life': 1220, 'Hentai': 1141,
+    'Supernatural': 1037, 'Mecha': 944, 'Music': 860, 'Historical': 806, 'Magic': 778, 'Ecchi': 637,
+    'Shoujo': 603, 'Seinen': 547, 'Sports': 543, 'Mystery': 495, 'Super Power': 465, 'Military': 426,
+    'Parody': 408, 'Space': 381, 'Horror': 369, 'Harem': 317, 'Demons': 294, 'Martial Arts': 265,
+    'Dementia': 240, 'Psychological': 229, 'Police': 197, 'Game': 181, 'Samurai': 148, 'Vampire': 102,
+    'Thriller': 87, 'Cars': 72, 'Shounen Ai': 65, 'Shoujo Ai': 55, 'Josei': 54, 'Yuri': 42, 'Yaoi': 39,
+}
+
+TYPE_WEIGHTS = {'TV': 3787, 'OVA': 3311, 'Movie': 2348, 'Special': 1676, 'ONA': 659, 'Music': 488}
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+
+# Span fields kept per stage in the results
+SPAN_METRICS = ('wall_s', 'cpu_s', 'peak_rss_mb', 'rss_delta_mb', 'traced_peak_mb')
+
+STAGES = ['load_and_clean_data', 'expand_genres', 'analyze_genres', 'get_top_anime_for_genre',
+          'analyze_side_genres', 'render_charts', 'write_report']
+
+GENERATOR_CHUNK_ROWS = 250_000
+
+# Shape of the Kaggle rating.csv: 7,813,737 rows from 73,515 users, about 19% of them -1 (watched, unrated)
+USER_RATING_ROWS = 7_813_737
+RATINGS_PER_USER = 106
+UNRATED_SHARE = 0.19
+
+
+def parse_size(size: str) -> int:
+    return SIZES[size] if size in SIZES else int(size)
+
+
+def generate_catalog(path: str, rows: int, seed: int = 0):
+    """Write an anime.csv-shaped synthetic catalog with realistic genre multiplicity"""
+    rng = np.random.default_rng(seed)
+    genres = np.array(sorted(GENRE_WEIGHTS), dtype=object)
+    log_weights = np.log(np.array([GENRE_WEIGHTS[g] for g in genres], dtype=np.float64))
+    types = np.array(list(TYPE_WEIGHTS), dtype=object)
+    type_p = np.array(list(TYPE_WEIGHTS.values()), dtype=np.float64)
+    type_p /= type_p.sum()
+
+    first = True
+    for start in range(0, rows, GENERATOR_CHUNK_ROWS):
+        n = min(GENERATOR_CHUNK_ROWS, rows - start)
+
+        # Titles carry 1-13 genres, about 3 on average; weighted sampling without
+        # replacement via the Gumbel top-k trick
+        counts = np.clip(rng.poisson(2.0, n) + 1, 1, 13)
+        keys = log_weights + rng.gumbel(size=(n, len(genres)))
+        ranks = np.argsort(np.argsort(-keys, axis=1), axis=1)
+        membership = ranks < counts[:, None]
+
+        row_ids, codes = np.nonzero(membership)
+        genre_col = pd.Series(genres[codes]).groupby(row_ids).agg(', '.join).to_numpy()
+
+        # Titles with more genres tend to be rated a little higher, as in the real data
+        rating = np.clip(rng.normal(6.2 + 0.12 * counts, 0.95), 1.0, 10.0).round(2).astype(object)
+        rating[rng.random(n) < 0.02] = ''
+        episodes = rng.geometric(0.06, n).astype(object)
+        episodes[rng.random(n) < 0.03] = 'Unknown'
+
+        chunk = pd.DataFrame({
+            'anime_id': np.arange(start, start + n) + 1,
+            'name': [f"Synthetic Anime {i}" for i in range(start + 1, start + n + 1)],
+            'genre': genre_col,
+            'type': rng.choice(types, n, p=type_p),
+            'episodes': episodes,
+            'rating': rating,
+            'members': np.rint(rng.lognormal(7.5, 2.0, n)).astype(np.int64),
+        })
+        chunk.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+        first = False
+
+
+def generate_user_ratings(path: str, rows: int, catalog_rows: int, seed: int = 0):
+    """Write a rating.csv-shaped file of user scores for a synthetic catalog with anime_id 1..catalog_rows
+
+    Users come in ascending id order, popular anime are rated far more often
+    (Zipf-like), scores cluster around 8 and a share of the rows is -1.
+    """
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, catalog_rows + 1) ** 0.9
+    popularity /= popularity.sum()
+    # Popularity ranks are shuffled over the ids, so anime_id says nothing about popularity
+    ids_by_popularity = rng.permutation(catalog_rows) + 1
+    users = max(1, rows // RATINGS_PER_USER)
+
+    first = True
+    for start in range(0, rows, GENERATOR_CHUNK_ROWS):
+        n = min(GENERATOR_CHUNK_ROWS, rows - start)
+        anime_id = ids_by_popularity[rng.choice(catalog_rows, n, p=popularity)]
+        # A few ratings point at anime missing from the catalog, as in the Kaggle files
+        anime_id[rng.random(n) < 0.001] = catalog_rows + 1 + rng.integers(0, 1000)
+        rating = np.clip(np.rint(rng.normal(7.8, 1.6, n)), 1, 10).astype(np.int8)
+        rating[rng.random(n) < UNRATED_SHARE] = -1
+
+        chunk = pd.DataFrame({
+            'user_id': np.arange(start, start + n) * users // rows + 1,
+            'anime_id': anime_id,
+            'rating': rating,
+        })
+        chunk.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+        first = False
+
+
+def run_user_ratings(catalog_path: str, ratings_path: str, trace_memory: bool = False) -> dict:
+    """Time the chunked rating.csv ingestion and the per-genre user score tables"""
+    from main import AnimeAnalyzer
+
+    timer = Instrumentation(trace_memory=trace_memory)
+    timer.start()
+    analyzer = AnimeAnalyzer(catalog_path, use_cache=False)
+    with timer.stage('load_and_clean_data'):
+        if not analyzer.load_and_clean_data():
+            raise RuntimeError(f"Could not load {catalog_path}")
+
+    with timer.stage('load_user_ratings'):
+        if not analyzer.load_user_ratings(ratings_path):
+            raise RuntimeError(f"Could not load {ratings_path}")
+    with timer.stage('user_genre_summary'):
+        analyzer.user_genre_summary()
+        for genre in analyzer.genre_vocab[:5]:
+            analyzer.user_side_genres(genre)
+
+    timer.stop()
+    stages = {span['name']: {key: span.get(key) for key in SPAN_METRICS if span.get(key) is not None}
+              for span in timer.spans}
+    return {'rows': analyzer.user_ratings.rows_read, 'stages': stages}
+
+
+def run_pipeline(data_path: str, trace_memory: bool = False, top_n_genres: int = 5) -> dict:
+    """Run every stage of the report pipeline once and time it"""
+    from main import AnimeAnalyzer
+    from rendering import bar_chart_job, render_jobs, table_image_job
+
+    timer = Instrumentation(trace_memory=trace_memory)
+    timer.start()
+    analyzer = AnimeAnalyzer(data_path, use_cache=False)
+
+    with timer.stage('load_and_clean_data'):
+        if not analyzer.load_and_clean_data():
+            raise RuntimeError(f"Could not load {data_path}")
+    with timer.stage('expand_genres'):
+        analyzer.expand_genres()
+    with timer.stage('analyze_genres'):
+        analyzer.analyze_genres()
+
+    genres = analyzer.top_genres[:top_n_genres]
+    with timer.stage('get_top_anime_for_genre'):
+        top_anime = {genre: analyzer.get_top_anime_for_genre(genre) for genre in genres}
+    with timer.stage('analyze_side_genres'):
+        side_genres = {genre: analyzer.analyze_side_genres(genre, min_count=3) for genre in genres}
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        jobs = [bar_chart_job(analyzer.genre_summary.head(top_n_genres).reset_index(), 'Top genres',
+                              os.path.join(output_dir, 'top_genres.png'), 'Genre', 'Rating')]
+        for i, genre in enumerate(genres):
+            jobs.append(table_image_job(top_anime[genre], genre, os.path.join(output_dir, f'top_{i}.png')))
+            jobs.append(bar_chart_job(side_genres[genre], genre, os.path.join(output_dir, f'side_{i}.png'),
+                                      'Genre', 'Rating'))
+        with timer.stage('render_charts'):
+            render_jobs(jobs)
+
+        with timer.stage('write_report'):
+            sections = [analyzer.dataframe_to_markdown_table(analyzer.genre_summary.reset_index())]
+            for genre in genres:
+                sections.append(analyzer.dataframe_to_markdown_table(top_anime[genre]))
+                sections.append(analyzer.dataframe_to_markdown_table(side_genres[genre]))
+            analyzer.save_to_file("\n\n".join(sections), 'report.md', output_dir)
+
+    timer.stop()
+    stages = {span['name']: {key: span.get(key) for key in SPAN_METRICS if span.get(key) is not None}
+              for span in timer.spans}
+    return {'rows': analyzer.anime_count, 'stages': stages}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(sizes: List[str], data_dir: str, seed: int, trace_memory: bool) -> dict:
+    """Benchmark each catalog size in a fresh interpreter so peak memory is per size"""
+    os.makedirs(data_dir, exist_ok=True)
+    results = {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+        'runs': [],
+    }
+
+    for size in sizes:
+        rows = parse_size(size)
+        path = os.path.join(data_dir, f'anime_{size}_seed{seed}.csv')
+        if not os.path.exists(path):
+            print(f"⏳ {size} satırlık sentetik katalog oluşturuluyor: {path}")
+            generate_catalog(path, rows, seed)
+
+        print(f"⏱️ {size} ölçülüyor...")
+        command = [sys.executable, os.path.abspath(__file__), '--run-one', path]
+        if trace_memory:
+            command.append('--trace-memory')
+        completed = subprocess.run(command, capture_output=True, text=True, check=True)
+        run = json.loads(completed.stdout.strip().splitlines()[-1])
+        run['size'] = size
+        results['runs'].append(run)
+
+        for stage in STAGES:
+            stats = run['stages'].get(stage, {})
+            print(f"   {stage:<26} {stats.get('wall_s', float('nan')):>9.3f}s  "
+                  f"peak RSS {stats.get('peak_rss_mb')} MB, RSS change {stats.get('rss_delta_mb')} MB")
+
+    return results
+
+
+def run_user_ratings_benchmark(rows: int, data_dir: str, seed: int, trace_memory: bool) -> dict:
+    """Benchmark rating.csv ingestion against a synthetic 10k catalog, in a fresh interpreter"""
+    os.makedirs(data_dir, exist_ok=True)
+    catalog_path = os.path.join(data_dir, f'anime_10k_seed{seed}.csv')
+    if not os.path.exists(catalog_path):
+        print(f"⏳ 10k satırlık sentetik katalog oluşturuluyor: {catalog_path}")
+        generate_catalog(catalog_path, SIZES['10k'], seed)
+    ratings_path = os.path.join(data_dir, f'rating_{rows}_seed{seed}.csv')
+    if not os.path.exists(ratings_path):
+        print(f"⏳ {rows} satırlık sentetik kullanıcı puanı dosyası oluşturuluyor: {ratings_path}")
+        generate_user_ratings(ratings_path, rows, SIZES['10k'], seed)
+
+    print(f"⏱️ {rows} kullanıcı puanı ölçülüyor...")
+    command = [sys.executable, os.path.abspath(__file__), '--run-ratings', catalog_path, ratings_path]
+    if trace_memory:
+        command.append('--trace-memory')
+    completed = subprocess.run(command, capture_output=True, text=True, check=True)
+    run = json.loads(completed.stdout.strip().splitlines()[-1])
+    run['size'] = f'ratings_{rows}'
+
+    for stage, stats in run['stages'].items():
+        print(f"   {stage:<26} {stats.get('wall_s', float('nan')):>9.3f}s  "
+              f"peak RSS {stats.get('peak_rss_mb')} MB, RSS change {stats.get('rss_delta_mb')} MB")
+    return run
+
+
+def compare(current: dict, baseline: dict):
+    """Print per-stage time ratios against a previous results file"""
+    previous = {run['size']: run for run in baseline['runs']}
+    print(f"\nKarşılaştırma: {baseline.get('revision')} → {current.get('revision')}")
+    for run in current['runs']:
+        if run['size'] not in previous:
+            continue
+        print(f"  {run['size']}:")
+        for stage in STAGES:
+            new = run['stages'].get(stage, {}).get('wall_s')
+            old = previous[run['size']]['stages'].get(stage, {}).get('wall_s')
+            if new and old:
+                print(f"    {stage:<26} {old:>9.3f}s → {new:>9.3f}s  ({new / old:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the AnimeAnalyzer pipeline on synthetic catalogs')
+    parser.add_argument('--sizes', default='10k,1M,10M', help='Comma separated sizes: 10k, 100k, 1M, 10M or row counts')
+    parser.add_argument('--data-dir', default='./bench_data', help='Where synthetic catalogs are generated and reused')
+    parser.add_argument('--output', default=None, help='Results JSON path (default: bench_results/<timestamp>.json)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace-memory', action='store_true', help='Also record tracemalloc peaks (slower)')
+    parser.add_argument('--compare', default=None, help='Previous results JSON to compare against')
+    parser.add_argument('--user-ratings', type=int, nargs='?', const=USER_RATING_ROWS, default=None,
+                        help=f'Also benchmark rating.csv ingestion with this many synthetic user ratings '
+                             f'(default {USER_RATING_ROWS}, the size of the Kaggle file)')
+    parser.add_argument('--run-one', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--run-ratings', nargs=2, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(run_pipeline(args.run_one, args.trace_memory)))
+        sys.exit(0)
+    if args.run_ratings:
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(run_user_ratings(*args.run_ratings, trace_memory=args.trace_memory)))
+        sys.exit(0)
+
+    results = run_benchmarks([size.strip() for size in args.sizes.split(',') if size.strip()],
+                             args.data_dir, args.seed, args.trace_memory)
+    if args.user_ratings:
+        results['user_ratings'] = run_user_ratings_benchmark(args.user_ratings, args.data_dir, args.seed,
+                                                             args.trace_memory)
+
+    output = args.output or os.path.join('bench_results', f"bench_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"📄 Sonuçlar kaydedildi: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
@@ -0,0 +1,316 @@
+import codecs
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from genre_index import GenreLists
+from name_index import NameIndex
+
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+# Columns parsed straight into their final dtype by read_csv
+READ_DTYPES = {
+    'anime_id': 'int32',
+    'type': 'category',
+}
+
+# Columns that may hold placeholders such as 'Unknown' and are coerced after parsing
+NUMERIC_DTYPES = {
+    'rating': 'float32',
+    'episodes': 'Int32',
+    'members': 'Int32',
+}
+
+CACHE_VERSION = 3
+STRING_SEPARATOR = '\x1f'
+# What follows the source file's stem in a cache entry name: see file_fingerprint()
+FINGERPRINT_PATTERN = re.compile(r'[0-9a-f]{16}_\d+')
+
+
+def detect_encoding(file_path: str, sample_bytes: int = ENCODING_SAMPLE_BYTES) -> str:
+    """Pick the first encoding that decodes a sample from the start of the file"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_bytes)
+
+    for encoding in ENCODINGS:
+        try:
+            # Not final: the sample may end in the middle of a multi-byte character
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+
+    return ENCODINGS[-1]
+
+
+def read_anime_csv(file_path: str) -> pd.DataFrame:
+    """Read anime.csv with explicit dtypes"""
+    encoding = detect_encoding(file_path)
+
+    try:
+        df = pd.read_csv(file_path, sep=',', encoding=encoding, dtype=READ_DTYPES)
+    except UnicodeDecodeError:
+        # Bytes past the sample did not match; latin-1 decodes anything
+        logger.warning(f"Encoding {encoding} failed past the sample, retrying with latin-1")
+        encoding = 'latin-1'
+        df = pd.read_csv(file_path, sep=',', encoding=encoding, dtype=READ_DTYPES)
+
+    logger.info(f"Dataset loaded successfully with encoding: {encoding}")
+    return coerce_numeric_columns(df)
+
+
+def iter_anime_csv(file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Read anime.csv in typed chunks of at most chunk_size rows"""
+    encoding = detect_encoding(file_path)
+    logger.info(f"Streaming dataset with encoding: {encoding}, {chunk_size} rows per chunk")
+
+    with pd.read_csv(file_path, sep=',', encoding=encoding, dtype=READ_DTYPES, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield coerce_numeric_columns(chunk)
+
+
+def coerce_numeric_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert numeric columns to their target dtype, turning placeholders into NA"""
+    for col, dtype in NUMERIC_DTYPES.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    return df
+
+
+def parse_genres(genre_col: pd.Series) -> GenreLists:
+    """Parse the comma separated genre column into genre lists with a sorted vocabulary
+
+    A catalog repeats a few thousand distinct genre strings over all its rows,
+    so each distinct string is split once and the rows take its genre codes.
+    """
+    string_codes, strings = pd.factorize(genre_col.astype(str), sort=False)
+
+    entry_strings, entry_names = [], []
+    for position, string in enumerate(strings):
+        for genre in string.split(','):
+            genre = genre.strip()
+            if genre and genre.lower() != 'nan':
+                entry_strings.append(position)
+                entry_names.append(genre)
+
+    vocab = sorted(set(entry_names))
+    codes = {genre: code for code, genre in enumerate(vocab)}
+    entry_codes = np.fromiter((codes[genre] for genre in entry_names), dtype=np.int64, count=len(entry_names))
+    by_string = GenreLists.from_codes(vocab, np.asarray(entry_strings, dtype=np.int64), entry_codes, len(strings))
+    return by_string.take(string_codes)
+
+
+def clean_anime_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, GenreLists]:
+    """Drop unusable rows and parse genres into compact genre lists
+
+    Returns the cleaned frame with a positional index and the genre lists
+    aligned with the frame's rows.
+    """
+    # Check if essential columns exist
+    essential_cols = ['rating', 'genre', 'name']
+    missing_cols = [col for col in essential_cols if col not in df.columns]
+
+    if missing_cols:
+        raise ValueError(f"Missing essential columns: {missing_cols}")
+
+    # Remove rows with missing essential data
+    initial_count = len(df)
+    df = df.dropna(subset=essential_cols).reset_index(drop=True)
+    logger.info(f"Removed {initial_count - len(df)} rows with missing data")
+
+    # Parse genres straight into the CSR genre lists
+    genre_lists = parse_genres(df['genre'])
+
+    # Filter out rows with empty genre lists
+    has_genres = genre_lists.lengths() > 0
+    initial_count = len(df)
+    df = df[has_genres].reset_index(drop=True)
+    genre_lists = genre_lists.take(has_genres)
+    logger.info(f"Removed {initial_count - len(df)} rows with empty genre lists")
+    logger.info(f"Final dataset has {len(df)} valid rows")
+
+    return df, genre_lists
+
+
+def file_fingerprint(file_path: str) -> str:
+    """Cache key from the file content hash and modification time"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return f"{digest.hexdigest()[:16]}_{os.stat(file_path).st_mtime_ns}"
+
+
+def _save_column(entry: str, position: int, name: str, series: pd.Series) -> dict:
+    column = {'name': name, 'file': f"col{position}", 'rows': len(series)}
+    base = os.path.join(entry, column['file'])
+    dtype = series.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        np.save(base + '.npy', series.cat.codes.to_numpy())
+        column.update(kind='category', categories=series.cat.categories.astype(str).tolist())
+    elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(dtype):
+        np.save(base + '.npy', series.to_numpy(dtype=dtype.numpy_dtype, na_value=0))
+        np.save(base + '_mask.npy', series.isna().to_numpy())
+        column.update(kind='nullable')
+    elif pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        np.save(base + '.npy', series.to_numpy())
+        column.update(kind='numpy')
+    else:
+        # Strings are stored as one separator-joined text blob and split back in C
+        values = series.astype(str).str.replace(STRING_SEPARATOR, ' ', regex=False)
+        with open(base + '.txt', 'w', encoding='utf-8', newline='') as f:
+            f.write(STRING_SEPARATOR.join(values))
+        column.update(kind='string')
+
+    return column
+
+
+def _load_column(entry: str, column: dict, mmap_mode: Optional[str] = None):
+    base = os.path.join(entry, column['file'])
+    kind = column['kind']
+
+    if kind == 'category':
+        return pd.Categorical.from_codes(np.load(base + '.npy'), categories=column['categories'])
+    if kind == 'nullable':
+        return pd.arrays.IntegerArray(np.load(base + '.npy'), np.load(base + '_mask.npy'))
+    if kind == 'numpy':
+        return np.load(base + '.npy', mmap_mode=mmap_mode)
+
+    with open(base + '.txt', encoding='utf-8', newline='') as f:
+        values = f.read().split(STRING_SEPARATOR)
+    return values if column['rows'] else []
+
+
+def write_columns(entry: str, df: pd.DataFrame) -> List[dict]:
+    """Write every column of the frame into the entry directory, returning their descriptions"""
+    return [_save_column(entry, position, name, df[name]) for position, name in enumerate(df.columns)]
+
+
+def read_columns(entry: str, columns: List[dict], mmap_mode: Optional[str] = None) -> pd.DataFrame:
+    """Rebuild a frame written by write_columns; plain numeric columns can stay memory-mapped"""
+    return pd.DataFrame({column['name']: _load_column(entry, column, mmap_mode) for column in columns},
+                        copy=mmap_mode is None)
+
+
+class DatasetCache:
+    """Columnar .npy cache of the cleaned anime table, its genre lists and its title search index
+
+    With mmap_mode='r' the genre lists, the name index and plain numeric
+    columns are mapped read-only instead of read, so processes loading the
+    same entry share them.
+    """
+
+    def __init__(self, file_path: str, cache_dir: Optional[str] = None, mmap_mode: Optional[str] = 'r'):
+        self.file_path = file_path
+        self.mmap_mode = mmap_mode
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(file_path)), '.cache')
+        self.prefix = os.path.splitext(os.path.basename(file_path))[0] + '_'
+        # Entry last loaded or written, and whether it holds a name index
+        self.entry = None
+        self.has_names = False
+
+    def entry_dir(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, self.prefix + fingerprint)
+
+    def load(self) -> Optional[Tuple[pd.DataFrame, GenreLists]]:
+        """Return (df, genre lists) or None on a cache miss"""
+        try:
+            entry = self.entry_dir(file_fingerprint(self.file_path))
+            meta_path = os.path.join(entry, 'meta.json')
+            if not os.path.exists(meta_path):
+                return None
+
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != CACHE_VERSION:
+                return None
+
+            df = read_columns(entry, meta['columns'], self.mmap_mode)
+            genres = GenreLists.load(entry, meta['genre_vocab'], self.mmap_mode)
+            self.entry, self.has_names = entry, meta.get('names', False)
+            logger.info(f"Dataset loaded from cache: {entry}")
+            return df, genres
+
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable dataset cache: {e}")
+            return None
+
+    def load_names(self) -> Optional[NameIndex]:
+        """Name index of the entry last loaded, None if it was written without one"""
+        if self.entry is None or not self.has_names:
+            return None
+        try:
+            return NameIndex.load(self.entry, self.mmap_mode)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable name index: {e}")
+            return None
+
+    def save_names(self, names: NameIndex):
+        """Add a name index to the entry last loaded or written"""
+        if self.entry is None:
+            return
+        try:
+            names.save(self.entry)
+            meta_path = os.path.join(self.entry, 'meta.json')
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            meta['names'] = True
+            # The metadata is replaced last, so readers never see it list a half-written index
+            with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(meta_path + '.tmp', meta_path)
+            self.has_names = True
+        except Exception as e:
+            logger.warning(f"Could not add the name index to the dataset cache: {e}")
+
+    def save(self, df: pd.DataFrame, genres: GenreLists, names: Optional[NameIndex] = None):
+        """Write the cleaned table, genre lists and name index, replacing older entries for this file"""
+        staging = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry = self.entry_dir(file_fingerprint(self.file_path))
+            staging = tempfile.mkdtemp(dir=self.cache_dir)
+
+            columns = write_columns(staging, df)
+            genres.save(staging)
+            if names is not None:
+                names.save(staging)
+
+            meta = {'version': CACHE_VERSION, 'columns': columns, 'genre_vocab': genres.vocab,
+                    'names': names is not None}
+            with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+
+            self.clear()
+            os.replace(staging, entry)
+            self.entry, self.has_names = entry, names is not None
+            logger.info(f"Dataset cache written: {entry}")
+
+        except Exception as e:
+            logger.warning(f"Could not write dataset cache: {e}")
+            if staging and os.path.isdir(staging):
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def clear(self):
+        """Remove every cache entry of this source file, and only of this one
+
+        anime_2024.csv's entries also start with 'anime_', so the rest of the
+        name has to be a fingerprint.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(self.prefix) and FINGERPRINT_PATTERN.fullmatch(name[len(self.prefix):]):
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
@@ -0,0 +1,146 @@
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from genre_index import GenreLists, mean_and_std, pack_columns, pack_mask, popcount, unpack_mask
+
+logger = logging.getLogger(__name__)
+
+# Facets indexed as one bitmap per value, and as row positions sorted by value
+CATEGORICAL_FACETS = ('type',)
+NUMERIC_FACETS = ('episodes', 'members', 'rating')
+
+
+class FacetIndex:
+    """Bitmap and sorted-array indexes for filtering the catalog by facet
+
+    Categorical facets keep a bitmap per value; numeric facets keep their row
+    positions sorted by value, so a range is two binary searches. Genres reuse
+    the per-genre bitmaps of the frequent-set miner. A selection is a uint64
+    bitmap combined with & and |, and its genre statistics are aggregated
+    from the genre lists directly, so no filtered copy of df_anime is made.
+    """
+
+    def __init__(self, df: pd.DataFrame, genres: GenreLists):
+        self.n_rows = len(df)
+        self.vocab = genres.vocab
+        self.codes = {genre: code for code, genre in enumerate(self.vocab)}
+
+        self.categories: Dict[str, Dict[Any, np.ndarray]] = {}
+        for facet in CATEGORICAL_FACETS:
+            if facet in df.columns:
+                values = pd.Categorical(df[facet])
+                codes = values.codes
+                self.categories[facet] = {value: pack_mask(codes == code)
+                                          for code, value in enumerate(values.categories)}
+
+        self.sorted_values: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for facet in NUMERIC_FACETS:
+            if facet in df.columns:
+                values = df[facet].to_numpy(dtype=np.float64, na_value=np.nan)
+                # Missing values are left out, so they never match a range
+                positions = np.flatnonzero(~np.isnan(values))
+                positions = positions[np.argsort(values[positions], kind='stable')]
+                self.sorted_values[facet] = (values[positions], positions)
+
+        self.genre_bits = pack_columns(genres)
+        self.entry_rows = genres.row_ids()
+        self.entry_codes = genres.codes.astype(np.intp)
+        self.entry_ratings = df['rating'].to_numpy(dtype=np.float64)[self.entry_rows]
+
+    @property
+    def facets(self) -> List[str]:
+        return list(self.categories) + list(self.sorted_values) + ['genres']
+
+    def everything(self) -> np.ndarray:
+        return pack_mask(np.ones(self.n_rows, dtype=bool))
+
+    def equals(self, facet: str, values: Iterable) -> np.ndarray:
+        """Rows whose categorical facet is any of the given values"""
+        bitmaps = self.categories[facet]
+        bits = np.zeros(-(-self.n_rows // 64), dtype=np.uint64)
+        for value in values:
+            if value in bitmaps:
+                bits |= bitmaps[value]
+        return bits
+
+    def between(self, facet: str, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        """Rows whose numeric facet lies in [low, high]; None leaves that side open"""
+        values, positions = self.sorted_values[facet]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        stop = len(values) if high is None else np.searchsorted(values, high, side='right')
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[positions[start:stop]] = True
+        return pack_mask(mask)
+
+    def with_genres(self, genres: Iterable[str], match: str = 'all') -> np.ndarray:
+        """Rows having all (or any) of the given genres"""
+        if match not in ('all', 'any'):
+            raise ValueError(f"Unknown match mode: {match}")
+        bits = self.everything() if match == 'all' else np.zeros(-(-self.n_rows // 64), dtype=np.uint64)
+        for genre in genres:
+            code = self.codes.get(genre)
+            if code is None:
+                if match == 'all':
+                    return np.zeros_like(bits)
+                continue
+            bits = bits & self.genre_bits[code] if match == 'all' else bits | self.genre_bits[code]
+        return bits
+
+    def select(self, facets: Dict[str, Any]) -> np.ndarray:
+        """AND of every given facet filter
+
+        Categorical facets take a value or a list of values, numeric facets a
+        (low, high) pair with None for an open side, and 'genres' a list of
+        genres that must all be present.
+        """
+        bits = self.everything()
+        for facet, value in facets.items():
+            if facet in self.categories:
+                values = [value] if isinstance(value, str) or not isinstance(value, Iterable) else value
+                bits &= self.equals(facet, values)
+            elif facet in self.sorted_values:
+                low, high = value
+                bits &= self.between(facet, low, high)
+            elif facet == 'genres':
+                bits &= self.with_genres([value] if isinstance(value, str) else value)
+            else:
+                raise ValueError(f"Unknown facet: {facet} (available: {', '.join(self.facets)})")
+        return bits
+
+    def mask(self, bits: np.ndarray) -> np.ndarray:
+        """Boolean row mask of a selection"""
+        return unpack_mask(bits, self.n_rows)
+
+    def count(self, bits: np.ndarray) -> int:
+        return popcount(bits)
+
+    def genre_stats(self, bits: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Per-genre count, rating sum and rating sum of squares of the selected anime"""
+        selected = self.mask(bits)[self.entry_rows]
+        codes, ratings = self.entry_codes[selected], self.entry_ratings[selected]
+        size = len(self.vocab)
+        return (np.bincount(codes, minlength=size),
+                np.bincount(codes, weights=ratings, minlength=size),
+                np.bincount(codes, weights=ratings * ratings, minlength=size))
+
+    def genre_table(self, bits: np.ndarray) -> pd.DataFrame:
+        """Per-genre average rating, anime count and rating std of the selected anime"""
+        counts, sums, sumsq = self.genre_stats(bits)
+        means, stds = mean_and_std(counts, sums, sumsq)
+        present = counts > 0
+        return pd.DataFrame(
+            {'average_rating': means[present], 'anime_count': counts[present], 'rating_std': stds[present]},
+            index=pd.Index(np.asarray(self.vocab, dtype=object)[present], name='genre')
+        )
+
+    def side_genre_table(self, bits: np.ndarray, main_genre: str) -> pd.DataFrame:
+        """Statistics of every genre that co-occurs with the main genre within a selection"""
+        code = self.codes.get(main_genre)
+        if code is None:
+            return pd.DataFrame()
+
+        table = self.genre_table(bits & self.genre_bits[code])
+        return table.drop(index=main_genre, errors='ignore')
@@ -0,0 +1,641 @@
+import heapq
+import os
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+# Rows per bincount pass; bounds the temporary pair arrays to a few hundred MB
+COOCCURRENCE_BLOCK_ROWS = 1_000_000
+
+
+class GenreLists:
+    """Genre lists of every anime in CSR layout
+
+    The genres of row i are codes[offsets[i]:offsets[i + 1]], sorted and
+    without repeats; codes index into vocab and are stored as int8 (int16 past
+    127 genres). The inverted layout, the anime of every genre, is derived on
+    first use. Arrays saved with save() can be loaded memory-mapped, so worker
+    processes share one copy of the genre index through the page cache.
+    """
+
+    def __init__(self, vocab: List[str], codes: np.ndarray, offsets: np.ndarray, directory: Optional[str] = None):
+        self.vocab = list(vocab)
+        self.codes = codes
+        self.offsets = offsets
+        self.directory = directory  # Set when the arrays are memory-mapped from there
+        self._postings = None
+
+    @staticmethod
+    def code_dtype(n_genres: int) -> np.dtype:
+        for dtype in (np.int8, np.int16, np.int32):
+            if n_genres <= np.iinfo(dtype).max + 1:
+                return np.dtype(dtype)
+        raise ValueError(f"Too many genres: {n_genres}")
+
+    @classmethod
+    def from_codes(cls, vocab: List[str], rows: np.ndarray, codes: np.ndarray, n_rows: int) -> 'GenreLists':
+        """Build from unordered (row, code) pairs, dropping repeated genres of a row"""
+        keys = np.unique(rows.astype(np.int64) * max(len(vocab), 1) + codes)
+        rows, codes = np.divmod(keys, max(len(vocab), 1))
+        offsets = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=offsets[1:])
+        return cls(vocab, codes.astype(cls.code_dtype(len(vocab))), offsets)
+
+    @classmethod
+    def from_matrix(cls, vocab: List[str], matrix: np.ndarray) -> 'GenreLists':
+        rows, codes = np.nonzero(matrix)
+        offsets = np.zeros(len(matrix) + 1, dtype=np.int64)
+        np.cumsum(matrix.sum(axis=1), out=offsets[1:])
+        return cls(vocab, codes.astype(cls.code_dtype(len(vocab))), offsets)
+
+    @classmethod
+    def concat(cls, parts: List['GenreLists']) -> 'GenreLists':
+        """Rows of several lists over the same vocabulary, one after another"""
+        vocab = parts[0].vocab
+        if any(part.vocab != vocab for part in parts):
+            raise ValueError("Genre lists must share a vocabulary to be concatenated")
+
+        shifts = np.cumsum([0] + [len(part.codes) for part in parts[:-1]])
+        offsets = np.concatenate([[0]] + [part.offsets[1:] + shift for part, shift in zip(parts, shifts)])
+        codes = np.concatenate([part.codes for part in parts]).astype(cls.code_dtype(len(vocab)))
+        return cls(vocab, codes, offsets.astype(np.int64))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __reduce__(self):
+        # Memory-mapped lists travel to worker processes as their location, not their contents
+        if self.directory is not None:
+            return GenreLists.load, (self.directory, self.vocab, 'r')
+        return GenreLists, (self.vocab, self.codes, self.offsets)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.offsets.nbytes
+
+    def lengths(self) -> np.ndarray:
+        """Number of genres of every row"""
+        return np.diff(self.offsets)
+
+    def row_ids(self) -> np.ndarray:
+        """Row position of every entry of codes"""
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.lengths())
+
+    def pair_entries(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Entry positions of every ordered pair of entries within a row, each entry paired with itself too"""
+        rows = self.row_ids()
+        partners = self.lengths()[rows]
+        first = np.repeat(np.arange(len(rows)), partners)
+        second = (np.repeat(self.offsets[:-1][rows], partners) + np.arange(len(first))
+                  - np.repeat(np.cumsum(partners) - partners, partners))
+        return first, second
+
+    def genre_counts(self) -> np.ndarray:
+        return np.bincount(self.codes.astype(np.intp), minlength=len(self.vocab))
+
+    def postings(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Ascending row positions of every genre, flat, with per-genre offsets"""
+        if self._postings is None:
+            by_genre = np.argsort(self.codes, kind='stable')
+            offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+            np.cumsum(self.genre_counts(), out=offsets[1:])
+            self._postings = (self.row_ids()[by_genre], offsets)
+        return self._postings
+
+    def genre_rows(self, code: int) -> np.ndarray:
+        rows, offsets = self.postings()
+        return rows[offsets[code]:offsets[code + 1]]
+
+    def mask(self, code: int) -> np.ndarray:
+        """Boolean row mask of the anime tagged with the genre"""
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.genre_rows(code)] = True
+        return mask
+
+    def has_all(self, positions: np.ndarray, codes: List[int]) -> np.ndarray:
+        """Which of the given rows carry every one of the given genres"""
+        keep = np.ones(len(positions), dtype=bool)
+        for code in codes:
+            rows = self.genre_rows(code)
+            if not len(rows):
+                return np.zeros(len(positions), dtype=bool)
+            found = np.minimum(np.searchsorted(rows, positions), len(rows) - 1)
+            keep &= rows[found] == positions
+        return keep
+
+    def to_matrix(self) -> np.ndarray:
+        """Dense anime x genre membership matrix"""
+        matrix = np.zeros((len(self), len(self.vocab)), dtype=bool)
+        matrix[self.row_ids(), self.codes.astype(np.intp)] = True
+        return matrix
+
+    def bitsets(self) -> np.ndarray:
+        """Genres of every row as a (rows x words) uint64 bitset; bit i of a row is genre code i"""
+        codes = self.codes.astype(np.int64)
+        bitsets = np.empty((len(self), max(-(-len(self.vocab) // 64), 1)), dtype=np.uint64)
+        for word in range(bitsets.shape[1]):
+            bits = np.where(codes // 64 == word, np.left_shift(np.uint64(1), (codes % 64).astype(np.uint64)),
+                            np.uint64(0))
+            # Codes of a row are distinct, so their bits sum without carries; the
+            # cumulative sum may wrap around but the per-row differences are exact
+            totals = np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(bits, dtype=np.uint64)])
+            bitsets[:, word] = totals[self.offsets[1:]] - totals[self.offsets[:-1]]
+        return bitsets
+
+    def entry_names(self) -> np.ndarray:
+        """Genre name of every entry of codes"""
+        return np.asarray(self.vocab, dtype=object)[self.codes.astype(np.intp)]
+
+    def lists(self) -> pd.Series:
+        """Python lists of genre names, one per row, for display"""
+        bounds = self.offsets[1:-1]
+        return pd.Series([part.tolist() for part in np.split(self.entry_names(), bounds)], dtype=object)
+
+    def row_block(self, start: int, stop: int) -> 'GenreLists':
+        """Genre lists of a contiguous range of rows, sharing this object's codes"""
+        stop = min(stop, len(self))
+        first, last = self.offsets[start], self.offsets[stop]
+        return GenreLists(self.vocab, self.codes[first:last], self.offsets[start:stop + 1] - first)
+
+    def take(self, index: np.ndarray) -> 'GenreLists':
+        """Genre lists of the selected rows, given as a boolean mask or positions"""
+        index = np.asarray(index)
+        if index.dtype == bool:
+            entries = np.repeat(index, self.lengths())
+            lengths = self.lengths()[index]
+            offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            return GenreLists(self.vocab, self.codes[entries], offsets)
+
+        # Only the selected rows' lengths, so taking a few rows stays cheap on a large catalog
+        lengths = self.offsets[index + 1] - self.offsets[index]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        entries = np.repeat(self.offsets[:-1][index] - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return GenreLists(self.vocab, self.codes[entries], offsets)
+
+    def reindex(self, vocab: List[str]) -> 'GenreLists':
+        """Same lists coded over another vocabulary, which must contain every used genre"""
+        if vocab == self.vocab:
+            return self
+        positions = {genre: code for code, genre in enumerate(vocab)}
+        mapping = np.array([positions.get(genre, -1) for genre in self.vocab], dtype=np.int64)
+        codes = mapping[self.codes.astype(np.intp)]
+        if (codes < 0).any():
+            raise ValueError("Target vocabulary is missing genres that are in use")
+        return GenreLists.from_codes(list(vocab), self.row_ids(), codes, len(self))
+
+    def prune(self) -> 'GenreLists':
+        """Drop genres no row carries any more, as a fresh parse of these rows would"""
+        used = self.genre_counts() > 0
+        if used.all():
+            return self
+        return self.reindex([genre for genre, keep in zip(self.vocab, used) if keep])
+
+    def save(self, directory: str):
+        np.save(os.path.join(directory, 'genre_codes.npy'), self.codes)
+        np.save(os.path.join(directory, 'genre_offsets.npy'), self.offsets)
+
+    @classmethod
+    def load(cls, directory: str, vocab: List[str], mmap_mode: Optional[str] = None) -> 'GenreLists':
+        codes = np.load(os.path.join(directory, 'genre_codes.npy'), mmap_mode=mmap_mode)
+        offsets = np.load(os.path.join(directory, 'genre_offsets.npy'), mmap_mode=mmap_mode)
+        return cls(vocab, codes, offsets, directory=directory if mmap_mode else None)
+
+
+class CooccurrenceStats:
+    """Genre x genre count, rating sum and rating sum-of-squares matrices
+
+    The diagonal holds the per-genre totals, the off-diagonal cells the
+    statistics of anime tagged with both genres.
+    """
+
+    def __init__(self, vocab: List[str], counts: np.ndarray, sums: np.ndarray, sumsq: np.ndarray):
+        self.vocab = list(vocab)
+        self.codes = {genre: code for code, genre in enumerate(self.vocab)}
+        self.counts = counts
+        self.sums = sums
+        self.sumsq = sumsq
+
+    @classmethod
+    def from_lists(cls, genres: GenreLists, ratings: np.ndarray,
+                   block_rows: int = COOCCURRENCE_BLOCK_ROWS) -> 'CooccurrenceStats':
+        """Accumulate every genre pair of every row with bincount, a block of rows at a time"""
+        size = len(genres.vocab)
+        ratings = np.asarray(ratings, dtype=np.float64)
+        counts = np.zeros(size * size, dtype=np.int64)
+        sums = np.zeros(size * size)
+        sumsq = np.zeros(size * size)
+
+        for start in range(0, len(genres), block_rows):
+            block = genres.row_block(start, start + block_rows)
+            first, second = block.pair_entries()
+
+            codes = block.codes.astype(np.intp)
+            cells = codes[first] * size + codes[second]
+            weights = ratings[start:start + len(block)][block.row_ids()[first]]
+            counts += np.bincount(cells, minlength=size * size)
+            sums += np.bincount(cells, weights=weights, minlength=size * size)
+            sumsq += np.bincount(cells, weights=weights * weights, minlength=size * size)
+
+        shape = (size, size)
+        return cls(genres.vocab, counts.reshape(shape), sums.reshape(shape), sumsq.reshape(shape))
+
+    @classmethod
+    def from_totals(cls, genres: GenreLists, counts: np.ndarray, sums: np.ndarray, sumsq: np.ndarray,
+                    block_rows: int = COOCCURRENCE_BLOCK_ROWS) -> 'CooccurrenceStats':
+        """Like from_lists, for rows standing for many observations given by their count, sum and sum of squares"""
+        size = len(genres.vocab)
+        totals = [np.asarray(values, dtype=np.float64) for values in (counts, sums, sumsq)]
+        accumulated = [np.zeros(size * size) for _ in totals]
+
+        for start in range(0, len(genres), block_rows):
+            block = genres.row_block(start, start + block_rows)
+            first, second = block.pair_entries()
+
+            codes = block.codes.astype(np.intp)
+            cells = codes[first] * size + codes[second]
+            rows = start + block.row_ids()[first]
+            for target, values in zip(accumulated, totals):
+                target += np.bincount(cells, weights=values[rows], minlength=size * size)
+
+        shape = (size, size)
+        counts, sums, sumsq = accumulated
+        return cls(genres.vocab, np.rint(counts).astype(np.int64).reshape(shape), sums.reshape(shape),
+                   sumsq.reshape(shape))
+
+    @classmethod
+    def empty(cls, vocab: List[str]) -> 'CooccurrenceStats':
+        size = len(vocab)
+        return cls(vocab, np.zeros((size, size), dtype=np.int64), np.zeros((size, size)), np.zeros((size, size)))
+
+    def reindex(self, vocab: List[str]) -> 'CooccurrenceStats':
+        """Same statistics laid out over another vocabulary; genres missing here get zeros"""
+        result = CooccurrenceStats.empty(vocab)
+        shared = [genre for genre in self.vocab if genre in result.codes]
+        source = np.array([self.codes[genre] for genre in shared], dtype=np.intp)
+        target = np.array([result.codes[genre] for genre in shared], dtype=np.intp)
+
+        for name in ('counts', 'sums', 'sumsq'):
+            getattr(result, name)[np.ix_(target, target)] = getattr(self, name)[np.ix_(source, source)]
+
+        return result
+
+    def merge(self, other: 'CooccurrenceStats') -> 'CooccurrenceStats':
+        """Statistics of the union of two disjoint sets of anime"""
+        vocab = sorted(set(self.vocab) | set(other.vocab))
+        left, right = self.reindex(vocab), other.reindex(vocab)
+        return CooccurrenceStats(vocab, left.counts + right.counts, left.sums + right.sums, left.sumsq + right.sumsq)
+
+    def subtract(self, other: 'CooccurrenceStats') -> 'CooccurrenceStats':
+        """Statistics with the contribution of a subset of the anime removed
+
+        Genres left without any anime are dropped, as a full recompute would not see them.
+        """
+        right = other.reindex(self.vocab)
+        result = CooccurrenceStats(self.vocab, self.counts - right.counts,
+                                   self.sums - right.sums, self.sumsq - right.sumsq)
+
+        # Clear rounding residue left in cells that no longer have any anime
+        empty = result.counts == 0
+        result.sums[empty] = 0.0
+        result.sumsq[empty] = 0.0
+
+        return result.reindex([genre for code, genre in enumerate(self.vocab) if result.counts[code, code] > 0])
+
+    def genre_totals(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Per-genre count, rating sum and rating sum of squares"""
+        return np.diag(self.counts).copy(), np.diag(self.sums).copy(), np.diag(self.sumsq).copy()
+
+    def genre_table(self) -> pd.DataFrame:
+        """Per-genre average rating, anime count and rating std"""
+        counts, sums, sumsq = self.genre_totals()
+        means, stds = mean_and_std(counts, sums, sumsq)
+        return pd.DataFrame(
+            {'average_rating': means, 'anime_count': counts, 'rating_std': stds},
+            index=pd.Index(self.vocab, name='genre')
+        )
+
+    def pair_mean_and_std(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Mean and standard deviation matrices for every genre pair"""
+        return mean_and_std(self.counts, self.sums, self.sumsq)
+
+    def side_genre_table(self, main_genre: str) -> pd.DataFrame:
+        """Statistics of every genre that co-occurs with the main genre"""
+        code = self.codes.get(main_genre)
+        if code is None:
+            return pd.DataFrame()
+
+        counts = self.counts[code]
+        means, stds = mean_and_std(counts, self.sums[code], self.sumsq[code])
+
+        present = counts > 0
+        present[code] = False
+
+        return pd.DataFrame(
+            {'average_rating': means[present], 'anime_count': counts[present], 'rating_std': stds[present]},
+            index=pd.Index(np.asarray(self.vocab, dtype=object)[present], name='genre')
+        )
+
+
+def top_k_rows_per_genre(genres: GenreLists, order: np.ndarray, k: int,
+                         row_mask: Optional[np.ndarray] = None) -> List[np.ndarray]:
+    """Positions of the first k rows of every genre, following the given row order"""
+    if row_mask is not None:
+        order = order[row_mask[order]]
+
+    # Laid out in the given order, each genre's entries are already ranked, so
+    # a stable sort by genre groups them without a second key
+    ranked = genres.take(order)
+    by_genre = np.argsort(ranked.codes, kind='stable')
+    codes = ranked.codes[by_genre]
+    bounds = np.searchsorted(codes, np.arange(len(genres.vocab) + 1))
+    keep = np.arange(len(codes)) - bounds[codes] < k
+
+    positions = order[ranked.row_ids()[by_genre][keep]]
+    bounds = np.searchsorted(codes[keep], np.arange(len(genres.vocab) + 1))
+    return [positions[bounds[i]:bounds[i + 1]] for i in range(len(genres.vocab))]
+
+
+class GenreRankingIndex:
+    """Per-genre anime lists pre-sorted by each ranking metric
+
+    For every metric the rows are ranked once globally (highest first, ties in
+    dataset order). Each genre then stores the sorted global ranks of its anime
+    in a flat array with per-genre offsets, so a top-N lookup is a slice and a
+    genre combination is a merge of sorted lists instead of a filter and sort.
+    """
+
+    def __init__(self, genres: GenreLists, metrics: Dict[str, np.ndarray]):
+        self.genres = genres
+        self.orders = {}
+        self.ranks = {}
+        self.offsets = genres.postings()[1]
+
+        rows = genres.row_ids()
+        codes = genres.codes
+        for name, values in metrics.items():
+            order = np.argsort(self.sort_keys(values), kind='stable')
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            entry_ranks = rank[rows]
+            self.orders[name] = order
+            self.ranks[name] = entry_ranks[np.lexsort((entry_ranks, codes))]
+
+    @staticmethod
+    def sort_keys(values: np.ndarray) -> np.ndarray:
+        """Ascending keys of the descending ranking; NaN sorts last so missing values never outrank real ones"""
+        return -np.nan_to_num(np.asarray(values, dtype=np.float64), nan=-np.inf)
+
+    def update(self, genres: GenreLists, metrics: Dict[str, np.ndarray], kept: np.ndarray) -> 'GenreRankingIndex':
+        """Index of a catalog made of the kept rows of this one, in order, followed by new rows
+
+        `genres` and `metrics` describe the new catalog and `kept` is a boolean
+        mask over the rows of the old one. The kept anime keep their relative
+        order, so every ranking is a merge of the surviving ranks with the
+        sorted new rows instead of a sort of the whole catalog.
+        """
+        kept = np.asarray(kept, dtype=bool)
+        n_kept = int(kept.sum())
+        added_lists = genres.row_block(n_kept, len(genres))
+        added_codes = added_lists.codes
+        old_codes = {genre: code for code, genre in enumerate(self.genres.vocab)}
+        new_positions = np.cumsum(kept) - 1
+
+        index = GenreRankingIndex.__new__(GenreRankingIndex)
+        index.genres = genres
+        index.orders = {}
+        index.ranks = {}
+        index.offsets = genres.postings()[1]
+
+        for name, values in metrics.items():
+            keys = self.sort_keys(values)
+            old_order = self.orders[name]
+            survives = kept[old_order]
+            kept_rows = new_positions[old_order[survives]]
+            added_rows = n_kept + np.argsort(keys[n_kept:], kind='stable')
+
+            # New rows go after kept rows with an equal value, as they come later in the dataset
+            slots = np.searchsorted(keys[kept_rows], keys[added_rows], side='right')
+            kept_ranks = np.arange(len(kept_rows)) + np.searchsorted(slots, np.arange(len(kept_rows)), side='right')
+            added_ranks = slots + np.arange(len(added_rows))
+
+            order = np.empty(len(keys), dtype=np.intp)
+            order[kept_ranks] = kept_rows
+            order[added_ranks] = added_rows
+            index.orders[name] = order
+
+            # Old rank -> new rank of every surviving anime, -1 for the dropped ones
+            rank_map = np.full(len(old_order), -1, dtype=np.int64)
+            rank_map[survives] = kept_ranks
+            added_rank = np.empty(len(added_rows), dtype=np.int64)
+            added_rank[added_rows - n_kept] = added_ranks
+            added_entry_ranks = added_rank[added_lists.row_ids()]
+
+            parts = []
+            for code, genre in enumerate(genres.vocab):
+                old_code = old_codes.get(genre)
+                survivors = (rank_map[self.genre_ranks(old_code, name)] if old_code is not None
+                             else np.empty(0, dtype=np.int64))
+                survivors = survivors[survivors >= 0]
+                fresh = np.sort(added_entry_ranks[added_codes == code])
+                parts.append(np.insert(survivors, np.searchsorted(survivors, fresh), fresh))
+            index.ranks[name] = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+        return index
+
+    @property
+    def metrics(self) -> List[str]:
+        return list(self.orders)
+
+    def genre_ranks(self, code: int, by: str = 'rating') -> np.ndarray:
+        """Global ranks of the genre's anime, best first"""
+        return self.ranks[by][self.offsets[code]:self.offsets[code + 1]]
+
+    def top(self, codes: List[int], k: int, by: str = 'rating', match: str = 'all',
+            row_mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Row positions of the k best anime having all (or any) of the given genres
+
+        With a row mask only the selected rows are considered.
+        """
+        if by not in self.orders:
+            raise ValueError(f"Unknown ranking metric: {by}")
+        if not codes:
+            return np.empty(0, dtype=np.intp)
+
+        order = self.orders[by]
+        lists = [self.genre_ranks(code, by) for code in codes]
+
+        if len(lists) == 1 and row_mask is None:
+            return order[lists[0][:k]]
+
+        if match == 'any' and len(lists) > 1:
+            # k-way merge of the sorted rank lists, skipping anime listed under several genres
+            merged = _unique_sorted(heapq.merge(*lists))
+            if row_mask is not None:
+                merged = (rank for rank in merged if row_mask[order[rank]])
+            return order[np.fromiter(islice(merged, k), dtype=np.int64)]
+
+        if match not in ('all', 'any'):
+            raise ValueError(f"Unknown match mode: {match}")
+
+        # Walk the shortest list in growing blocks and keep rows that carry every other genre
+        shortest = min(range(len(lists)), key=lambda i: len(lists[i]))
+        others = [code for i, code in enumerate(codes) if i != shortest]
+        candidates = lists[shortest]
+
+        found = []
+        start, block = 0, max(k, 16)
+        while start < len(candidates) and sum(len(f) for f in found) < k:
+            positions = order[candidates[start:start + block]]
+            if row_mask is not None:
+                positions = positions[row_mask[positions]]
+            found.append(positions[self.genres.has_all(positions, others)])
+            start += block
+            block *= 2
+
+        if not found:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate(found)[:k]
+
+
+def _unique_sorted(values):
+    """Drop repeats from an ascending iterator"""
+    previous = None
+    for value in values:
+        if value != previous:
+            yield value
+            previous = value
+
+
+def pack_mask(mask: np.ndarray) -> np.ndarray:
+    """Boolean row mask as a uint64 bitset; bit i is row i, padding bits are clear"""
+    packed = np.zeros(-(-len(mask) // 64) * 8, dtype=np.uint8)
+    packed[:-(-len(mask) // 8)] = np.packbits(mask, bitorder='little')
+    return packed.view(np.uint64)
+
+
+def unpack_mask(bits: np.ndarray, n_rows: int) -> np.ndarray:
+    """Boolean row mask of a bitset made by pack_mask"""
+    return np.unpackbits(bits.view(np.uint8), count=n_rows, bitorder='little').view(bool)
+
+
+def pack_columns(genres: GenreLists) -> np.ndarray:
+    """Genre columns as (genres x words) uint64 bitsets; bit i of a column is row i"""
+    packed = np.zeros((len(genres.vocab), -(-len(genres) // 64)), dtype=np.uint64)
+    for code in range(len(genres.vocab)):
+        packed[code] = pack_mask(genres.mask(code))
+    return packed
+
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(bits: np.ndarray) -> int:
+        return int(np.bitwise_count(bits).sum())
+
+    def popcount_rows(bits: np.ndarray) -> np.ndarray:
+        """Set bits of every bitset along the last axis"""
+        return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+else:  # numpy < 2.0
+    _BYTE_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+    def popcount(bits: np.ndarray) -> int:
+        return int(_BYTE_POPCOUNT[bits.view(np.uint8)].sum(dtype=np.int64))
+
+    def popcount_rows(bits: np.ndarray) -> np.ndarray:
+        """Set bits of every bitset along the last axis"""
+        return _BYTE_POPCOUNT[np.ascontiguousarray(bits).view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def bitset_rows(bits: np.ndarray) -> np.ndarray:
+    """Row positions set in a bitset, unpacking only its non-empty words"""
+    words = np.flatnonzero(bits)
+    unpacked = np.unpackbits(bits[words].view(np.uint8), bitorder='little').view(bool)
+    return (words[:, None] * 64 + np.arange(64)).ravel()[unpacked]
+
+
+def frequent_genre_sets(genres: GenreLists, ratings: np.ndarray, min_support: float,
+                        min_size: int = 2, max_size: Optional[int] = None) -> pd.DataFrame:
+    """Every genre combination carried by at least min_support anime, with its rating statistics
+
+    min_support is an anime count, or a fraction of the catalog when below 1.
+    Combinations are grown depth first from bitset intersections; a genre only
+    extends a combination when it forms a frequent pair with each member, so
+    most infrequent candidates are pruned before any intersection is taken.
+    """
+    vocab = genres.vocab
+    n_rows = len(genres)
+    if 0 < min_support < 1:
+        min_support = int(np.ceil(min_support * n_rows))
+    min_support = max(int(min_support), 1)
+    ratings = np.asarray(ratings, dtype=np.float64)
+
+    bits = pack_columns(genres)
+    frequent = [code for code in range(len(vocab)) if popcount(bits[code]) >= min_support]
+
+    pair_frequent = np.zeros((len(vocab), len(vocab)), dtype=bool)
+    for i, first in enumerate(frequent):
+        for second in frequent[i + 1:]:
+            pair_frequent[first, second] = pair_frequent[second, first] = \
+                popcount(bits[first] & bits[second]) >= min_support
+
+    itemsets, counts, sums, sumsq = [], [], [], []
+
+    def visit(itemset: Tuple[int, ...], itemset_bits: np.ndarray, support: int):
+        if len(itemset) >= min_size:
+            selected = ratings[bitset_rows(itemset_bits)]
+            itemsets.append(itemset)
+            counts.append(support)
+            sums.append(selected.sum())
+            sumsq.append(np.dot(selected, selected))
+        if max_size is not None and len(itemset) >= max_size:
+            return
+
+        for code in frequent:
+            if code <= itemset[-1] or not pair_frequent[itemset, code].all():
+                continue
+            joined = itemset_bits & bits[code]
+            joined_support = popcount(joined)
+            if joined_support >= min_support:
+                visit(itemset + (code,), joined, joined_support)
+
+    for code in frequent:
+        visit((code,), bits[code], popcount(bits[code]))
+
+    mean, std = mean_and_std(np.array(counts), np.array(sums), np.array(sumsq))
+    return pd.DataFrame({
+        'genres': [tuple(vocab[code] for code in itemset) for itemset in itemsets],
+        'size': np.array([len(itemset) for itemset in itemsets], dtype=np.int64),
+        'anime_count': np.array(counts, dtype=np.int64),
+        'average_rating': mean,
+        'rating_std': std,
+    })
+
+
+def closed_genre_sets(combinations: pd.DataFrame) -> np.ndarray:
+    """Mask of the combinations that no one-genre-larger combination matches in anime count
+
+    Non-closed combinations describe exactly the same anime as a larger one, so
+    leaving them out removes the redundant subsets of a tight cluster of titles.
+    """
+    counts = dict(zip(map(frozenset, combinations['genres']), combinations['anime_count']))
+    redundant = set()
+    for genres, count in counts.items():
+        for genre in genres:
+            subset = genres - {genre}
+            if counts.get(subset) == count:
+                redundant.add(subset)
+    return np.array([frozenset(genres) not in redundant for genres in combinations['genres']], dtype=bool)
+
+
+def mean_and_std(counts: np.ndarray, sums: np.ndarray, sumsq: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean and sample standard deviation from sufficient statistics"""
+    counts = np.asarray(counts, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(counts > 0, sums / counts, np.nan)
+        var = np.where(counts > 1, (sumsq - sums * sums / counts) / (counts - 1), np.nan)
+
+    # Cancellation can push a zero variance slightly below zero
+    std = np.sqrt(np.clip(var, 0.0, None))
+    return mean, std
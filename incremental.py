@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_loader import read_columns, write_columns
+from genre_index import CooccurrenceStats, GenreLists
+from rating_stats import GenreRatingStats, RatingHistograms
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 3
+
+
+def write_state(state_dir: str, df: pd.DataFrame, genres: GenreLists, cooccurrence: CooccurrenceStats,
+                histograms: Optional[RatingHistograms] = None, rating_stats: Optional[GenreRatingStats] = None):
+    """Persist the catalog and its sufficient statistics for the next incremental run
+
+    Rating histograms and weighted ratings are stored when they have been
+    computed. Rating intervals are not: they resample individual ratings, so
+    they are computed again when asked for, like after any catalog delta.
+    """
+    parent = os.path.dirname(os.path.abspath(state_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent)
+
+    try:
+        columns = write_columns(staging, df)
+        genres.save(staging)
+        np.savez(os.path.join(staging, 'cooccurrence.npz'), counts=cooccurrence.counts,
+                 sums=cooccurrence.sums, sumsq=cooccurrence.sumsq)
+
+        meta = {
+            'version': STATE_VERSION,
+            'columns': columns,
+            'genre_vocab': genres.vocab,
+            'stats_vocab': cooccurrence.vocab,
+            'histograms': None,
+            'rating_stats': None,
+        }
+        if histograms is not None:
+            np.savez(os.path.join(staging, 'histograms.npz'), counts=histograms.counts)
+            meta['histograms'] = {'vocab': histograms.vocab, 'range': list(histograms.rating_range)}
+        if rating_stats is not None:
+            np.savez(os.path.join(staging, 'rating_stats.npz'), counts=rating_stats.counts, sums=rating_stats.sums,
+                     member_totals=rating_stats.member_totals)
+            meta['rating_stats'] = {'vocab': rating_stats.vocab, 'n_rows': rating_stats.n_rows,
+                                    'rating_total': rating_stats.rating_total}
+        with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        if os.path.isdir(state_dir):
+            shutil.rmtree(state_dir)
+        os.replace(staging, state_dir)
+        logger.info(f"Analysis state saved: {state_dir}")
+
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def read_state(state_dir: str) -> Optional[Tuple[pd.DataFrame, GenreLists, CooccurrenceStats,
+                                                 Optional[RatingHistograms], Optional[GenreRatingStats]]]:
+    """Load a state written by write_state, or None if there is no usable state
+
+    The histograms and weighted ratings are None when they were not stored.
+    """
+    meta_path = os.path.join(state_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != STATE_VERSION:
+        logger.warning(f"Ignoring analysis state with version {meta.get('version')}")
+        return None
+
+    df = read_columns(state_dir, meta['columns'])
+    genres = GenreLists.load(state_dir, meta['genre_vocab'])
+    with np.load(os.path.join(state_dir, 'cooccurrence.npz')) as stats:
+        cooccurrence = CooccurrenceStats(meta['stats_vocab'], stats['counts'], stats['sums'], stats['sumsq'])
+
+    histograms = None
+    if meta['histograms'] is not None:
+        with np.load(os.path.join(state_dir, 'histograms.npz')) as stats:
+            histograms = RatingHistograms(meta['histograms']['vocab'], stats['counts'],
+                                          tuple(meta['histograms']['range']))
+    rating_stats = None
+    if meta['rating_stats'] is not None:
+        with np.load(os.path.join(state_dir, 'rating_stats.npz')) as stats:
+            # The priors are derived from the statistics, as after merging a delta
+            rating_stats = GenreRatingStats(meta['rating_stats']['vocab'], stats['counts'], stats['sums'],
+                                            stats['member_totals'], meta['rating_stats']['n_rows'],
+                                            meta['rating_stats']['rating_total'])
+
+    logger.info(f"Analysis state loaded: {state_dir}")
+    return df, genres, cooccurrence, histograms, rating_stats
+
+
+def diff_catalog(old_df: pd.DataFrame, new_df: pd.DataFrame,
+                 key: str = 'anime_id') -> Tuple[pd.DataFrame, np.ndarray]:
+    """Rows of new_df that are new or changed compared to old_df, and the ids that disappeared
+
+    Both frames must be typed the same way (see data_loader.read_anime_csv). Rows
+    that were cleaned out of old_df show up as changed, which is harmless: applying
+    them as a delta simply cleans them out again.
+    """
+    columns = [col for col in new_df.columns if col in old_df.columns and col != key]
+
+    old = old_df.set_index(key)[columns].astype(str)
+    new = new_df.set_index(key)[columns].astype(str)
+
+    shared = new.index.isin(old.index)
+    changed = np.ones(len(new), dtype=bool)
+    if shared.any():
+        previous = old.loc[new.index[shared]]
+        changed[shared] = (new[shared].to_numpy() != previous.to_numpy()).any(axis=1)
+
+    removed_ids = old.index[~old.index.isin(new.index)].to_numpy()
+    return new_df[changed].reset_index(drop=True), removed_ids
+
+
+def stale_rows(df: pd.DataFrame, delta: pd.DataFrame, removed_ids: Iterable = (),
+               key: str = 'anime_id') -> np.ndarray:
+    """Mask of the rows replaced or removed by a delta"""
+    stale_ids = np.union1d(np.asarray(list(removed_ids)), delta[key].to_numpy())
+    return df[key].isin(stale_ids).to_numpy()
@@ -0,0 +1,223 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def reset_peak_rss() -> bool:
+    """Restart the kernel's resident set size high-water mark (Linux); False where it cannot be reset"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Resident set size high-water mark since the last reset_peak_rss(), where /proc is available"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def current_rss_mb() -> Optional[float]:
+    """Current resident set size, where /proc is available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Instrumentation:
+    """Records wall time, CPU time, row counts and memory for each pipeline stage
+
+    Memory is the resident set size at the end of the stage, its change over
+    the stage and, on Linux, its peak during the stage: the kernel's
+    high-water mark is reset when a stage starts, and the peaks of nested
+    stages are folded into the stages around them. Where the mark cannot be
+    reset only the change is recorded.
+
+    Spans are written as JSON lines and as a Chrome trace (chrome://tracing,
+    Perfetto). Optionally the whole run is profiled with cProfile and per-stage
+    allocation peaks are taken with tracemalloc.
+    """
+
+    def __init__(self, enabled: bool = True, profile: bool = False, trace_memory: bool = False):
+        self.enabled = enabled
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.spans: List[dict] = []
+        self.lock = threading.Lock()
+        self.profiler = None
+        # Running memory peaks of the stages currently open
+        self.open_peaks: List[dict] = []
+
+    def start(self):
+        """Begin run-wide profiling and allocation tracing, if requested"""
+        if not self.enabled:
+            return
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str, category: str = None, rows_in: int = None, **args):
+        """Time the enclosed block; the yielded span accepts rows_out and extra args"""
+        span = {'name': name, 'cat': category or name, 'rows_in': rows_in, 'rows_out': None, 'args': args}
+        if not self.enabled:
+            yield span
+            return
+
+        peaks = {'rss': None, 'traced': None}
+        with self.lock:
+            # Resetting the peaks would lose the outer stages' peaks so far
+            self._fold_peaks()
+            peaks['rss_reset'] = reset_peak_rss()
+            # tracemalloc.reset_peak() is Python 3.9+
+            peaks['traced_reset'] = (self.trace_memory and tracemalloc.is_tracing()
+                                     and hasattr(tracemalloc, 'reset_peak'))
+            if peaks['traced_reset']:
+                tracemalloc.reset_peak()
+            self.open_peaks.append(peaks)
+
+        start, wall, cpu = time.time(), time.perf_counter(), time.process_time()
+        rss_start = current_rss_mb()
+        try:
+            yield span
+        finally:
+            rss_end = current_rss_mb()
+            with self.lock:
+                self._fold_peaks()
+                # By identity: list.remove() compares with ==, which would match another stage's equal peaks
+                self.open_peaks = [other for other in self.open_peaks if other is not peaks]
+            span.update(
+                start=start,
+                wall_s=round(time.perf_counter() - wall, 6),
+                cpu_s=round(time.process_time() - cpu, 6),
+                rss_mb=rss_end,
+                rss_delta_mb=round(rss_end - rss_start, 1) if rss_end is not None and rss_start is not None else None,
+                pid=os.getpid(),
+                tid=threading.get_ident(),
+            )
+            if peaks['rss_reset'] and peaks['rss'] is not None:
+                span['peak_rss_mb'] = peaks['rss']
+            if peaks['traced_reset'] and tracemalloc.is_tracing():
+                span['traced_peak_mb'] = round(peaks['traced'] / 2 ** 20, 2)
+            self.record(span)
+
+    def _fold_peaks(self):
+        """Fold the memory peaks since the last reset into every open stage"""
+        if not self.open_peaks:
+            return
+        rss = peak_rss_mb()
+        traced = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        for peaks in self.open_peaks:
+            if rss is not None:
+                peaks['rss'] = max(peaks['rss'] or 0.0, rss)
+            if traced is not None:
+                peaks['traced'] = max(peaks['traced'] or 0, traced)
+
+    def record(self, span: dict):
+        """Add a span measured elsewhere, e.g. in a render worker process"""
+        if self.enabled:
+            with self.lock:
+                self.spans.append(span)
+
+    def totals(self) -> dict:
+        """Wall and CPU seconds summed per stage category"""
+        totals = {}
+        for span in self.spans:
+            entry = totals.setdefault(span['cat'], {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0})
+            entry['calls'] += 1
+            entry['wall_s'] += span.get('wall_s') or 0.0
+            entry['cpu_s'] += span.get('cpu_s') or 0.0
+        return totals
+
+    def write(self, output_dir: str, basename: str = 'trace'):
+        """Write <basename>.jsonl, the Chrome trace <basename>.json and profile.pstats"""
+        if not self.enabled:
+            return
+        self.stop()
+        os.makedirs(output_dir, exist_ok=True)
+
+        with open(os.path.join(output_dir, f'{basename}.jsonl'), 'w', encoding='utf-8') as f:
+            for span in self.spans:
+                f.write(json.dumps(span, ensure_ascii=False, default=str) + '\n')
+
+        events = []
+        for span in self.spans:
+            args = {key: value for key, value in span.items()
+                    if key not in ('name', 'cat', 'start', 'wall_s', 'pid', 'tid', 'args') and value is not None}
+            args.update(span.get('args') or {})
+            events.append({
+                'name': span['name'], 'cat': span['cat'], 'ph': 'X',
+                'ts': int(span['start'] * 1e6), 'dur': int(span['wall_s'] * 1e6),
+                'pid': span['pid'], 'tid': span['tid'], 'args': args,
+            })
+        with open(os.path.join(output_dir, f'{basename}.json'), 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+
+        if self.profiler is not None:
+            self.profiler.dump_stats(os.path.join(output_dir, 'profile.pstats'))
+
+        logger.info(f"Trace written: {os.path.join(output_dir, basename)}.jsonl / .json")
+
+
+# Shared no-op instance for analyzers created without instrumentation
+DISABLED = Instrumentation(enabled=False)
+
+
+def traced(name: str, rows_out: Callable = None):
+    """Run an analyzer method inside a stage of its tracer
+
+    rows_in is the analyzer's catalog size; rows_out is computed by the given
+    callable from (self, result), or taken from the result's length.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            tracer = getattr(self, 'tracer', DISABLED)
+            if not tracer.enabled:
+                return method(self, *args, **kwargs)
+
+            with tracer.stage(name, rows_in=_rows(self), method=method.__name__) as span:
+                result = method(self, *args, **kwargs)
+                if rows_out is not None:
+                    span['rows_out'] = rows_out(self, result)
+                elif hasattr(result, '__len__') and not isinstance(result, (str, bytes)):
+                    span['rows_out'] = len(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def _rows(analyzer) -> Optional[int]:
+    try:
+        return analyzer.anime_count
+    except Exception:
+        return None
@@ -1,128 +1,319 @@
 import pandas as pd
 import numpy as np
-from collections import Counter
-import matplotlib.pyplot as plt
-import seaborn as sns
-from tabulate import tabulate
+import argparse
+import copy
+import html
+import multiprocessing
 import os
 import subprocess
 import sys
-from typing import List, Dict, Tuple, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Any, Optional
 import logging
 from datetime import datetime
 
+from data_loader import DatasetCache, clean_anime_frame, read_anime_csv
+from rendering import (RenderCache, RenderJob, bar_chart_job, render_bar_chart, render_jobs, render_table_image,
+                       table_image_job)
+from genre_index import (CooccurrenceStats, GenreRankingIndex, closed_genre_sets, frequent_genre_sets,
+                         GenreLists, top_k_rows_per_genre)
+from report_writer import MarkdownWriter, markdown_table, text_table, write_text_table
+from facets import FacetIndex
+from name_index import NameIndex
+from rating_stats import BOOTSTRAP_RESAMPLES, GenreRatingStats, RatingHistograms
+from similarity import SimilarityIndex
+from user_ratings import USER_RATING_CHUNK_ROWS, UserRatings
+from incremental import diff_catalog, read_state, stale_rows, write_state
+from instrumentation import DISABLED, Instrumentation, traced
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Set Turkish locale for proper text display
-plt.rcParams['font.family'] = 'DejaVu Sans'
-plt.rcParams['axes.unicode_minus'] = False
+# Columns shown in the top anime tables, when present in the dataset
+TOP_ANIME_COLUMNS = ['name', 'rating', 'episodes', 'type', 'members', 'score', 'popularity']
+
+# Genre table columns as named for user scores from rating.csv
+USER_RATING_COLUMNS = {'average_rating': 'user_rating', 'anime_count': 'rating_count', 'rating_std': 'user_rating_std'}
 
 
 class AnimeAnalyzer:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, use_cache: bool = True, cache_dir: str = None,
+                 tracer: Instrumentation = None):
         self.file_path = file_path
+        self.tracer = tracer or DISABLED
+        self.use_cache = use_cache
+        self.cache = DatasetCache(file_path, cache_dir)
         self.df_anime = None
         self.df_expanded = None
         self.genre_summary = None
         self.top_genres = []
+        self.genre_vocab = []
+        self.genre_codes = {}
+        self.genres = None
+        self.rating_order = None
+        self.cooccurrence = None
+        self.ranking = None
+        self.similarity = None
+        self.facets = None
+        self.name_order = None
+        self.names = None
+        # Whether the catalog is the one in the dataset cache entry, whose name index can be reused
+        self.cache_current = False
+        self.rating_stats = None
+        self.histograms = None
+        self.user_ratings = None
+        self.user_cooccurrence = None
+        self.user_unrated = None
+        self.bootstrap_resamples = BOOTSTRAP_RESAMPLES
+        self.bootstrap_seed = 0
+        self.min_anime_count = 10
+        self.rank_by = 'weighted_rating'
+        # Prior of the weighted ratings when this analyzer is a view of a larger catalog
+        self.rating_prior = None
         self.analysis_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         self.report_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     def load_and_clean_data(self) -> bool:
         """Load and clean the anime dataset"""
         try:
+            if self.use_cache:
+                with self.tracer.stage('load', source='cache') as span:
+                    cached = self.cache.load()
+                    span['rows_out'] = len(cached[0]) if cached is not None else None
+                if cached is not None:
+                    self.df_anime, genres = cached
+                    logger.info(f"Final dataset has {len(self.df_anime)} valid rows")
+                    self.build_genre_index(genres)
+                    self.cache_current = True
+                    return True
+
             logger.info("Loading dataset...")
 
-            # Try different encodings and engines
-            encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-
-            for encoding in encodings:
-                try:
-                    self.df_anime = pd.read_csv(self.file_path, sep=',', encoding=encoding)
-                    logger.info(f"Dataset loaded successfully with encoding: {encoding}")
-                    break
-                except UnicodeDecodeError:
-                    continue
-                except Exception as e:
-                    logger.warning(f"Failed with encoding {encoding}: {e}")
-                    continue
-
-            if self.df_anime is None:
-                try:
-                    self.df_anime = pd.read_csv(self.file_path, sep=',')
-                    logger.info("Dataset loaded with default encoding")
-                except Exception as e:
-                    logger.error(f"Failed to load dataset: {e}")
-                    return False
+            try:
+                with self.tracer.stage('load', source=self.file_path) as span:
+                    self.df_anime = read_anime_csv(self.file_path)
+                    span['rows_out'] = len(self.df_anime)
+            except Exception as e:
+                logger.error(f"Failed to load dataset: {e}")
+                return False
 
             logger.info(f"Dataset loaded successfully with {len(self.df_anime)} rows")
 
-            # Basic data cleaning
-            self.df_anime['rating'] = pd.to_numeric(self.df_anime['rating'], errors='coerce')
+            try:
+                with self.tracer.stage('clean', rows_in=len(self.df_anime)) as span:
+                    self.df_anime, genres = clean_anime_frame(self.df_anime)
+                    span['rows_out'] = len(self.df_anime)
+            except ValueError as e:
+                logger.error(str(e))
+                return False
 
-            # Check if essential columns exist
-            essential_cols = ['rating', 'genre', 'name']
-            missing_cols = [col for col in essential_cols if col not in self.df_anime.columns]
+            if self.use_cache:
+                self.cache.save(self.df_anime, genres)
 
-            if missing_cols:
-                logger.error(f"Missing essential columns: {missing_cols}")
+            self.build_genre_index(genres)
+            self.cache_current = self.use_cache
+
+            return True
+
+        except Exception as e:
+            logger.error(f"Error loading data: {e}")
+            return False
+
+    @traced('index')
+    def build_genre_index(self, genres: GenreLists, cooccurrence: CooccurrenceStats = None,
+                          histograms: RatingHistograms = None, rating_stats: GenreRatingStats = None,
+                          ranking: GenreRankingIndex = None):
+        """Attach the per-anime genre lists and the statistics derived from them to the analyzer"""
+        self.genres = genres
+        self.genre_vocab = genres.vocab
+        self.genre_codes = {genre: code for code, genre in enumerate(self.genre_vocab)}
+
+        ratings = self.df_anime['rating'].to_numpy()
+        if cooccurrence is None:
+            cooccurrence = CooccurrenceStats.from_lists(self.genres, ratings)
+        self.cooccurrence = cooccurrence.reindex(self.genre_vocab)
+
+        self.ranking = ranking if ranking is not None else GenreRankingIndex(self.genres, self.ranking_metrics())
+        # Highest rated first; stable so ties keep the dataset order
+        self.rating_order = self.ranking.orders['rating']
+        self.similarity = None
+        self.facets = None
+        self.name_order = None
+        self.names = None
+        self.cache_current = False
+        # Histograms and weighted ratings are merged through deltas like the
+        # co-occurrence statistics, otherwise built on first use
+        self.histograms = histograms.reindex(self.genre_vocab) if histograms is not None else None
+        self.rating_stats = rating_stats.reindex(self.genre_vocab) if rating_stats is not None else None
+        # User ratings are per catalog row and have to be loaded again for the new rows
+        self.user_ratings = None
+        self.user_cooccurrence = None
+        self.user_unrated = None
+        logger.info(f"Genre index built: {len(self.genre_vocab)} genres")
+
+    def members(self, df: pd.DataFrame = None) -> Optional[np.ndarray]:
+        """Member counts of the catalog rows (or of df), NaN where unknown; None without a members column"""
+        df = self.df_anime if df is None else df
+        if 'members' not in df.columns:
+            return None
+        return df['members'].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    def ranking_metrics(self) -> Dict[str, np.ndarray]:
+        """Columns the per-genre ranking index sorts the anime by"""
+        metrics = {'rating': self.df_anime['rating'].to_numpy()}
+        members = self.members()
+        if members is not None:
+            metrics['members'] = members
+        return metrics
+
+    def save_state(self, state_dir: str):
+        """Store the catalog and its genre statistics for later incremental updates"""
+        write_state(state_dir, self.df_anime, self.genres, self.cooccurrence, self.histograms, self.rating_stats)
+
+    def load_state(self, state_dir: str) -> bool:
+        """Restore a catalog saved with save_state instead of loading the CSV"""
+        try:
+            state = read_state(state_dir)
+            if state is None:
                 return False
 
-            # Remove rows with missing essential data
-            initial_count = len(self.df_anime)
-            self.df_anime = self.df_anime.dropna(subset=['rating', 'genre', 'name'])
-            logger.info(f"Removed {initial_count - len(self.df_anime)} rows with missing data")
-
-            # Clean and prepare genre list
-            self.df_anime['genre_list'] = (
-                self.df_anime['genre']
-                .astype(str)
-                .str.split(',')
-                .apply(lambda x: [g.strip() for g in x if g.strip() and g.strip().lower() != 'nan'])
-            )
+            self.df_anime, genres, cooccurrence, histograms, rating_stats = state
+            self.build_genre_index(genres, cooccurrence, histograms, rating_stats)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error loading analysis state: {e}")
+            return False
 
-            # Filter out rows with empty genre lists
-            initial_count = len(self.df_anime)
-            self.df_anime = self.df_anime[self.df_anime['genre_list'].map(len) > 0]
-            logger.info(f"Removed {initial_count - len(self.df_anime)} rows with empty genre lists")
-            logger.info(f"Final dataset has {len(self.df_anime)} valid rows")
+    @traced('aggregate', rows_out=lambda self, result: self.anime_count)
+    def apply_delta(self, delta: pd.DataFrame, removed_ids=()) -> bool:
+        """Apply new, changed or removed anime without recomputing the whole catalog
+
+        `delta` holds raw rows (as read by read_anime_csv) that replace any existing
+        row with the same anime_id; `removed_ids` are dropped. Genre statistics are
+        updated by subtracting the stale rows and adding the new ones, and the
+        ranking index is merged with the sorted new rows. Rating intervals
+        resample the whole catalog, so they are left out of the refreshed genre
+        summary and computed again on the next request for them.
+        """
+        try:
+            stale = stale_rows(self.df_anime, delta, removed_ids)
+            delta_df, delta_genres = clean_anime_frame(delta)
+
+            ratings = self.df_anime['rating'].to_numpy()
+            removed_stats = CooccurrenceStats.from_lists(self.genres.take(stale), ratings[stale])
+            added_stats = CooccurrenceStats.from_lists(delta_genres, delta_df['rating'].to_numpy())
+            cooccurrence = self.cooccurrence.subtract(removed_stats).merge(added_stats)
+            histograms = None
+            if self.histograms is not None:
+                removed_histograms = RatingHistograms.from_lists(self.genres.take(stale), ratings[stale])
+                added_histograms = RatingHistograms.from_lists(delta_genres, delta_df['rating'].to_numpy())
+                histograms = self.histograms.subtract(removed_histograms).merge(added_histograms)
+            rating_stats = None
+            if self.rating_stats is not None:
+                members, delta_members = self.members(), self.members(delta_df)
+                removed_ratings = GenreRatingStats.from_lists(
+                    self.genres.take(stale), ratings[stale], members[stale] if members is not None else None,
+                    intervals=False)
+                added_ratings = GenreRatingStats.from_lists(delta_genres, delta_df['rating'].to_numpy(),
+                                                            delta_members, intervals=False)
+                rating_stats = self.rating_stats.subtract(removed_ratings).merge(added_ratings)
+                if self.rating_prior is not None:
+                    rating_stats = rating_stats.with_priors(*self.rating_prior)
+
+            genres = GenreLists.concat([
+                self.genres.take(~stale).reindex(cooccurrence.vocab),
+                delta_genres.reindex(cooccurrence.vocab),
+            ])
+
+            kept = self.df_anime[~stale]
+            df_anime = pd.concat([kept, delta_df], ignore_index=True)
+            for col in kept.columns:
+                if isinstance(kept[col].dtype, pd.CategoricalDtype):
+                    df_anime[col] = df_anime[col].astype('category')
+
+            self.df_anime = df_anime
+            ranking = self.ranking.update(genres, self.ranking_metrics(), ~stale)
+            self.build_genre_index(genres, cooccurrence, histograms, rating_stats, ranking)
+            logger.info(f"Applied delta: {int(stale.sum())} rows replaced or removed, {len(delta_df)} rows added")
+
+            if self.genre_summary is not None:
+                self.analyze_genres(min_anime_count=self.min_anime_count, rank_by=self.rank_by, intervals=False)
 
             return True
 
         except Exception as e:
-            logger.error(f"Error loading data: {e}")
+            logger.error(f"Error applying delta: {e}")
             return False
 
+    def update_from_csv(self, file_path: str = None) -> bool:
+        """Diff an updated anime.csv against the loaded catalog and apply only the changes"""
+        try:
+            new_df = read_anime_csv(file_path or self.file_path)
+            delta, removed_ids = diff_catalog(self.df_anime, new_df)
+            logger.info(f"Catalog diff: {len(delta)} new or changed rows, {len(removed_ids)} removed")
+            return self.apply_delta(delta, removed_ids)
+
+        except Exception as e:
+            logger.error(f"Error updating from {file_path or self.file_path}: {e}")
+            return False
+
+    @property
+    def anime_count(self) -> int:
+        """Number of anime in the cleaned catalog"""
+        return len(self.df_anime)
+
+    def genre_mask(self, genre: str) -> np.ndarray:
+        """Boolean row mask of the anime tagged with the given genre"""
+        code = self.genre_codes.get(genre)
+        if code is None:
+            return np.zeros(len(self.df_anime), dtype=bool)
+        return self.genres.mask(code)
+
+    def type_mask(self, types: List[str]) -> np.ndarray:
+        """Boolean row mask of the anime whose type is one of the given types"""
+        if 'type' not in self.df_anime.columns:
+            return np.zeros(len(self.df_anime), dtype=bool)
+        return self.df_anime['type'].isin(types).to_numpy()
+
+    def subset(self, mask: np.ndarray) -> 'AnimeAnalyzer':
+        """Indexed analyzer over the selected rows, without reloading the dataset
+
+        Its weighted ratings keep this catalog's prior, like a facet query's.
+        """
+        view = AnimeAnalyzer(self.file_path, use_cache=False, tracer=self.tracer)
+        view.analysis_time, view.report_time = self.analysis_time, self.report_time
+        view.bootstrap_resamples, view.bootstrap_seed = self.bootstrap_resamples, self.bootstrap_seed
+        view.rating_prior = self.rating_statistics(intervals=False).priors
+        view.df_anime = self.df_anime[mask].reset_index(drop=True)
+
+        # Genres that no longer occur are dropped, as a fresh load of these rows would
+        view.build_genre_index(self.genres.take(mask).prune())
+        return view
+
+    @traced('expand', rows_out=lambda self, result: len(self.df_expanded))
     def expand_genres(self):
         """Explode genres into separate rows"""
         try:
+            # One row per (anime, genre) entry, straight from the CSR layout
             self.df_expanded = (
                 self.df_anime.drop('genre', axis=1, errors='ignore')
-                .explode('genre_list')
-                .rename(columns={'genre_list': 'genre'})
-                .dropna(subset=['genre'])
+                .iloc[self.genres.row_ids()]
+                .assign(genre=self.genres.entry_names())
             )
             logger.info("Genres expanded successfully")
         except Exception as e:
             logger.error(f"Error expanding genres: {e}")
             raise
 
-    def analyze_genres(self, min_anime_count: int = 10):
-        """Analyze genres and calculate statistics"""
+    @traced('aggregate', rows_out=lambda self, result: len(self.genre_summary))
+    def analyze_genres(self, min_anime_count: int = 10, rank_by: str = 'weighted_rating', intervals: bool = True):
+        """Analyze genres and calculate statistics; without intervals the bootstrap is skipped"""
         try:
-            self.genre_summary = (
-                self.df_expanded.groupby('genre')['rating']
-                .agg(['mean', 'count', 'std'])
-                .rename(columns={'mean': 'average_rating', 'count': 'anime_count', 'std': 'rating_std'})
-            )
-
-            # Filter and sort
-            self.genre_summary = (
-                self.genre_summary[self.genre_summary['anime_count'] >= min_anime_count]
-                .sort_values(by='average_rating', ascending=False)
-            )
+            self.min_anime_count = min_anime_count
+            self.rank_by = rank_by
+            self.genre_summary = self.summarize_genres(min_anime_count, rank_by=rank_by, intervals=intervals)
 
             self.top_genres = self.genre_summary.head(10).index.tolist()
             logger.info(f"Found {len(self.genre_summary)} genres with at least {min_anime_count} anime")
@@ -131,82 +322,346 @@ class AnimeAnalyzer:
             logger.error(f"Error analyzing genres: {e}")
             raise
 
-    def get_top_anime_for_genre(self, genre: str, top_n: int = 5) -> pd.DataFrame:
-        """Get top anime for a specific genre"""
+    def summarize_genres(self, min_anime_count: int = 10, rank_by: str = 'weighted_rating',
+                         intervals: bool = True) -> pd.DataFrame:
+        """Genre statistics with their rating quantiles, weighted ratings and rating intervals, best ranked first"""
+        stats = self.rating_statistics(intervals=intervals)
+        summary = self.cooccurrence.genre_table().join(self.rating_histograms().genre_table())
+        return rank_genres(summary, stats.genre_table() if stats is not None else None, min_anime_count, rank_by)
+
+    def rating_histograms(self, row_mask: np.ndarray = None, pairs: bool = True) -> RatingHistograms:
+        """Rating histograms of every genre and pair, computed on first use; with a row mask, of the selected anime"""
+        if row_mask is None and self.histograms is not None:
+            return self.histograms
+
+        ratings = self.df_anime['rating'].to_numpy(dtype=np.float64)
+        if row_mask is not None:
+            return RatingHistograms.from_lists(self.genres.take(row_mask), ratings[row_mask], pairs=pairs)
+
+        with self.tracer.stage('rating_histograms', category='aggregate', rows_in=len(ratings)):
+            self.histograms = RatingHistograms.from_lists(self.genres, ratings)
+        return self.histograms
+
+    def rating_statistics(self, row_mask: np.ndarray = None, pairs: bool = True,
+                          intervals: bool = True) -> Optional[GenreRatingStats]:
+        """Weighted ratings and bootstrap rating intervals of every genre and pair, computed on first use
+
+        The weighted ratings of a filtered selection, whether a row mask here
+        or an analyzer made by subset(), are pulled towards the whole catalog's
+        prior rather than one of the selection's own, so a filter never moves a
+        genre's rating by itself. With a row mask the pairs can be skipped.
+        Without intervals only the weighted ratings are computed.
+        """
+        ratings = self.df_anime['rating'].to_numpy(dtype=np.float64)
+        members = self.members()
+
+        if row_mask is None:
+            if self.rating_stats is None:
+                with self.tracer.stage('rating_stats', category='aggregate', rows_in=len(ratings)):
+                    self.rating_stats = GenreRatingStats.from_lists(self.genres, ratings, members, intervals=False)
+                    if self.rating_prior is not None:
+                        self.rating_stats = self.rating_stats.with_priors(*self.rating_prior)
+            if intervals and not self.rating_stats.has_intervals:
+                with self.tracer.stage('rating_intervals', category='aggregate', rows_in=len(ratings),
+                                       resamples=self.bootstrap_resamples):
+                    self.rating_stats = self.rating_stats.with_intervals(self.genres, ratings,
+                                                                         n_resamples=self.bootstrap_resamples,
+                                                                         seed=self.bootstrap_seed)
+            return self.rating_stats
+
+        prior_rating, prior_members, prior_pair_members = self.rating_statistics(intervals=False).priors
+        return GenreRatingStats.from_lists(self.genres.take(row_mask), ratings[row_mask],
+                                           members[row_mask] if members is not None else None,
+                                           n_resamples=self.bootstrap_resamples, seed=self.bootstrap_seed,
+                                           prior_rating=prior_rating, prior_members=prior_members,
+                                           prior_pair_members=prior_pair_members, pairs=pairs, intervals=intervals)
+
+    def load_user_ratings(self, file_path: str, chunk_size: int = USER_RATING_CHUNK_ROWS) -> bool:
+        """Aggregate the user scores of rating.csv per anime, genre and genre pair, chunk by chunk"""
         try:
-            genre_anime = self.df_anime[
-                self.df_anime['genre_list'].apply(lambda x: genre in x)
-            ].copy()
+            if 'anime_id' not in self.df_anime.columns:
+                logger.error("The catalog has no anime_id column to join user ratings on")
+                return False
 
-            if genre_anime.empty:
-                return pd.DataFrame()
+            with self.tracer.stage('load_user_ratings', source=file_path) as span:
+                self.user_ratings = UserRatings.from_csv(file_path, self.df_anime['anime_id'].to_numpy(), chunk_size)
+                self.user_cooccurrence = self.user_ratings.cooccurrence(self.genres)
+                self.user_unrated = self.user_ratings.unrated_cooccurrence(self.genres)
+                span['rows_out'] = self.user_ratings.rows_read
+            return True
 
-            genre_anime = genre_anime.sort_values('rating', ascending=False).head(top_n)
+        except Exception as e:
+            logger.error(f"Error loading user ratings: {e}")
+            return False
 
-            # Select relevant columns that exist
-            possible_cols = ['name', 'rating', 'episodes', 'type', 'members', 'score', 'popularity']
-            available_cols = [col for col in possible_cols if col in genre_anime.columns]
+    def user_genre_summary(self, min_rating_count: int = 1) -> pd.DataFrame:
+        """Per-genre mean user score, score count, score std and watched-but-unrated count"""
+        if self.user_cooccurrence is None:
+            logger.error("User ratings are not loaded")
+            return pd.DataFrame()
 
-            result = genre_anime[available_cols].copy()
-            result = result.reset_index(drop=True)
+        summary = self.user_cooccurrence.genre_table().rename(columns=USER_RATING_COLUMNS)
+        summary['unrated_count'] = np.diagonal(self.user_unrated)
+        return (
+            summary[summary['rating_count'] >= max(min_rating_count, 1)]
+            .sort_values(by='user_rating', ascending=False)
+        )
+
+    def user_side_genres(self, main_genre: str, min_rating_count: int = 1) -> pd.DataFrame:
+        """User score statistics of every genre paired with the main genre"""
+        if self.user_cooccurrence is None:
+            logger.error("User ratings are not loaded")
+            return pd.DataFrame()
 
-            # Round numeric columns
-            numeric_cols = result.select_dtypes(include=[np.number]).columns
-            result[numeric_cols] = result[numeric_cols].round(2)
+        side_summary = self.user_cooccurrence.side_genre_table(main_genre)
+        if side_summary.empty:
+            return pd.DataFrame()
 
-            return result
+        side_summary = side_summary.rename(columns=USER_RATING_COLUMNS)
+        codes = np.array([self.genre_codes[genre] for genre in side_summary.index], dtype=np.intp)
+        side_summary['unrated_count'] = self.user_unrated[self.genre_codes[main_genre], codes]
+        side_summary = (
+            side_summary[side_summary['rating_count'] >= min_rating_count]
+            .sort_values('user_rating', ascending=False)
+        )
+        side_summary[['user_rating', 'user_rating_std']] = side_summary[['user_rating', 'user_rating_std']].round(2)
+        return side_summary.reset_index()
+
+    def facet_index(self) -> FacetIndex:
+        """Facet bitmaps and sorted columns, built on first use"""
+        if self.facets is None:
+            self.facets = FacetIndex(self.df_anime, self.genres)
+        return self.facets
+
+    def facet_mask(self, facets: Dict[str, Any]) -> np.ndarray:
+        """Boolean row mask of the anime matching every facet filter, e.g.
+        {'type': ['TV'], 'episodes': (12, 26), 'members': (10000, None)}"""
+        index = self.facet_index()
+        return index.mask(index.select(facets))
+
+    @traced('aggregate')
+    def faceted_genre_summary(self, facets: Dict[str, Any], min_anime_count: int = None,
+                              rank_by: str = 'weighted_rating', intervals: bool = False) -> pd.DataFrame:
+        """Genre summary of the anime matching the facet filters, without filtering df_anime
+
+        Rating intervals resample the selection on every query, so they are only added on request.
+        """
+        try:
+            index = self.facet_index()
+            selection = index.select(facets)
+            logger.info(f"Facets {facets} match {index.count(selection)} anime")
+            mask = index.mask(selection)
+            stats = self.rating_statistics(mask, pairs=False, intervals=intervals)
+            summary = index.genre_table(selection).join(self.rating_histograms(mask, pairs=False).genre_table())
+            min_anime_count = self.min_anime_count if min_anime_count is None else min_anime_count
+            return rank_genres(summary, stats.genre_table() if stats is not None else None, min_anime_count, rank_by)
 
         except Exception as e:
-            logger.error(f"Error getting top anime for {genre}: {e}")
+            logger.error(f"Error analyzing genres for facets {facets}: {e}")
             return pd.DataFrame()
 
-    def analyze_side_genres(self, main_genre: str, min_count: int = 5) -> pd.DataFrame:
-        """Analyze side genres that appear with the main genre"""
+    def get_top_anime_for_genre(self, genre: str, top_n: int = 5, by: str = 'rating',
+                                facets: Dict[str, Any] = None) -> pd.DataFrame:
+        """Get top anime for a specific genre"""
+        return self.get_top_anime([genre], top_n=top_n, by=by, facets=facets)
+
+    @traced('aggregate')
+    def get_top_anime(self, genres: List[str], top_n: int = 5, by: str = 'rating',
+                      match: str = 'all', facets: Dict[str, Any] = None) -> pd.DataFrame:
+        """Get top anime having all (or any) of the given genres, ranked by rating or members"""
         try:
-            main_genre_anime = self.df_anime[
-                self.df_anime['genre_list'].apply(lambda x: main_genre in x)
-            ].copy()
+            codes = [self.genre_codes[genre] for genre in genres if genre in self.genre_codes]
+            if match == 'all' and len(codes) < len(genres):
+                return pd.DataFrame()
 
-            if len(main_genre_anime) == 0:
+            row_mask = self.facet_mask(facets) if facets else None
+            positions = self.ranking.top(codes, top_n, by=by, match=match, row_mask=row_mask)
+            if len(positions) == 0:
                 return pd.DataFrame()
 
-            # Collect all side genres with their ratings
-            side_genre_data = []
-            for _, row in main_genre_anime.iterrows():
-                for genre in row['genre_list']:
-                    if genre != main_genre:
-                        side_genre_data.append({
-                            'genre': genre,
-                            'rating': row['rating'],
-                            'anime_name': row.get('name', 'Unknown')
-                        })
-
-            if not side_genre_data:
+            return self.format_top_anime(self.df_anime.iloc[positions])
+
+        except Exception as e:
+            logger.error(f"Error getting top anime for {', '.join(genres)}: {e}")
+            return pd.DataFrame()
+
+    def similarity_index(self) -> SimilarityIndex:
+        """Genre similarity index, built on first use since only similarity queries need it"""
+        if self.similarity is None:
+            # Weights scaled to [0, 1]; members are log scaled as they span several orders of magnitude
+            ratings = self.df_anime['rating'].to_numpy(dtype=np.float64)
+            weights = {'rating': ratings / max(np.nanmax(ratings, initial=0), 1e-9)}
+            if 'members' in self.df_anime.columns:
+                members = self.df_anime['members'].to_numpy(dtype=np.float64, na_value=np.nan)
+                members = np.log1p(np.clip(members, 0, None))
+                weights['members'] = members / max(np.nanmax(members, initial=0), 1e-9)
+            self.similarity = SimilarityIndex(self.genres, weights, self.rating_order)
+            # Names in sorted order, stable so a repeated name finds its first row
+            names = self.df_anime['name'].to_numpy(dtype=object)
+            order = np.argsort(names, kind='stable')
+            self.name_order = (names[order], order)
+        return self.similarity
+
+    def anime_position(self, name: str) -> Optional[int]:
+        """Row position of the first anime with the given name, None if there is none"""
+        self.similarity_index()
+        names, order = self.name_order
+        found = np.searchsorted(names, name)
+        if found == len(names) or names[found] != name:
+            return None
+        return int(order[found])
+
+    def build_name_index(self) -> NameIndex:
+        """Title search index of the catalog, popular titles first among equal matches"""
+        column = 'members' if 'members' in self.df_anime.columns else 'rating'
+        popularity = self.df_anime[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        with self.tracer.stage('name_index', category='index', rows_in=len(self.df_anime)):
+            return NameIndex.from_names(self.df_anime['name'], popularity)
+
+    def name_index(self) -> NameIndex:
+        """Title search index, loaded from the dataset cache or built on first use
+
+        Only title searches need it, so it is not built while loading; once
+        built it is added to the dataset cache for later runs.
+        """
+        if self.names is None and self.cache_current:
+            self.names = self.cache.load_names()
+        if self.names is None:
+            self.names = self.build_name_index()
+            if self.cache_current:
+                self.cache.save_names(self.names)
+        return self.names
+
+    def search_anime(self, query: str, limit: int = 10) -> pd.DataFrame:
+        """Anime whose titles best match a typed query, best first
+
+        Matching ignores case, accents, punctuation and HTML entities; the last
+        word may be incomplete and misspelt words match similar ones.
+        """
+        try:
+            positions, scores = self.name_index().search(query, limit)
+            columns = [col for col in ('anime_id', 'name', 'type', 'members') if col in self.df_anime.columns]
+            matches = self.df_anime[columns].iloc[positions].reset_index(drop=True)
+            matches['name'] = matches['name'].astype(str).map(html.unescape)
+            matches['score'] = scores.round(3)
+            return matches
+
+        except Exception as e:
+            logger.error(f"Error searching anime for {query!r}: {e}")
+            return pd.DataFrame()
+
+    @traced('aggregate')
+    def get_similar_anime(self, name: str, top_n: int = 10, measure: str = 'jaccard',
+                          weight: str = None) -> pd.DataFrame:
+        """Anime whose genres are most similar to the named anime's, optionally weighted by rating or members"""
+        try:
+            position = self.anime_position(name)
+            if position is None:
                 return pd.DataFrame()
 
-            # Create DataFrame and calculate statistics
-            side_df = pd.DataFrame(side_genre_data)
-            side_summary = (
-                side_df.groupby('genre')
-                .agg({
-                    'rating': ['mean', 'count', 'std'],
-                    'anime_name': lambda x: list(x)[:3]
-                })
-            )
+            positions, scores = self.similarity_index().top(position, top_n, measure=measure, weight=weight)
+            records = self.top_anime_records(positions)
+            records.insert(1, ('genre', [', '.join(names) for names in self.genres.take(positions).lists()]))
+            records.append(('similarity', scores.round(3)))
+            return pd.DataFrame(dict(records))
+
+        except Exception as e:
+            logger.error(f"Error finding anime similar to {name}: {e}")
+            return pd.DataFrame()
 
-            # Flatten column names
-            side_summary.columns = ['average_rating', 'anime_count', 'rating_std', 'sample_anime']
+    @traced('aggregate', rows_out=lambda self, result: len(result))
+    def precompute_similar_anime(self, top_n: int = 10, measure: str = 'jaccard',
+                                 weight: str = None) -> pd.DataFrame:
+        """Top similar anime of every anime, one row per (anime, neighbour) pair, for offline use"""
+        try:
+            neighbours, scores = self.similarity_index().all_top_k(top_n, measure=measure, weight=weight)
+            found = neighbours >= 0
+            rows, ranks = np.nonzero(found)
+
+            key = 'anime_id' if 'anime_id' in self.df_anime.columns else 'name'
+            keys = self.df_anime[key].to_numpy()
+            return pd.DataFrame({
+                key: keys[rows],
+                'rank': ranks + 1,
+                f'similar_{key}': keys[neighbours[found]],
+                'similarity': scores[found].round(3),
+            })
+
+        except Exception as e:
+            logger.error(f"Error precomputing similar anime: {e}")
+            return pd.DataFrame()
+
+    def top_anime_records(self, positions: np.ndarray) -> List[Tuple[str, Any]]:
+        """Rounded display columns of the given rows as (name, values) pairs, one take per column"""
+        records = []
+        for col in TOP_ANIME_COLUMNS:
+            if col not in self.df_anime.columns:
+                continue
+            values = self.df_anime[col].array.take(positions)
+            if values.dtype.kind == 'f':
+                # Widened first so rounded values print exactly (8.56, not 8.5600004)
+                values = np.round(np.asarray(values, dtype=np.float64), 2)
+            records.append((col, values))
+        return records
+
+    def format_top_anime(self, genre_anime: pd.DataFrame) -> pd.DataFrame:
+        """Keep the display columns of a top anime selection and round its numbers"""
+        # Select relevant columns that exist
+        available_cols = [col for col in TOP_ANIME_COLUMNS if col in genre_anime.columns]
+
+        result = genre_anime[available_cols].copy()
+        result = result.reset_index(drop=True)
+
+        # Widen float32 columns first so rounded values print exactly (8.56, not 8.5600004)
+        float_cols = result.select_dtypes(include=['floating']).columns
+        result[float_cols] = result[float_cols].astype(np.float64)
+
+        # Round numeric columns
+        numeric_cols = result.select_dtypes(include=[np.number]).columns
+        result[numeric_cols] = result[numeric_cols].round(2)
+
+        return result
+
+    @traced('aggregate')
+    def analyze_side_genres(self, main_genre: str, min_count: int = 5, facets: Dict[str, Any] = None,
+                            rank_by: str = 'weighted_rating', intervals: Optional[bool] = None) -> pd.DataFrame:
+        """Analyze side genres that appear with the main genre
+
+        Rating intervals are included by default for the whole catalog, where
+        they are computed once; with facets they resample the selection on
+        every query and are only added with intervals=True.
+        """
+        try:
+            if facets:
+                index = self.facet_index()
+                selection = index.select(facets)
+                side_summary = index.side_genre_table(selection, main_genre)
+                # Only the selected anime of the main genre take part in its pairs
+                mask = index.mask(selection) & self.genre_mask(main_genre)
+                stats = self.rating_statistics(mask, intervals=bool(intervals))
+                histograms = self.rating_histograms(mask)
+            else:
+                side_summary = self.cooccurrence.side_genre_table(main_genre)
+                stats = self.rating_statistics(intervals=intervals is not False)
+                histograms = self.rating_histograms()
+
+            if side_summary.empty:
+                return pd.DataFrame()
+            side_summary = side_summary.join(histograms.side_genre_table(main_genre))
 
             # Filter and sort
-            side_summary = (
-                side_summary[side_summary['anime_count'] >= min_count]
-                .sort_values('average_rating', ascending=False)
-                .head(10)
-            )
+            side_summary = rank_genres(side_summary, stats.side_genre_table(main_genre) if stats is not None else None,
+                                       min_count, rank_by).head(10).copy()
+
+            if facets:
+                samples = self.sample_anime_for_pairs(main_genre, top_k=3, row_mask=index.mask(selection))
+            else:
+                samples = self.sample_anime_for_pairs(main_genre, top_k=3)
+            side_summary['sample_anime'] = [samples[genre] for genre in side_summary.index]
 
             # Round numeric values
-            side_summary['average_rating'] = side_summary['average_rating'].round(2)
-            side_summary['rating_std'] = side_summary['rating_std'].round(2)
+            numeric_cols = side_summary.select_dtypes(include=[np.number]).columns
+            side_summary[numeric_cols] = side_summary[numeric_cols].round(2)
 
             return side_summary.reset_index()
 
@@ -214,6 +669,38 @@ class AnimeAnalyzer:
             logger.error(f"Error analyzing side genres for {main_genre}: {e}")
             return pd.DataFrame()
 
+    @traced('aggregate')
+    def analyze_genre_combinations(self, min_support: float = 10, min_size: int = 2,
+                                   max_size: int = None) -> pd.DataFrame:
+        """Find every frequent genre combination (pairs, triples and larger) with its rating statistics"""
+        try:
+            combinations = frequent_genre_sets(self.genres, self.df_anime['rating'].to_numpy(),
+                                               min_support, min_size=min_size, max_size=max_size)
+            combinations = combinations.sort_values('average_rating', ascending=False, kind='stable')
+
+            # Round numeric values
+            combinations['average_rating'] = combinations['average_rating'].round(2)
+            combinations['rating_std'] = combinations['rating_std'].round(2)
+
+            logger.info(f"Found {len(combinations)} genre combinations with at least {min_support} anime")
+            return combinations.reset_index(drop=True)
+
+        except Exception as e:
+            logger.error(f"Error analyzing genre combinations: {e}")
+            return pd.DataFrame()
+
+    def sample_anime_for_pairs(self, main_genre: str, top_k: int = 3,
+                               row_mask: np.ndarray = None) -> Dict[str, List[str]]:
+        """Highest rated anime names for every (main genre, side genre) pair, optionally among selected rows"""
+        main_rows = self.genre_mask(main_genre)
+        positions = top_k_rows_per_genre(self.genres, self.rating_order, top_k,
+                                         row_mask=main_rows if row_mask is None else main_rows & row_mask)
+        # Only the sampled names are converted, not the whole column
+        names = self.df_anime['name'].take(np.concatenate(positions)).tolist()
+        bounds = np.cumsum([0] + [len(rows) for rows in positions])
+        return {genre: names[bounds[code]:bounds[code + 1]] for code, genre in enumerate(self.genre_vocab)}
+
+    @traced('save')
     def save_to_file(self, content: str, filename: str, subfolder: str = ""):
         """Save content to file"""
         try:
@@ -229,116 +716,221 @@ class AnimeAnalyzer:
         except Exception as e:
             logger.error(f"Error saving file {filename}: {e}")
 
+    @traced('render')
     def create_bar_chart(self, data: pd.DataFrame, title: str, filename: str,
                          x_label: str, y_label: str, x_col: str = 'genre', y_col: str = 'average_rating'):
         """Create and save bar chart with customizable column names"""
         try:
-            plt.figure(figsize=(14, 8))
-
-            if data.empty:
-                plt.text(0.5, 0.5, 'No data available', ha='center', va='center', fontsize=16)
-                plt.title(title, fontsize=16, fontweight='bold')
-                plt.savefig(filename, dpi=300, bbox_inches='tight')
-                plt.close()
-                return
-
-            # Check if required columns exist
-            if x_col not in data.columns or y_col not in data.columns:
-                logger.error(f"Required columns not found: {x_col} or {y_col}")
-                plt.text(0.5, 0.5, 'Data format error', ha='center', va='center', fontsize=16)
-                plt.title(title, fontsize=16, fontweight='bold')
-                plt.savefig(filename, dpi=300, bbox_inches='tight')
-                plt.close()
-                return
-
-            bars = plt.bar(data[x_col], data[y_col],
-                           color=sns.color_palette("husl", len(data)))
-
-            plt.xlabel(x_label, fontsize=12)
-            plt.ylabel(y_label, fontsize=12)
-            plt.title(title, fontsize=16, fontweight='bold', pad=20)
-            plt.xticks(rotation=45, ha='right')
-
-            # Add value labels on bars
-            for bar in bars:
-                height = bar.get_height()
-                plt.text(bar.get_x() + bar.get_width() / 2., height + 0.02,
-                         f'{height:.2f}', ha='center', va='bottom', fontsize=10, fontweight='bold')
-
-            plt.tight_layout()
-            plt.savefig(filename, dpi=300, bbox_inches='tight')
-            plt.close()
-
+            render_bar_chart(data, title, filename, x_label, y_label, x_col, y_col)
         except Exception as e:
             logger.error(f"Error creating chart {filename}: {e}")
 
+    @traced('render')
     def create_table_image(self, data: pd.DataFrame, title: str, filename: str):
         """Create and save table as image"""
         try:
-            plt.figure(figsize=(16, 10))
-            plt.axis('off')
-
-            if data.empty:
-                plt.text(0.5, 0.5, 'No data available', ha='center', va='center', fontsize=16)
-                plt.title(title, fontsize=16, fontweight='bold')
-                plt.savefig(filename, dpi=300, bbox_inches='tight')
-                plt.close()
-                return
-
-            table = plt.table(cellText=data.values,
-                              colLabels=data.columns,
-                              cellLoc='center',
-                              loc='center',
-                              colColours=['#f0f0f0'] * len(data.columns))
-
-            table.auto_set_font_size(False)
-            table.set_fontsize(9)
-            table.scale(1.2, 2)
-
-            # Style header row
-            for i in range(len(data.columns)):
-                table[(0, i)].set_facecolor('#4F81BD')
-                table[(0, i)].set_text_props(weight='bold', color='white')
-
-            plt.title(title, fontsize=16, fontweight='bold', pad=20)
-            plt.tight_layout()
-            plt.savefig(filename, dpi=300, bbox_inches='tight')
-            plt.close()
-
+            render_table_image(data, title, filename)
         except Exception as e:
             logger.error(f"Error creating table {filename}: {e}")
 
     def dataframe_to_markdown_table(self, df: pd.DataFrame) -> str:
         """Convert DataFrame to Markdown table format"""
-        if df.empty:
-            return "*No data available*"
-
-        # Create header
-        headers = df.columns.tolist()
-        header_line = "| " + " | ".join(headers) + " |"
-        separator_line = "|" + "|".join(["---"] * len(headers)) + "|"
-
-        # Create rows
-        rows = []
-        for _, row in df.iterrows():
-            row_str = "| " + " | ".join(str(x) for x in row.values) + " |"
-            rows.append(row_str)
-
-        return "\n".join([header_line, separator_line] + rows)
-
-
-def main():
-    # Configuration
-    DATA_PATH = './dataset/anime.csv'
-    BASE_OUTPUT_DIR = './anime_analysis_output'
-    MIN_ANIME_COUNT = 10
-    TOP_N_GENRES = 5
-
-    # Initialize analyzer
-    analyzer = AnimeAnalyzer(DATA_PATH)
+        return markdown_table(df)
+
+
+# Ratings genres and side genres can be ranked by
+RANKINGS = ('weighted_rating', 'average_rating')
+
+# Columns top anime can be ranked by, members where the dataset has it
+RANKING_METRICS = ('rating', 'members')
+
+
+def rank_genres(summary: pd.DataFrame, intervals: Optional[pd.DataFrame], min_anime_count: int,
+                rank_by: str = 'weighted_rating') -> pd.DataFrame:
+    """Genres with at least min_anime_count anime, joined with their weighted ratings and intervals, best first
+
+    Without intervals (streaming mode) the weighted rating is not known and
+    the average rating ranks instead.
+    """
+    if intervals is not None:
+        summary = summary.join(intervals)
+    elif rank_by == 'weighted_rating':
+        rank_by = 'average_rating'
+    if rank_by not in RANKINGS:
+        raise ValueError(f"Unknown ranking: {rank_by}")
+    return summary[summary['anime_count'] >= min_anime_count].sort_values(by=rank_by, ascending=False)
+
+
+def rating_display(table: pd.DataFrame, genre_label: str) -> pd.DataFrame:
+    """Genre, rating and count columns of a genre table, with Turkish headers, for the report"""
+    display = pd.DataFrame({genre_label: table['genre']})
+    if 'weighted_rating' in table.columns:
+        display['Ağırlıklı Puan'] = table['weighted_rating'].round(2)
+    display['Ortalama Puan'] = table['average_rating'].round(2)
+    if 'rating_median' in table.columns:
+        display['Medyan Puan'] = table['rating_median'].round(2)
+        display['P10 - P90'] = [f"{low:.2f} - {high:.2f}" for low, high in zip(table['rating_p10'], table['rating_p90'])]
+    if 'rating_ci_low' in table.columns:
+        display['%95 Güven Aralığı'] = [f"{low:.2f} - {high:.2f}"
+                                       for low, high in zip(table['rating_ci_low'], table['rating_ci_high'])]
+    display['Anime Sayısı'] = table['anime_count']
+    return display
+
+
+def rating_axis(table: pd.DataFrame, rank_by: str = 'weighted_rating') -> Tuple[str, str, str]:
+    """Y label, x column and y column of a genre bar chart: the rating the table is ranked by"""
+    if rank_by == 'weighted_rating' and 'weighted_rating' in table.columns:
+        return 'Ağırlıklı Puan', 'genre', 'weighted_rating'
+    return 'Ortalama Puan', 'genre', 'average_rating'
+
+
+def genre_section(analyzer: AnimeAnalyzer, i: int, main_genre: str, subdirs: Dict[str, str],
+                  side_min_count: int = 3, rank_by: str = 'weighted_rating') -> Tuple[str, List[RenderJob]]:
+    """Build the report section of one genre and save its anime list
+
+    Returns the Markdown fragment and the render jobs of its charts and tables.
+    """
+    lines = []
+    render_queue = []
+
+    lines.append(f"### {i}. {main_genre}")
+    lines.append("")
+
+    # Top Anime for this genre
+    top_anime = analyzer.get_top_anime_for_genre(main_genre, top_n=5)
+    if not top_anime.empty:
+        lines.append(f"#### 🎞️ {main_genre} Türündeki En İyi 5 Anime")
+        lines.append("")
+        lines.append(markdown_table(top_anime))
+        lines.append("")
+
+        # Save anime list
+        write_text_table(top_anime, os.path.join(subdirs['anime_lists'], f'top_anime_{main_genre}.txt'),
+                         showindex=False, floatfmt=".2f")
+
+        # Save table image
+        render_queue.append(table_image_job(
+            top_anime,
+            f'{main_genre} - En Popüler 5 Anime',
+            os.path.join(subdirs['tables'], f'top_anime_{main_genre}.png')
+        ))
+
+        lines.append(f"![Top Anime for {main_genre}](./tables/top_anime_{main_genre}.png)")
+        lines.append("")
+
+    # Rating distribution, one row per rating point
+    distribution = analyzer.rating_histograms().histogram(main_genre, bin_width=1)
+    if not distribution.empty and distribution['anime_count'].sum() > 0:
+        quantiles = analyzer.rating_histograms().genre_table().loc[main_genre]
+        lines.append(f"#### 📊 {main_genre} Puan Dağılımı")
+        lines.append("")
+        lines.append(f"Medyan: **{quantiles['rating_median']:.2f}**, P10: {quantiles['rating_p10']:.2f}, "
+                     f"P90: {quantiles['rating_p90']:.2f}")
+        lines.append("")
+        distribution = distribution[distribution['anime_count'] > 0]
+        lines.append(markdown_table(pd.DataFrame({
+            'Puan Aralığı': [f"{low:g} - {high:g}" for low, high in zip(distribution['rating_low'],
+                                                                         distribution['rating_high'])],
+            'Anime Sayısı': distribution['anime_count'],
+        })))
+        lines.append("")
+
+    # Side Genres Analysis
+    side_genres = analyzer.analyze_side_genres(main_genre, min_count=side_min_count, rank_by=rank_by)
+    if not side_genres.empty:
+        lines.append(f"#### 🌟 {main_genre} ile En İyi Kombinasyonlar")
+        lines.append("")
+
+        side_display = rating_display(side_genres, 'Yan Tür')
+
+        lines.append(markdown_table(side_display))
+        lines.append("")
+
+        render_queue.append(bar_chart_job(
+            side_genres,
+            f'{main_genre} ile En Çok Sevilen Yan Türler',
+            os.path.join(subdirs['charts'], f'side_genres_{main_genre}.png'),
+            'Yan Türler',
+            *rating_axis(side_genres, rank_by)
+        ))
+
+        lines.append(f"![Side Genres for {main_genre}](./charts/side_genres_{main_genre}.png)")
+        lines.append("")
+
+        # Sample Anime Recommendations
+        lines.append("#### 🎭 Örnek Anime Önerileri")
+        lines.append("")
+
+        for _, side_row in side_genres.head(3).iterrows():
+            side_genre = side_row['genre']
+            lines.append(f"**{main_genre} + {side_genre} kombinasyonu için öneriler:**  ")
+            sample_anime = side_row['sample_anime'][:3]
+            for anime in sample_anime:
+                lines.append(f"- {anime}")
+            lines.append("")
+
+    lines.append("---")
+    lines.append("")
+
+    return "\n".join(lines), render_queue
+
+
+# Analyzer inherited by (fork) or sent once to (spawn) the genre section workers
+_section_analyzer: Optional[AnimeAnalyzer] = None
+
+
+def _init_section_worker(analyzer: Optional[AnimeAnalyzer] = None):
+    global _section_analyzer
+    if analyzer is not None:
+        analyzer.tracer = DISABLED
+        _section_analyzer = analyzer
+
+
+def _section_task(args) -> Tuple[str, List[RenderJob]]:
+    return genre_section(_section_analyzer, *args)
+
+
+def genre_sections(analyzer: AnimeAnalyzer, genres: List[str], subdirs: Dict[str, str], side_min_count: int = 3,
+                   rank_by: str = 'weighted_rating', workers: Optional[int] = 1) -> List[Tuple[str, List[RenderJob]]]:
+    """Build the sections of several genres, in a process pool when more than one worker is requested
+
+    Sections come back in the order of `genres`. Where fork is available the
+    workers share the parent's analyzer copy-on-write; otherwise it is pickled
+    once per worker, never per genre.
+    """
+    tasks = [(i, genre, subdirs, side_min_count, rank_by) for i, genre in enumerate(genres, 1)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        return [genre_section(analyzer, *task) for task in tasks]
+
+    global _section_analyzer
+    # fork is unsafe with the system frameworks on macOS
+    if 'fork' in multiprocessing.get_all_start_methods() and sys.platform != 'darwin':
+        context, initargs = multiprocessing.get_context('fork'), ()
+        _section_analyzer = analyzer
+    else:
+        worker_analyzer = copy.copy(analyzer)
+        worker_analyzer.tracer = None
+        context, initargs = multiprocessing.get_context(), (worker_analyzer,)
 
-    # Create main output directory with timestamp
-    main_output_dir = f"{BASE_OUTPUT_DIR}_{analyzer.analysis_time}"
+    try:
+        with analyzer.tracer.stage('genre_sections', category='section_pool', rows_in=len(tasks), workers=workers):
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_section_worker,
+                                     initargs=initargs) as executor:
+                return list(executor.map(_section_task, tasks))
+    finally:
+        _section_analyzer = None
+
+
+def generate_report(analyzer: AnimeAnalyzer, main_output_dir: str, top_n_genres: int = 5,
+                    side_min_count: int = 3, rank_by: str = 'weighted_rating',
+                    analysis_workers: Optional[int] = 1) -> List[RenderJob]:
+    """Write the Markdown and text reports of an analyzed catalog into main_output_dir
+
+    Charts and tables are not drawn here: their render jobs are returned so that
+    callers can render several reports in one process pool. The per-genre
+    sections are built by analysis_workers processes.
+    """
     os.makedirs(main_output_dir, exist_ok=True)
 
     # Create subdirectories
@@ -352,227 +944,368 @@ def main():
     for subdir in subdirs.values():
         os.makedirs(subdir, exist_ok=True)
 
-    # Load and clean data
-    if not analyzer.load_and_clean_data():
-        print("❌ Veri yüklenirken hata oluştu. Lütfen dosya yolunu kontrol edin.")
-        sys.exit(1)
-
-    # Expand genres and analyze
+    # Charts and tables are queued here and rendered in parallel at the end
+    render_queue = []
+
+    # The report is streamed section by section
+    with MarkdownWriter(os.path.join(main_output_dir, 'comprehensive_report.md')) as report:
+        # Report header
+        report.write("# 🎯 Anime Tür Analiz Raporu")
+        report.write("")
+        report.write(f"**Analiz Tarihi:** {analyzer.report_time}  ")
+        report.write(f"**Toplam Anime Sayısı:** {analyzer.anime_count:,}  ")
+        report.write(f"**Toplam Tür Sayısı:** {len(analyzer.genre_summary)}  ")
+        report.write("")
+
+        # Executive Summary
+        report.write("## 📊 Executive Summary")
+        report.write("")
+        report.write(
+            "Bu rapor, anime türlerinin popülerlik ve puan dağılımlarını analiz etmektedir. Analiz şu bileşenleri içerir:")
+        report.write("- En yüksek puanlı türler")
+        report.write("- Her tür için en popüler animeler")
+        report.write("- Tür kombinasyonları analizi")
+        report.write("- Yan tür önerileri")
+        report.write("")
+
+        # Top Genres Section
+        report.write("## 🏆 En Yüksek Puanlı Türler")
+        report.write("")
+
+        top_genres_table = analyzer.genre_summary.head(top_n_genres).reset_index()
+        top_genres_display = rating_display(top_genres_table, 'Tür')
+
+        report.table(top_genres_display)
+        write_text_table(top_genres_display, os.path.join(subdirs['text_reports'], 'top_genres.txt'))
+        report.write("![Top Genres Chart](./charts/top_genres_chart.png)")
+        report.write("")
+
+        # Save top genres chart
+        render_queue.append(bar_chart_job(
+            top_genres_table,
+            f'En Yüksek Puanlı İlk {top_n_genres} Tür',
+            os.path.join(subdirs['charts'], 'top_genres_chart.png'),
+            'Türler',
+            *rating_axis(top_genres_table, rank_by)
+        ))
+
+        # Detailed Genre Analysis
+        report.write("## 🎬 Detaylı Tür Analizleri")
+        report.write("")
+
+        genres = analyzer.genre_summary.index[:top_n_genres].tolist()
+        for fragment, jobs in genre_sections(analyzer, genres, subdirs, side_min_count, rank_by,
+                                            workers=analysis_workers):
+            report.write(fragment)
+            render_queue.extend(jobs)
+
+        # Frequent Genre Combinations
+        combinations = analyzer.analyze_genre_combinations(min_support=analyzer.min_anime_count)
+        if not combinations.empty:
+            report.write("## 🧩 Sık Görülen Tür Kombinasyonları")
+            report.write("")
+            report.write(f"En az {analyzer.min_anime_count} animede birlikte görülen {len(combinations)} tür kombinasyonu "
+                         f"bulundu. Aynı animeleri kapsayan daha geniş bir kombinasyonu olmayan en yüksek puanlı 10 "
+                         f"kombinasyon:")
+            report.write("")
+
+            combinations_display = pd.DataFrame({
+                'Kombinasyon': combinations['genres'].map(' + '.join),
+                'Tür Sayısı': combinations['size'],
+                'Ortalama Puan': combinations['average_rating'],
+                'Anime Sayısı': combinations['anime_count'],
+            })
+            report.table(combinations_display[closed_genre_sets(combinations)].head(10))
+            write_text_table(combinations_display, os.path.join(subdirs['text_reports'], 'genre_combinations.txt'),
+                             showindex=False)
+
+        # Statistics Section
+        report.write("## 📈 İstatistiksel Özet")
+        report.write("")
+
+        stats_data = {
+            'Metric': [
+                'Toplam Anime',
+                'Toplam Tür',
+                'En Yüksek Puan',
+                'En Düşük Puan',
+                'Ortalama Puan',
+                'Standart Sapma'
+            ],
+            'Value': [
+                f"{analyzer.anime_count:,}",
+                f"{len(analyzer.genre_summary)}",
+                f"{analyzer.genre_summary['average_rating'].max():.2f}",
+                f"{analyzer.genre_summary['average_rating'].min():.2f}",
+                f"{analyzer.genre_summary['average_rating'].mean():.2f}",
+                f"{analyzer.genre_summary['average_rating'].std():.2f}"
+            ]
+        }
+
+        stats_df = pd.DataFrame(stats_data)
+        report.table(stats_df)
+
+        # Methodology Section
+        report.write("## 🔍 Metodoloji")
+        report.write("")
+        report.write("1. **Veri Temizleme:** Eksik ve geçersiz veriler kaldırıldı")
+        report.write("2. **Tür Ayrıştırma:** Virgülle ayrılmış türler bireysel kayıtlara dönüştürüldü")
+        report.write("3. **İstatistiksel Analiz:** Her tür için ortalama puan ve sayımlar hesaplandı; türler, üye "
+                     "sayısıyla ağırlıklandırılmış Bayes puanına (IMDB yöntemi) göre sıralandı ve ortalama puanlar "
+                     f"için {analyzer.bootstrap_resamples} tekrarlı bootstrap ile %95 güven aralıkları hesaplandı; "
+                     "medyan ve P10/P90 puanları her tür ve tür çifti için 0,1 puan genişliğinde sabit aralıklı "
+                     "puan histogramlarından okundu")
+        report.write("4. **Kombinasyon Analizi:** Türler arası ilişkiler incelendi")
+        report.write("5. **Görselleştirme:** Grafikler ve tablolar oluşturuldu")
+        report.write("")
+
+        # Conclusion
+        report.write("## 🎉 Sonuç")
+        report.write("")
+        report.write(
+            "Bu analiz, anime türlerinin performansını ve birbirleriyle olan etkileşimlerini anlamak için kapsamlı bir bakış sunmaktadır. En yüksek puanlı türler ve bunların en iyi kombinasyonları, anime öneri sistemleri için değerli bilgiler sağlamaktadır.")
+        report.write("")
+
+        # Footer
+        report.write("---")
+        report.write("")
+        report.write("*Bu rapor otomatik olarak oluşturulmuştur. Son güncelleme: {}*  ".format(analyzer.report_time))
+        report.write("")
+        report.write("### 📁 Dosya Yapısı")
+        report.write("```")
+        report.write(f"{main_output_dir}/")
+        report.write("├── charts/                 # Grafikler (PNG)")
+        report.write("├── tables/                 # Tablo görselleri (PNG)")
+        report.write("├── text_reports/           # Metin raporları (TXT)")
+        report.write("├── anime_lists/            # Anime listeleri (TXT)")
+        report.write("└── comprehensive_report.md # Bu rapor")
+        report.write("```")
+
+    return render_queue
+
+
+def write_frame(df: pd.DataFrame, output_format: str = 'table', path: str = None):
+    """Print a result as a text table, JSON records or CSV, or write it to a file"""
+    if output_format == 'json':
+        text = df.to_json(orient='records', force_ascii=False)
+    elif output_format == 'csv':
+        text = df.to_csv(index=False)
+    else:
+        text = text_table(df, showindex=False, floatfmt='.2f') if not df.empty else "*No data available*"
+
+    if path is None:
+        print(text.rstrip('\n'))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def open_folder(folder: str):
+    """Open a folder in the platform's file manager"""
+    try:
+        if os.name == 'nt':
+            os.startfile(os.path.abspath(folder))
+            print("📂 Klasör otomatik olarak açılıyor...")
+        elif os.name == 'posix':
+            if sys.platform == 'darwin':
+                subprocess.call(['open', folder])
+            else:
+                subprocess.call(['xdg-open', folder])
+    except Exception as e:
+        print(f"ℹ️ Klasör otomatik açılamadı: {e}")
+        print(f"ℹ️ Lütfen manuel olarak açın: {os.path.abspath(folder)}")
+
+
+COMMANDS = ('analyze', 'top', 'side-genres', 'search', 'report')
+
+
+def add_common_options(parser: argparse.ArgumentParser, suppress_defaults: bool = False):
+    """Options of every command, accepted before the subcommand as well as after it
+
+    The subcommands' copies suppress their defaults, so they do not overwrite
+    values given before the subcommand.
+    """
+    def default(value):
+        return argparse.SUPPRESS if suppress_defaults else value
+
+    parser.add_argument('--data', default=default('./dataset/anime.csv'), help='Path to anime.csv')
+    parser.add_argument('--no-cache', action='store_true', default=default(False),
+                        help='Ignore the on-disk dataset cache')
+    parser.add_argument('--streaming', action='store_true', default=default(False),
+                        help='Chunked, bounded-memory analysis for catalogs larger than RAM')
+    parser.add_argument('--chunk-size', type=int, default=default(100_000), help='Rows per chunk in streaming mode')
+    parser.add_argument('--min-count', type=int, default=default(10), help='Minimum anime count per genre')
+    parser.add_argument('--rank', choices=RANKINGS, default=default('weighted_rating'),
+                        help='Rating genres and side genres are ranked by')
+    parser.add_argument('--resamples', type=int, default=default(BOOTSTRAP_RESAMPLES),
+                        help='Bootstrap resamples behind the rating intervals')
+    parser.add_argument('--seed', type=int, default=default(0), help='Seed of the bootstrap resampling')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Command line of main.py: one subcommand per kind of output, report by default"""
+    common = argparse.ArgumentParser(add_help=False)
+    add_common_options(common, suppress_defaults=True)
+
+    # Results of the query commands go to stdout or a file; nothing is drawn
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--format', choices=('table', 'json', 'csv'), default='table', help='Output format')
+    output.add_argument('--output', default=None, help='Write to this file instead of stdout')
+
+    parser = argparse.ArgumentParser(description='Anime genre analysis: genre statistics, top anime and reports')
+    add_common_options(parser)
+    commands = parser.add_subparsers(dest='command', metavar='{' + ','.join(COMMANDS) + '}')
+
+    analyze = commands.add_parser('analyze', parents=[common, output],
+                                  help='Genre summary: ratings, intervals and counts')
+    analyze.add_argument('--user-ratings', default=None,
+                         help='rating.csv of individual user scores, added as per-genre user score columns')
+
+    top = commands.add_parser('top', parents=[common, output], help='Top anime of one or more genres')
+    top.add_argument('genres', nargs='+', help='Genres the anime must have')
+    top.add_argument('-n', type=int, default=5, help='Number of anime')
+    top.add_argument('--by', choices=RANKING_METRICS, default='rating', help='Column to rank by')
+    top.add_argument('--match', choices=('all', 'any'), default='all', help='Require all or any of the genres')
+
+    side = commands.add_parser('side-genres', parents=[common, output],
+                               help='Genres that appear together with a main genre')
+    side.add_argument('genre', help='Main genre')
+    side.add_argument('--side-min-count', type=int, default=3, help='Minimum anime count per side genre')
+
+    search = commands.add_parser('search', parents=[common, output], help='Find anime by (part of) their title')
+    search.add_argument('query', nargs='+', help='Title words; the last one may be incomplete')
+    search.add_argument('-n', type=int, default=10, help='Number of matches')
+
+    report = commands.add_parser('report', parents=[common], help='Markdown report with charts (the default)')
+    report.add_argument('--output-dir', default=None,
+                        help='Report folder (default: ./anime_analysis_output_<timestamp>)')
+    report.add_argument('--top-n', type=int, default=5, help='Number of genres analyzed in detail')
+    report.add_argument('--side-min-count', type=int, default=3, help='Minimum anime count per side genre')
+    report.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Worker processes for the per-genre sections and for rendering')
+    report.add_argument('--no-render', action='store_true',
+                        help='Write the Markdown and text reports only, without drawing any chart or table image')
+    report.add_argument('--render-cache', default='./.render_cache',
+                        help='Folder of previously rendered images to reuse, empty to disable')
+    report.add_argument('--render-cache-mb', type=int, default=512, help='Render cache size limit in MB')
+    report.add_argument('--open', action='store_true', help='Open the report folder when done')
+    report.add_argument('--profile', action='store_true', help='Also write a cProfile dump (profile.pstats)')
+    report.add_argument('--trace-memory', action='store_true', help='Record tracemalloc allocation peaks per stage')
+    return parser
+
+
+def run_report(analyzer: AnimeAnalyzer, args: argparse.Namespace, tracer: Instrumentation):
+    """The report subcommand: Markdown report, then (unless --no-render) its charts and tables"""
     try:
         analyzer.expand_genres()
-        analyzer.analyze_genres(min_anime_count=MIN_ANIME_COUNT)
+        analyzer.analyze_genres(min_anime_count=args.min_count, rank_by=args.rank)
     except Exception as e:
         print(f"❌ Analiz sırasında hata oluştu: {e}")
         sys.exit(1)
 
-    # Start building Markdown report
-    md_report = []
-
-    # Report header
-    md_report.append("# 🎯 Anime Tür Analiz Raporu")
-    md_report.append("")
-    md_report.append(f"**Analiz Tarihi:** {analyzer.report_time}  ")
-    md_report.append(f"**Toplam Anime Sayısı:** {len(analyzer.df_anime):,}  ")
-    md_report.append(f"**Toplam Tür Sayısı:** {len(analyzer.genre_summary)}  ")
-    md_report.append("")
-
-    # Executive Summary
-    md_report.append("## 📊 Executive Summary")
-    md_report.append("")
-    md_report.append(
-        "Bu rapor, anime türlerinin popülerlik ve puan dağılımlarını analiz etmektedir. Analiz şu bileşenleri içerir:")
-    md_report.append("- En yüksek puanlı türler")
-    md_report.append("- Her tür için en popüler animeler")
-    md_report.append("- Tür kombinasyonları analizi")
-    md_report.append("- Yan tür önerileri")
-    md_report.append("")
-
-    # Top Genres Section
-    md_report.append("## 🏆 En Yüksek Puanlı Türler")
-    md_report.append("")
-
-    top_genres_table = analyzer.genre_summary.head(TOP_N_GENRES).reset_index()
-    top_genres_table['average_rating'] = top_genres_table['average_rating'].round(2)
-    top_genres_display = top_genres_table[['genre', 'average_rating', 'anime_count']].copy()
-    top_genres_display.columns = ['Tür', 'Ortalama Puan', 'Anime Sayısı']
-
-    md_report.append(analyzer.dataframe_to_markdown_table(top_genres_display))
-    md_report.append("")
-    md_report.append(f"![Top Genres Chart](./charts/top_genres_chart.png)")
-    md_report.append("")
-
-    # Save top genres chart
-    analyzer.create_bar_chart(
-        top_genres_table,
-        'En Yüksek Puanlı İlk 5 Tür',
-        os.path.join(subdirs['charts'], 'top_genres_chart.png'),
-        'Türler',
-        'Ortalama Puan',
-        'genre',
-        'average_rating'
-    )
-
-    # Detailed Genre Analysis
-    md_report.append("## 🎬 Detaylı Tür Analizleri")
-    md_report.append("")
-
-    for i, main_genre in enumerate(analyzer.top_genres[:TOP_N_GENRES], 1):
-        md_report.append(f"### {i}. {main_genre}")
-        md_report.append("")
-
-        # Top Anime for this genre
-        top_anime = analyzer.get_top_anime_for_genre(main_genre, top_n=5)
-        if not top_anime.empty:
-            md_report.append(f"#### 🎞️ {main_genre} Türündeki En İyi 5 Anime")
-            md_report.append("")
-            md_report.append(analyzer.dataframe_to_markdown_table(top_anime))
-            md_report.append("")
-
-            # Save anime list
-            anime_text = tabulate(top_anime, headers='keys', tablefmt='grid', showindex=False, floatfmt=".2f")
-            analyzer.save_to_file(anime_text, f'top_anime_{main_genre}.txt', subdirs['anime_lists'])
-
-            # Save table image
-            analyzer.create_table_image(
-                top_anime,
-                f'{main_genre} - En Popüler 5 Anime',
-                os.path.join(subdirs['tables'], f'top_anime_{main_genre}.png')
-            )
+    # Create main output directory with timestamp
+    main_output_dir = args.output_dir or f"./anime_analysis_output_{analyzer.analysis_time}"
+    with tracer.stage('report', rows_in=analyzer.anime_count):
+        render_queue = generate_report(analyzer, main_output_dir, top_n_genres=args.top_n,
+                                       side_min_count=args.side_min_count, rank_by=args.rank,
+                                       analysis_workers=args.workers)
+
+    # Render all queued charts and tables
+    if args.no_render:
+        logger.info(f"Skipping {len(render_queue)} chart and table images")
+    else:
+        with tracer.stage('render_all', category='render_pool', rows_in=len(render_queue), workers=args.workers):
+            render_cache = (RenderCache(args.render_cache, args.render_cache_mb * 2 ** 20)
+                            if args.render_cache else None)
+            render_failures = render_jobs(render_queue, workers=args.workers, tracer=tracer, cache=render_cache)
+        if render_failures:
+            print(f"⚠️ {len(render_failures)} görsel oluşturulamadı:")
+            for job, error in render_failures:
+                print(f"   - {job.filename}: {error}")
+
+    tracer.write(main_output_dir)
 
-            md_report.append(f"![Top Anime for {main_genre}](./tables/top_anime_{main_genre}.png)")
-            md_report.append("")
+    # Final output
+    print(f"\n{'=' * 80}")
+    print("✅ ANALİZ RAPORU TAMAMLANDI")
+    print(f"{'=' * 80}")
+    print(f"📁 Ana çıktı klasörü: {main_output_dir}")
+    print("📄 Markdown Raporu: comprehensive_report.md")
+    if not args.no_render:
+        print("📊 Oluşturulan görseller: charts/ ve tables/ klasörlerinde")
+    print("")
 
-        # Side Genres Analysis
-        side_genres = analyzer.analyze_side_genres(main_genre, min_count=3)
-        if not side_genres.empty:
-            md_report.append(f"#### 🌟 {main_genre} ile En İyi Kombinasyonlar")
-            md_report.append("")
+    if args.open:
+        open_folder(main_output_dir)
 
-            side_display = side_genres[['genre', 'average_rating', 'anime_count']].copy()
-            side_display.columns = ['Yan Tür', 'Ortalama Puan', 'Anime Sayısı']
-            side_display['Ortalama Puan'] = side_display['Ortalama Puan'].round(2)
 
-            md_report.append(analyzer.dataframe_to_markdown_table(side_display))
-            md_report.append("")
+def with_default_command(parser: argparse.ArgumentParser, argv: List[str]) -> List[str]:
+    """argv with 'report' inserted after the leading common options when no subcommand follows them
 
-            analyzer.create_bar_chart(
-                side_genres,
-                f'{main_genre} ile En Çok Sevilen Yan Türler',
-                os.path.join(subdirs['charts'], f'side_genres_{main_genre}.png'),
-                'Yan Türler',
-                'Ortalama Puan',
-                'genre',
-                'average_rating'
-            )
+    Without a subcommand main.py writes the report, as it always has.
+    """
+    position = 0
+    while position < len(argv):
+        action = parser._option_string_actions.get(argv[position].split('=', 1)[0])
+        if action is None:
+            break
+        # Skip the option's value too, unless it is attached with '='
+        position += 2 if action.nargs != 0 and '=' not in argv[position] else 1
 
-            md_report.append(f"![Side Genres for {main_genre}](./charts/side_genres_{main_genre}.png)")
-            md_report.append("")
-
-            # Sample Anime Recommendations
-            md_report.append(f"#### 🎭 Örnek Anime Önerileri")
-            md_report.append("")
-
-            for _, side_row in side_genres.head(3).iterrows():
-                side_genre = side_row['genre']
-                md_report.append(f"**{main_genre} + {side_genre} kombinasyonu için öneriler:**  ")
-                sample_anime = side_row['sample_anime'][:3]
-                for anime in sample_anime:
-                    md_report.append(f"- {anime}")
-                md_report.append("")
-
-        md_report.append("---")
-        md_report.append("")
-
-    # Statistics Section
-    md_report.append("## 📈 İstatistiksel Özet")
-    md_report.append("")
-
-    stats_data = {
-        'Metric': [
-            'Toplam Anime',
-            'Toplam Tür',
-            'En Yüksek Puan',
-            'En Düşük Puan',
-            'Ortalama Puan',
-            'Standart Sapma'
-        ],
-        'Value': [
-            f"{len(analyzer.df_anime):,}",
-            f"{len(analyzer.genre_summary)}",
-            f"{analyzer.genre_summary['average_rating'].max():.2f}",
-            f"{analyzer.genre_summary['average_rating'].min():.2f}",
-            f"{analyzer.genre_summary['average_rating'].mean():.2f}",
-            f"{analyzer.genre_summary['average_rating'].std():.2f}"
-        ]
-    }
+    if position < len(argv) and argv[position] in COMMANDS:
+        return argv
+    return argv[:position] + ['report'] + argv[position:]
 
-    stats_df = pd.DataFrame(stats_data)
-    md_report.append(analyzer.dataframe_to_markdown_table(stats_df))
-    md_report.append("")
-
-    # Methodology Section
-    md_report.append("## 🔍 Metodoloji")
-    md_report.append("")
-    md_report.append("1. **Veri Temizleme:** Eksik ve geçersiz veriler kaldırıldı")
-    md_report.append("2. **Tür Ayrıştırma:** Virgülle ayrılmış türler bireysel kayıtlara dönüştürüldü")
-    md_report.append("3. **İstatistiksel Analiz:** Her tür için ortalama puan ve sayımlar hesaplandı")
-    md_report.append("4. **Kombinasyon Analizi:** Türler arası ilişkiler incelendi")
-    md_report.append("5. **Görselleştirme:** Grafikler ve tablolar oluşturuldu")
-    md_report.append("")
-
-    # Conclusion
-    md_report.append("## 🎉 Sonuç")
-    md_report.append("")
-    md_report.append(
-        "Bu analiz, anime türlerinin performansını ve birbirleriyle olan etkileşimlerini anlamak için kapsamlı bir bakış sunmaktadır. En yüksek puanlı türler ve bunların en iyi kombinasyonları, anime öneri sistemleri için değerli bilgiler sağlamaktadır.")
-    md_report.append("")
-
-    # Footer
-    md_report.append("---")
-    md_report.append("")
-    md_report.append("*Bu rapor otomatik olarak oluşturulmuştur. Son güncelleme: {}*  ".format(analyzer.report_time))
-    md_report.append("")
-    md_report.append("### 📁 Dosya Yapısı")
-    md_report.append("```")
-    md_report.append(f"{main_output_dir}/")
-    md_report.append("├── charts/                 # Grafikler (PNG)")
-    md_report.append("├── tables/                 # Tablo görselleri (PNG)")
-    md_report.append("├── text_reports/           # Metin raporları (TXT)")
-    md_report.append("├── anime_lists/            # Anime listeleri (TXT)")
-    md_report.append("└── comprehensive_report.md # Bu rapor")
-    md_report.append("```")
-
-    # Save Markdown report
-    md_content = "\n".join(md_report)
-    analyzer.save_to_file(md_content, 'comprehensive_report.md', main_output_dir)
-
-    # Also save individual text files
-    analyzer.save_to_file(tabulate(top_genres_display, headers='keys', tablefmt='grid'),
-                          'top_genres.txt', subdirs['text_reports'])
 
-    # Final output
-    print(f"\n{'=' * 80}")
-    print("✅ ANALİZ RAPORU TAMAMLANDI")
-    print(f"{'=' * 80}")
-    print(f"📁 Ana çıktı klasörü: {main_output_dir}")
-    print(f"📄 Markdown Raporu: comprehensive_report.md")
-    print(f"📊 Oluşturulan görseller: charts/ ve tables/ klasörlerinde")
-    print("")
+def main(argv: List[str] = None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = build_parser()
+    args = parser.parse_args(with_default_command(parser, argv))
 
-    # Open output folder
-    try:
-        if os.name == 'nt':
-            os.startfile(os.path.abspath(main_output_dir))
-            print("📂 Klasör otomatik olarak açılıyor...")
-        elif os.name == 'posix':
-            if sys.platform == 'darwin':
-                subprocess.call(['open', main_output_dir])
-            else:
-                subprocess.call(['xdg-open', main_output_dir])
-    except Exception as e:
-        print(f"ℹ️ Klasör otomatik açılamadı: {e}")
-        print(f"ℹ️ Lütfen manuel olarak açın: {os.path.abspath(main_output_dir)}")
+    # Per-stage metrics, written as trace.jsonl / trace.json next to the report
+    report = args.command == 'report'
+    tracer = Instrumentation(enabled=report, profile=report and args.profile,
+                             trace_memory=report and args.trace_memory)
+    tracer.start()
+
+    # Initialize analyzer
+    if args.streaming:
+        from streaming import StreamingAnalyzer
+        analyzer = StreamingAnalyzer(args.data, chunk_size=args.chunk_size, tracer=tracer)
+    else:
+        analyzer = AnimeAnalyzer(args.data, use_cache=not args.no_cache, tracer=tracer)
+    analyzer.bootstrap_resamples, analyzer.bootstrap_seed = args.resamples, args.seed
+
+    # Load and clean data
+    if not analyzer.load_and_clean_data():
+        print("❌ Veri yüklenirken hata oluştu. Lütfen dosya yolunu kontrol edin.")
+        sys.exit(1)
+
+    if report:
+        run_report(analyzer, args, tracer)
+        return
+
+    if args.command == 'analyze':
+        analyzer.analyze_genres(min_anime_count=args.min_count, rank_by=args.rank)
+        result = analyzer.genre_summary
+        if args.user_ratings:
+            if not analyzer.load_user_ratings(args.user_ratings):
+                print("❌ Kullanıcı puanları yüklenemedi.")
+                sys.exit(1)
+            result = result.join(analyzer.user_genre_summary())
+        result = result.reset_index()
+    elif args.command == 'top':
+        try:
+            result = analyzer.get_top_anime(args.genres, top_n=args.n, by=args.by, match=args.match)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    elif args.command == 'search':
+        result = analyzer.search_anime(' '.join(args.query), limit=args.n)
+    else:
+        result = analyzer.analyze_side_genres(args.genre, min_count=args.side_min_count, rank_by=args.rank)
+    write_frame(result, args.format, args.output)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
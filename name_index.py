@@ -0,0 +1,272 @@
+import html
+import logging
+import os
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Tokens are stored as fixed-width UTF-8 bytes; longer ones are cut, on both sides of a lookup
+MAX_TOKEN_BYTES = 32
+# Most vocabulary tokens a prefix or fuzzy query term expands to
+MAX_TERM_TOKENS = 64
+# Most titles scored per query, taken from the postings of its most selective term, most popular first
+MAX_CANDIDATES = 5_000
+# Lowest trigram Dice similarity for a fuzzy token match
+FUZZY_MIN_SIMILARITY = 0.5
+# Quality of a fuzzy match relative to an exact one, times its similarity
+FUZZY_WEIGHT = 0.8
+
+APOSTROPHES = r"['’`]"
+COMBINING_MARKS = r'[\u0300-\u036f]'
+TOKEN_PATTERN = r'[^\W_]+'
+_apostrophes, _combining_marks, _tokens = re.compile(APOSTROPHES), re.compile(COMBINING_MARKS), re.compile(TOKEN_PATTERN)
+# The same rules for ASCII text as a str.translate table: apostrophes dropped, other non-alphanumerics to spaces
+ASCII_SEPARATORS = {code: None if chr(code) in "'`" else ' ' for code in range(128)
+                    if not chr(code).isalnum() and chr(code) != '\n'}
+
+NAME_INDEX_ARRAYS = ('vocab', 'token_offsets', 'token_rows', 'row_offsets', 'row_tokens',
+                     'gram_keys', 'gram_offsets', 'gram_tokens', 'gram_counts', 'positions')
+
+
+def fold_tokens(text: str) -> List[str]:
+    """Tokens of decoded text: accents stripped, case folded, apostrophes dropped, split on everything else"""
+    text = _combining_marks.sub('', unicodedata.normalize('NFKD', text)).casefold()
+    return _tokens.findall(_apostrophes.sub('', text))
+
+
+def name_tokens(name: str) -> List[str]:
+    """Search tokens of a title, HTML entities such as &#039; decoded first
+
+    Apostrophes are dropped rather than split on, so "Kuroko&#039;s" gives "kurokos".
+    """
+    return fold_tokens(html.unescape(name))
+
+
+def names_tokens(names: pd.Series) -> Tuple[np.ndarray, List[str]]:
+    """Row number and text of every token of every title, split as name_tokens() splits them
+
+    Plain ASCII titles, nearly all of them, are lowered, stripped of
+    punctuation and split as one joined string; the rest go one by one.
+    """
+    names = [html.unescape(name) if '&' in name else name for name in names.fillna('').astype(str)]
+    plain = np.fromiter((name.isascii() and '\n' not in name for name in names), dtype=bool, count=len(names))
+    plain_rows = np.flatnonzero(plain)
+
+    text = '\n'.join([names[row] for row in plain_rows]).lower().translate(ASCII_SEPARATORS)
+    tokens = text.split()
+    chars = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    word = (chars != ord(' ')) & (chars != ord('\n'))
+    starts = word.copy()
+    starts[1:] &= ~word[:-1]
+    rows = [plain_rows[np.cumsum(chars == ord('\n'))[starts]]]
+
+    for row in np.flatnonzero(~plain):
+        found = fold_tokens(names[row])
+        tokens.extend(found)
+        rows.append(np.full(len(found), row))
+    return np.concatenate(rows), tokens
+
+
+def encode_tokens(tokens: List[str]) -> np.ndarray:
+    return np.array([token.encode('utf-8')[:MAX_TOKEN_BYTES] for token in tokens], dtype=f'S{MAX_TOKEN_BYTES}')
+
+
+def token_trigrams(tokens: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(token index, trigram key) of every byte trigram of the space-padded tokens"""
+    width = tokens.dtype.itemsize
+    lengths = np.char.str_len(tokens)
+    padded = np.zeros((len(tokens), width + 2), dtype=np.int32)
+    padded[:, 0] = ord(' ')
+    padded[:, 1:width + 1] = tokens.view(np.uint8).reshape(len(tokens), width)
+    padded[np.arange(len(tokens)), lengths + 1] = ord(' ')
+
+    # A token of n bytes has n trigrams once padded; column j holds every token's j-th one
+    owners, keys = [], []
+    for j in range(int(lengths.max(initial=0))):
+        rows = np.flatnonzero(lengths > j)
+        owners.append(rows)
+        keys.append(padded[rows, j] << 16 | padded[rows, j + 1] << 8 | padded[rows, j + 2])
+    if not owners:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(owners).astype(np.int64), np.concatenate(keys).astype(np.int64)
+
+
+def group_offsets(keys: np.ndarray, size: int) -> np.ndarray:
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=offsets[1:])
+    return offsets
+
+
+class NameIndex:
+    """Inverted index from title tokens to catalog rows, with prefix and fuzzy lookup
+
+    Titles are numbered by popularity, most popular first, so every postings
+    list is already in popularity order and a truncated list keeps the best
+    candidates. The token vocabulary is a sorted fixed-width bytes array: an
+    exact token is one binary search and a prefix is the range between two.
+    Tokens with no exact or prefix match fall back to a trigram index over
+    the vocabulary, scored by Dice similarity.
+
+    Query terms are ANDed. Candidates come from the term with the shortest
+    postings and are scored from their own token lists: the mean match
+    quality of the terms (1 exact, less for a prefix or a fuzzy match),
+    scaled down by up to a quarter the less of the title the query covers.
+    Equal scores keep the popularity order. Every array can be saved as .npy
+    and mapped back read-only.
+    """
+
+    def __init__(self, vocab: np.ndarray, token_offsets: np.ndarray, token_rows: np.ndarray,
+                 row_offsets: np.ndarray, row_tokens: np.ndarray, gram_keys: np.ndarray,
+                 gram_offsets: np.ndarray, gram_tokens: np.ndarray, gram_counts: np.ndarray,
+                 positions: np.ndarray):
+        self.vocab = vocab
+        self.token_offsets = token_offsets
+        self.token_rows = token_rows
+        self.row_offsets = row_offsets
+        self.row_tokens = row_tokens
+        self.gram_keys = gram_keys
+        self.gram_offsets = gram_offsets
+        self.gram_tokens = gram_tokens
+        self.gram_counts = gram_counts
+        self.positions = positions
+
+    @classmethod
+    def from_names(cls, names: pd.Series, popularity: Optional[np.ndarray] = None) -> 'NameIndex':
+        """Index the titles of a catalog; popularity (e.g. members) orders ties, missing values last"""
+        n_rows = len(names)
+        if popularity is None:
+            positions = np.arange(n_rows)
+        else:
+            popularity = np.nan_to_num(np.asarray(popularity, dtype=np.float64), nan=-np.inf)
+            positions = np.argsort(-popularity, kind='stable')
+
+        entry_rows, entry_tokens = names_tokens(pd.Series(np.asarray(names, dtype=object)[positions]))
+        codes, uniques = pd.factorize(pd.Series(entry_tokens, dtype=object))
+        vocab, inverse = np.unique(encode_tokens(list(uniques)), return_inverse=True)
+        size = len(vocab)
+
+        # Distinct (row, token) pairs, sorted by row then token
+        pairs = np.sort(entry_rows * size + inverse[codes])
+        pairs = pairs[np.diff(pairs, prepend=-1) != 0]
+        rows, tokens = pairs // size, pairs % size
+        order = np.argsort(tokens, kind='stable')
+
+        owners, keys = token_trigrams(vocab)
+        grams = np.unique(keys << 32 | owners)
+        gram_keys, gram_rows = np.unique(grams >> 32, return_inverse=True)
+        gram_tokens = (grams & 0xFFFFFFFF).astype(np.int32)
+
+        index = cls(vocab, group_offsets(tokens, size), rows[order].astype(np.int32),
+                    group_offsets(rows, n_rows), tokens.astype(np.int32),
+                    gram_keys.astype(np.int32), group_offsets(gram_rows, len(gram_keys)), gram_tokens,
+                    np.bincount(gram_tokens, minlength=size).astype(np.int32), positions.astype(np.int64))
+        logger.info(f"Name index built: {n_rows} titles, {size} tokens, {len(gram_keys)} trigrams")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def save(self, directory: str):
+        for name in NAME_INDEX_ARRAYS:
+            np.save(os.path.join(directory, f'names_{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = None) -> 'NameIndex':
+        return cls(*(np.load(os.path.join(directory, f'names_{name}.npy'), mmap_mode=mmap_mode)
+                     for name in NAME_INDEX_ARRAYS))
+
+    def _candidates(self, tokens: np.ndarray) -> np.ndarray:
+        """Rows having any of the tokens, at most MAX_CANDIDATES of them split evenly between the tokens"""
+        share = -(-MAX_CANDIDATES // len(tokens))
+        starts = self.token_offsets[tokens]
+        stops = np.minimum(self.token_offsets[tokens + 1], starts + share)
+        return np.unique(np.concatenate([self.token_rows[start:stop] for start, stop in zip(starts, stops)]))
+
+    def _frequent(self, tokens: np.ndarray, qualities: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """At most MAX_TERM_TOKENS of the matched tokens, the best matches and most frequent first"""
+        if len(tokens) > MAX_TERM_TOKENS:
+            frequency = self.token_offsets[tokens + 1] - self.token_offsets[tokens]
+            keep = np.lexsort((-frequency, -qualities))[:MAX_TERM_TOKENS]
+            tokens, qualities = tokens[keep], qualities[keep]
+        return tokens, qualities
+
+    def match_term(self, term: bytes, prefix: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Vocabulary tokens matching one query term and the quality of each match, in token order
+
+        An exact token scores 1; with prefix, longer tokens starting with the
+        term score by how much of them it covers; failing both, tokens sharing
+        enough trigrams score FUZZY_WEIGHT x their Dice similarity.
+        """
+        start = int(np.searchsorted(self.vocab, term))
+        if prefix:
+            stop = int(np.searchsorted(self.vocab, term + b'\xff'))
+        else:
+            stop = start + int(start < len(self.vocab) and self.vocab[start] == term)
+
+        if stop > start:
+            tokens = np.arange(start, stop)
+            qualities = 0.5 + 0.5 * len(term) / np.char.str_len(self.vocab[start:stop])
+        else:
+            tokens, qualities = self._fuzzy(term)
+        tokens, qualities = self._frequent(tokens, qualities)
+        order = np.argsort(tokens)
+        return tokens[order], qualities[order]
+
+    def _fuzzy(self, term: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        _, keys = token_trigrams(np.array([term], dtype=f'S{MAX_TOKEN_BYTES}'))
+        keys = np.unique(keys)
+        if len(self.gram_keys) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        found = np.minimum(np.searchsorted(self.gram_keys, keys), len(self.gram_keys) - 1)
+        found = found[self.gram_keys[found] == keys]
+        if len(found) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        lists = [self.gram_tokens[self.gram_offsets[gram]:self.gram_offsets[gram + 1]] for gram in found]
+        tokens, shared = np.unique(np.concatenate(lists), return_counts=True)
+        similarity = 2 * shared / (len(keys) + self.gram_counts[tokens])
+        close = similarity >= FUZZY_MIN_SIMILARITY
+        return tokens[close].astype(np.int64), FUZZY_WEIGHT * similarity[close]
+
+    def search(self, query: str, limit: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Catalog row positions of the best matching titles and their scores in [0, 1], best first
+
+        The last query term also matches as a prefix, so a title can be found
+        while it is being typed. Terms matching no token at all are ignored.
+        """
+        terms = encode_tokens(name_tokens(query))
+        matches = [self.match_term(term, prefix=i == len(terms) - 1) for i, term in enumerate(terms)]
+        matches = [match for match in matches if len(match[0])]
+        if not matches:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # Candidates from the most selective term; the others are checked against each title's tokens
+        sizes = [int((self.token_offsets[tokens + 1] - self.token_offsets[tokens]).sum()) for tokens, _ in matches]
+        tokens, _ = matches[int(np.argmin(sizes))]
+        rows = self._candidates(tokens)
+
+        starts = self.row_offsets[rows]
+        lengths = self.row_offsets[rows + 1] - starts
+        bounds = lengths.cumsum() - lengths
+        entry_tokens = self.row_tokens[np.repeat(starts - bounds, lengths) + np.arange(int(lengths.sum()))]
+
+        quality = np.zeros(len(rows))
+        matched = np.ones(len(rows), dtype=bool)
+        for tokens, qualities in matches:
+            found = np.minimum(np.searchsorted(tokens, entry_tokens), len(tokens) - 1)
+            entry_quality = np.where(tokens[found] == entry_tokens, qualities[found], 0.0)
+            best = np.maximum.reduceat(entry_quality, bounds)
+            quality += best
+            matched &= best > 0
+
+        coverage = np.minimum(len(matches) / lengths, 1.0)
+        scores = (quality / len(matches) * (3 + coverage) / 4)[matched]
+        rows = rows[matched]
+        # Rows are numbered by popularity, so they break ties
+        best = np.lexsort((rows, -scores))[:limit]
+        return self.positions[rows[best]], scores[best]
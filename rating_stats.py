@@ -0,0 +1,462 @@
+import logging
+from statistics import NormalDist
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from genre_index import COOCCURRENCE_BLOCK_ROWS, GenreLists
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_RESAMPLES = 1000
+BOOTSTRAP_CONFIDENCE = 0.95
+# Random draws made per batch of resamples, small enough to stay in cache
+BOOTSTRAP_BLOCK_DRAWS = 1 << 18
+# Larger groups use the normal interval their bootstrap converges to
+BOOTSTRAP_MAX_GROUP = 1000
+# Members backing the prior, as this quantile of the genres' (or, for pairs, the pairs') total members
+PRIOR_MEMBERS_QUANTILE = 0.25
+
+# Rating histograms: fixed 0.1-wide bins over the 0-10 rating scale
+HISTOGRAM_BINS = 100
+HISTOGRAM_RANGE = (0.0, 10.0)
+# Ratings this close below a bin edge count as on it, so float32 ratings such as 6.1 land in their own bin
+BIN_EDGE_TOLERANCE = 1e-5
+# Quantile columns of the genre tables
+RATING_QUANTILES = {'rating_p10': 0.1, 'rating_median': 0.5, 'rating_p90': 0.9}
+
+
+def bayesian_rating(means: np.ndarray, votes: np.ndarray, prior_rating: float, prior_votes: float) -> np.ndarray:
+    """IMDB-style weighted rating: each mean pulled towards the prior rating the fewer votes back it"""
+    return (votes * means + prior_votes * prior_rating) / (votes + prior_votes)
+
+
+def bootstrap_mean_intervals(values: np.ndarray, offsets: np.ndarray, n_resamples: int = BOOTSTRAP_RESAMPLES,
+                             confidence: float = BOOTSTRAP_CONFIDENCE, seed: Optional[int] = None,
+                             max_group: int = BOOTSTRAP_MAX_GROUP,
+                             block_draws: int = BOOTSTRAP_BLOCK_DRAWS) -> Tuple[np.ndarray, np.ndarray]:
+    """Percentile bootstrap interval of the mean of every group values[offsets[i]:offsets[i + 1]]
+
+    All groups are resampled together: a batch of resamples is one
+    (resamples x values) index matrix whose every column draws uniformly from
+    its own group's slice, and np.add.reduceat turns the gathered values into
+    per-group means. Empty groups get NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    sizes = np.diff(offsets)
+    low, high = np.full(len(sizes), np.nan), np.full(len(sizes), np.nan)
+    tail = (1 - confidence) / 2
+
+    # The bootstrap distribution of a large group's mean is normal for all practical purposes
+    large = np.flatnonzero(sizes > max_group)
+    if len(large):
+        totals = np.concatenate([[0.0], np.cumsum(values)])
+        squares = np.concatenate([[0.0], np.cumsum(values * values)])
+        n = sizes[large]
+        means = (totals[offsets[large + 1]] - totals[offsets[large]]) / n
+        variances = np.maximum((squares[offsets[large + 1]] - squares[offsets[large]]) / n - means ** 2, 0)
+        margin = NormalDist().inv_cdf(1 - tail) * np.sqrt(variances / n)
+        low[large], high[large] = means - margin, means + margin
+
+    groups = np.flatnonzero((sizes > 0) & (sizes <= max_group))
+    if len(groups) == 0 or n_resamples <= 0:
+        return low, high
+
+    # Every column of the index matrix: its group's start and its group's size / 2^32
+    group_sizes = sizes[groups]
+    starts = np.repeat(offsets[groups], group_sizes)
+    scales = np.repeat(group_sizes * 2.0 ** -32, group_sizes)
+    bounds = np.cumsum(group_sizes) - group_sizes
+    n_draws = len(starts)
+
+    rng = np.random.default_rng(seed)
+    batch = max(1, block_draws // n_draws)
+    means = np.empty((n_resamples, len(groups)))
+    for first in range(0, n_resamples, batch):
+        count = min(batch, n_resamples - first)
+        # Raw 32-bit draws scaled to [0, size): much cheaper than generating floats
+        draws = rng.bit_generator.random_raw(-(-count * n_draws // 2)).view(np.uint32)[:count * n_draws]
+        index = np.multiply(draws.reshape(count, n_draws), scales, out=np.empty((count, n_draws), dtype=np.intp),
+                            casting='unsafe')
+        index += starts
+        means[first:first + count] = np.add.reduceat(values[index], bounds, axis=1)
+    means /= group_sizes
+
+    low[groups], high[groups] = np.quantile(means, [tail, 1 - tail], axis=0)
+    return low, high
+
+
+def prior_votes(totals: np.ndarray, quantile: float = PRIOR_MEMBERS_QUANTILE) -> float:
+    """Votes backing the prior: the given quantile of the non-empty groups' vote totals"""
+    totals = totals[totals > 0]
+    return float(np.quantile(totals, quantile)) if len(totals) else 0.0
+
+
+def _symmetric(cells: np.ndarray, size: int) -> np.ndarray:
+    """Genre x genre matrix of cells filled on and above the diagonal only"""
+    matrix = cells.reshape(size, size)
+    return np.triu(matrix) + np.triu(matrix, 1).T
+
+
+def _rating_cells(genres: GenreLists, pairs: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """Row and flat genre x genre cell of every unordered pair of a row's genres, each genre with itself too"""
+    size = len(genres.vocab)
+    first, second = genres.pair_entries()
+    codes = genres.codes.astype(np.intp)
+    keep = codes[first] <= codes[second] if pairs else first == second
+    return genres.row_ids()[first[keep]], codes[first[keep]] * size + codes[second[keep]]
+
+
+class GenreRatingStats:
+    """Bayesian-weighted ratings and bootstrap intervals of every genre and genre pair
+
+    Laid out like CooccurrenceStats: genre x genre matrices whose diagonal
+    holds the genres and whose off-diagonal cells hold the pairs. The weighted
+    rating treats members as votes, IMDB style, so a group's average rating is
+    pulled towards the catalog mean unless enough members back it; genres and
+    pairs each have their own prior weight, since a pair is backed by far
+    fewer members than a whole genre. The interval is a percentile bootstrap
+    of the group's average rating.
+
+    The counts, rating sums and member totals add up over disjoint sets of
+    anime, so the weighted ratings follow catalog deltas through merge() and
+    subtract(). The intervals resample individual ratings and are only
+    computed on request, by with_intervals().
+    """
+
+    def __init__(self, vocab: List[str], counts: np.ndarray, sums: np.ndarray, member_totals: np.ndarray,
+                 n_rows: int, rating_total: float, prior_rating: Optional[float] = None,
+                 prior_members: Optional[float] = None, prior_pair_members: Optional[float] = None,
+                 ci_low: Optional[np.ndarray] = None, ci_high: Optional[np.ndarray] = None):
+        self.vocab = list(vocab)
+        self.codes = {genre: code for code, genre in enumerate(self.vocab)}
+        self.counts = counts
+        self.sums = sums
+        self.member_totals = member_totals
+        self.n_rows = n_rows
+        self.rating_total = rating_total
+        self.ci_low = ci_low
+        self.ci_high = ci_high
+
+        # The prior defaults to the catalog's mean rating, backed by the
+        # PRIOR_MEMBERS_QUANTILE of the genres' (or the pairs') total members
+        diagonal = np.eye(len(self.vocab), dtype=bool)
+        if prior_rating is None:
+            prior_rating = rating_total / n_rows if n_rows else 0.0
+        if prior_members is None:
+            prior_members = prior_votes(member_totals[diagonal])
+        if prior_pair_members is None:
+            prior_pair_members = prior_votes(np.triu(member_totals, 1).ravel())
+        self.prior_rating = float(prior_rating)
+        self.prior_members = float(prior_members)
+        self.prior_pair_members = float(prior_pair_members)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weighted = bayesian_rating(sums / counts, member_totals, self.prior_rating,
+                                       np.where(diagonal, self.prior_members, self.prior_pair_members))
+        self.weighted = np.where(counts > 0, weighted, 0.0)
+
+    @classmethod
+    def from_lists(cls, genres: GenreLists, ratings: np.ndarray, members: Optional[np.ndarray] = None,
+                   n_resamples: int = BOOTSTRAP_RESAMPLES, confidence: float = BOOTSTRAP_CONFIDENCE,
+                   seed: Optional[int] = 0, prior_rating: Optional[float] = None,
+                   prior_members: Optional[float] = None, prior_pair_members: Optional[float] = None,
+                   pairs: bool = True, intervals: bool = True) -> 'GenreRatingStats':
+        """Statistics of every genre and, unless pairs is False, every pair
+
+        Without members every anime counts as one vote. Unless intervals is
+        False the bootstrap intervals are computed as well.
+        """
+        size = len(genres.vocab)
+        ratings = np.asarray(ratings, dtype=np.float64)
+        votes = np.ones(len(ratings)) if members is None else np.nan_to_num(np.asarray(members, dtype=np.float64))
+
+        rows, cells = _rating_cells(genres, pairs)
+        counts = np.bincount(cells, minlength=size * size)
+        sums = np.bincount(cells, weights=ratings[rows], minlength=size * size)
+        member_totals = np.bincount(cells, weights=votes[rows], minlength=size * size)
+
+        stats = cls(genres.vocab, _symmetric(counts, size), _symmetric(sums, size), _symmetric(member_totals, size),
+                    len(ratings), float(ratings.sum()), prior_rating, prior_members, prior_pair_members)
+        if intervals:
+            stats = stats.with_intervals(genres, ratings, n_resamples, confidence, seed, pairs)
+        return stats
+
+    @property
+    def has_intervals(self) -> bool:
+        return self.ci_low is not None
+
+    @property
+    def priors(self) -> Tuple[float, float, float]:
+        """Prior rating and the members backing it for genres and for pairs"""
+        return self.prior_rating, self.prior_members, self.prior_pair_members
+
+    def with_priors(self, prior_rating: float, prior_members: float,
+                    prior_pair_members: float) -> 'GenreRatingStats':
+        """These statistics weighted towards another prior"""
+        return GenreRatingStats(self.vocab, self.counts, self.sums, self.member_totals, self.n_rows,
+                                self.rating_total, prior_rating, prior_members, prior_pair_members,
+                                self.ci_low, self.ci_high)
+
+    def with_intervals(self, genres: GenreLists, ratings: np.ndarray, n_resamples: int = BOOTSTRAP_RESAMPLES,
+                       confidence: float = BOOTSTRAP_CONFIDENCE, seed: Optional[int] = 0,
+                       pairs: bool = True) -> 'GenreRatingStats':
+        """These statistics with bootstrap rating intervals, resampled from the rows they describe"""
+        size = len(self.vocab)
+        ratings = np.asarray(ratings, dtype=np.float64)
+
+        # Rows in rating order, so each group's sequence of ratings, and with it
+        # every interval, is the same whatever order the catalog rows are in
+        order = np.argsort(ratings, kind='stable')
+        genres, ratings = genres.take(order).reindex(self.vocab), ratings[order]
+        rows, cells = _rating_cells(genres, pairs)
+
+        # Ratings laid out cell by cell, so every cell is one contiguous group
+        offsets = np.zeros(size * size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=size * size), out=offsets[1:])
+        # Cells fitting 16 bits are radix sorted, several times faster than a comparison sort
+        keys = cells.astype(np.uint16) if size * size <= 1 << 16 else cells
+        values = ratings[rows[np.argsort(keys, kind='stable')]]
+        ci_low, ci_high = bootstrap_mean_intervals(values, offsets, n_resamples, confidence, seed)
+
+        logger.info(f"Rating intervals computed: {int((np.diff(offsets) > 0).sum())} genres and pairs, "
+                    f"{n_resamples} resamples")
+        return GenreRatingStats(self.vocab, self.counts, self.sums, self.member_totals, self.n_rows,
+                                self.rating_total, self.prior_rating, self.prior_members, self.prior_pair_members,
+                                _symmetric(np.nan_to_num(ci_low), size), _symmetric(np.nan_to_num(ci_high), size))
+
+    def reindex(self, vocab: List[str]) -> 'GenreRatingStats':
+        """Same statistics laid out over another vocabulary; genres missing here get zeros"""
+        if vocab == self.vocab:
+            return self
+        positions = {genre: code for code, genre in enumerate(vocab)}
+        shared = [genre for genre in self.vocab if genre in positions]
+        source = np.array([self.codes[genre] for genre in shared], dtype=np.intp)
+        target = np.array([positions[genre] for genre in shared], dtype=np.intp)
+
+        matrices = {}
+        for name in ('counts', 'sums', 'member_totals', 'ci_low', 'ci_high'):
+            matrix = getattr(self, name)
+            if matrix is not None:
+                matrices[name] = np.zeros((len(vocab), len(vocab)), dtype=matrix.dtype)
+                matrices[name][np.ix_(target, target)] = matrix[np.ix_(source, source)]
+            else:
+                matrices[name] = None
+
+        return GenreRatingStats(vocab, matrices['counts'], matrices['sums'], matrices['member_totals'], self.n_rows,
+                                self.rating_total, self.prior_rating, self.prior_members, self.prior_pair_members,
+                                matrices['ci_low'], matrices['ci_high'])
+
+    def merge(self, other: 'GenreRatingStats') -> 'GenreRatingStats':
+        """Statistics of the union of two disjoint sets of anime, without intervals; the prior is derived anew"""
+        vocab = sorted(set(self.vocab) | set(other.vocab))
+        left, right = self.reindex(vocab), other.reindex(vocab)
+        return GenreRatingStats(vocab, left.counts + right.counts, left.sums + right.sums,
+                                left.member_totals + right.member_totals, self.n_rows + other.n_rows,
+                                self.rating_total + other.rating_total)
+
+    def subtract(self, other: 'GenreRatingStats') -> 'GenreRatingStats':
+        """Statistics with a subset of the anime removed, without intervals; the prior is derived anew
+
+        Genres left without any anime are dropped, as a full recompute would not see them.
+        """
+        right = other.reindex(self.vocab)
+        counts = self.counts - right.counts
+        # Clear rounding residue left in cells that no longer have any anime
+        sums = np.where(counts > 0, self.sums - right.sums, 0.0)
+        member_totals = np.where(counts > 0, self.member_totals - right.member_totals, 0.0)
+        result = GenreRatingStats(self.vocab, counts, sums, member_totals, self.n_rows - other.n_rows,
+                                  self.rating_total - other.rating_total)
+        return result.reindex([genre for code, genre in enumerate(self.vocab) if counts[code, code] > 0])
+
+    def _table(self, codes: np.ndarray, main_code: Optional[int] = None) -> pd.DataFrame:
+        """Weighted ratings, and intervals once computed, of the genres or of their pairs with main_code"""
+        cells = (codes, codes) if main_code is None else (main_code, codes)
+        columns = {'weighted_rating': self.weighted[cells]}
+        if self.has_intervals:
+            columns['rating_ci_low'] = self.ci_low[cells]
+            columns['rating_ci_high'] = self.ci_high[cells]
+        return pd.DataFrame(columns, index=pd.Index(np.asarray(self.vocab, dtype=object)[codes], name='genre'))
+
+    def genre_table(self) -> pd.DataFrame:
+        """Weighted rating and rating interval of every genre present"""
+        return self._table(np.flatnonzero(np.diagonal(self.counts) > 0))
+
+    def side_genre_table(self, main_genre: str) -> pd.DataFrame:
+        """Weighted rating and rating interval of every genre paired with the main genre"""
+        code = self.codes.get(main_genre)
+        if code is None:
+            return pd.DataFrame()
+
+        codes = np.flatnonzero(self.counts[code] > 0)
+        return self._table(codes[codes != code], code)
+
+
+def rating_bins(ratings: np.ndarray, bins: int = HISTOGRAM_BINS,
+                rating_range: Tuple[float, float] = HISTOGRAM_RANGE) -> np.ndarray:
+    """Histogram bin of every rating; ratings outside the range go to the first or last bin"""
+    low, high = rating_range
+    scaled = (np.asarray(ratings, dtype=np.float64) - low) * (bins / (high - low)) + BIN_EDGE_TOLERANCE
+    return np.clip(np.floor(scaled), 0, bins - 1).astype(np.intp)
+
+
+def histogram_quantiles(counts: np.ndarray, quantiles: Sequence[float],
+                        rating_range: Tuple[float, float] = HISTOGRAM_RANGE) -> np.ndarray:
+    """Quantiles of every histogram along the last axis, interpolated linearly within a bin
+
+    Returns one trailing column per quantile; empty histograms give NaN. The
+    error is at most one bin width, 0.1 points with the default bins.
+    """
+    low, high = rating_range
+    bins = counts.shape[-1]
+    flat = counts.reshape(-1, bins)
+    cumulative = np.cumsum(flat, axis=1)
+    totals = cumulative[:, -1]
+    result = np.full((len(flat), len(quantiles)), np.nan)
+
+    for column, quantile in enumerate(quantiles):
+        # A positive target skips leading empty bins even for the 0 quantile
+        target = np.maximum(quantile * totals, np.finfo(np.float64).tiny)
+        found = np.minimum((cumulative < target[:, None]).sum(axis=1), bins - 1)
+        in_bin = np.take_along_axis(flat, found[:, None], axis=1)[:, 0]
+        before = np.take_along_axis(cumulative, found[:, None], axis=1)[:, 0] - in_bin
+        with np.errstate(divide='ignore', invalid='ignore'):
+            position = found + np.clip((target - before) / in_bin, 0, 1)
+        result[:, column] = np.where(totals > 0, low + position * (high - low) / bins, np.nan)
+
+    return result.reshape(counts.shape[:-1] + (len(quantiles),))
+
+
+class RatingHistograms:
+    """Fixed-bin rating histograms of every genre and genre pair
+
+    Laid out like CooccurrenceStats, with one more axis: counts[i, j] is the
+    histogram of the anime tagged with both genres i and j, and the diagonal
+    holds the genres. Histograms of disjoint sets of anime add up, so chunks,
+    processes and catalog deltas are combined with merge() and subtract()
+    exactly, without keeping any per-anime rating. Medians and other
+    quantiles are read off the cumulative counts.
+    """
+
+    def __init__(self, vocab: List[str], counts: np.ndarray, rating_range: Tuple[float, float] = HISTOGRAM_RANGE):
+        self.vocab = list(vocab)
+        self.codes = {genre: code for code, genre in enumerate(self.vocab)}
+        self.counts = counts
+        self.rating_range = tuple(rating_range)
+
+    @property
+    def bins(self) -> int:
+        return self.counts.shape[-1]
+
+    @classmethod
+    def from_lists(cls, genres: GenreLists, ratings: np.ndarray, bins: int = HISTOGRAM_BINS,
+                   rating_range: Tuple[float, float] = HISTOGRAM_RANGE, pairs: bool = True,
+                   block_rows: int = COOCCURRENCE_BLOCK_ROWS) -> 'RatingHistograms':
+        """Histograms of every genre and, unless pairs is False, every pair: one bincount over (cell, bin)"""
+        size = len(genres.vocab)
+        row_bins = rating_bins(ratings, bins, rating_range)
+        counts = np.zeros(size * size * bins, dtype=np.int64)
+
+        for start in range(0, len(genres), block_rows):
+            block = genres.row_block(start, start + block_rows)
+            first, second = block.pair_entries() if pairs else (np.arange(len(block.codes)),) * 2
+
+            codes = block.codes.astype(np.intp)
+            cells = (codes[first] * size + codes[second]) * bins
+            counts += np.bincount(cells + row_bins[start + block.row_ids()[first]], minlength=len(counts))
+
+        return cls(genres.vocab, counts.reshape(size, size, bins), rating_range)
+
+    @classmethod
+    def empty(cls, vocab: List[str], bins: int = HISTOGRAM_BINS,
+              rating_range: Tuple[float, float] = HISTOGRAM_RANGE) -> 'RatingHistograms':
+        size = len(vocab)
+        return cls(vocab, np.zeros((size, size, bins), dtype=np.int64), rating_range)
+
+    def reindex(self, vocab: List[str]) -> 'RatingHistograms':
+        """Same histograms laid out over another vocabulary; genres missing here get empty ones"""
+        result = RatingHistograms.empty(vocab, self.bins, self.rating_range)
+        shared = [genre for genre in self.vocab if genre in result.codes]
+        source = np.array([self.codes[genre] for genre in shared], dtype=np.intp)
+        target = np.array([result.codes[genre] for genre in shared], dtype=np.intp)
+        result.counts[np.ix_(target, target)] = self.counts[np.ix_(source, source)]
+        return result
+
+    def _check_compatible(self, other: 'RatingHistograms'):
+        if other.bins != self.bins or other.rating_range != self.rating_range:
+            raise ValueError(f"Histograms with different bins cannot be combined: {self.bins} bins over "
+                             f"{self.rating_range} and {other.bins} bins over {other.rating_range}")
+
+    def merge(self, other: 'RatingHistograms') -> 'RatingHistograms':
+        """Histograms of the union of two disjoint sets of anime"""
+        self._check_compatible(other)
+        vocab = sorted(set(self.vocab) | set(other.vocab))
+        left, right = self.reindex(vocab), other.reindex(vocab)
+        return RatingHistograms(vocab, left.counts + right.counts, self.rating_range)
+
+    def subtract(self, other: 'RatingHistograms') -> 'RatingHistograms':
+        """Histograms with a subset of the anime removed; genres left without any anime are dropped"""
+        self._check_compatible(other)
+        counts = self.counts - other.reindex(self.vocab).counts
+        result = RatingHistograms(self.vocab, counts, self.rating_range)
+        present = counts[np.arange(len(self.vocab)), np.arange(len(self.vocab))].sum(axis=1) > 0
+        return result.reindex([genre for genre, keep in zip(self.vocab, present) if keep])
+
+    def to_dict(self) -> Dict:
+        """JSON-ready form: vocabulary, bins, range and the non-zero cells as flat indices and counts"""
+        flat = self.counts.ravel()
+        cells = np.flatnonzero(flat)
+        return {'vocab': self.vocab, 'bins': self.bins, 'range': list(self.rating_range),
+                'cells': cells.tolist(), 'counts': flat[cells].tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RatingHistograms':
+        result = cls.empty(data['vocab'], data['bins'], tuple(data['range']))
+        result.counts.ravel()[np.asarray(data['cells'], dtype=np.intp)] = data['counts']
+        return result
+
+    def edges(self) -> np.ndarray:
+        low, high = self.rating_range
+        return np.linspace(low, high, self.bins + 1)
+
+    def quantiles(self, quantiles: Sequence[float]) -> np.ndarray:
+        """Genre x genre x quantile matrix of rating quantiles, NaN where a cell has no anime"""
+        return histogram_quantiles(self.counts, quantiles, self.rating_range)
+
+    def _table(self, codes: np.ndarray, histograms: np.ndarray) -> pd.DataFrame:
+        values = histogram_quantiles(histograms, list(RATING_QUANTILES.values()), self.rating_range)
+        return pd.DataFrame(values, columns=list(RATING_QUANTILES),
+                            index=pd.Index(np.asarray(self.vocab, dtype=object)[codes], name='genre'))
+
+    def genre_table(self) -> pd.DataFrame:
+        """10th percentile, median and 90th percentile rating of every genre present"""
+        diagonal = self.counts[np.arange(len(self.vocab)), np.arange(len(self.vocab))]
+        codes = np.flatnonzero(diagonal.sum(axis=1) > 0)
+        return self._table(codes, diagonal[codes])
+
+    def side_genre_table(self, main_genre: str) -> pd.DataFrame:
+        """Rating quantiles of every genre paired with the main genre"""
+        code = self.codes.get(main_genre)
+        if code is None:
+            return pd.DataFrame()
+
+        codes = np.flatnonzero(self.counts[code].sum(axis=1) > 0)
+        codes = codes[codes != code]
+        return self._table(codes, self.counts[code, codes])
+
+    def histogram(self, genre: str, other_genre: Optional[str] = None, bin_width: Optional[float] = None) -> pd.DataFrame:
+        """Anime count per rating bin of a genre or a genre pair; bin_width merges bins into wider ones"""
+        first, second = self.codes.get(genre), self.codes.get(other_genre or genre)
+        if first is None or second is None:
+            return pd.DataFrame()
+
+        low, high = self.rating_range
+        group = 1 if bin_width is None else max(1, int(round(bin_width * self.bins / (high - low))))
+        if self.bins % group:
+            raise ValueError(f"A bin width of {bin_width} does not divide the {self.bins} histogram bins")
+
+        counts = self.counts[first, second].reshape(-1, group).sum(axis=1)
+        edges = self.edges()[::group]
+        return pd.DataFrame({'rating_low': edges[:-1].round(2), 'rating_high': edges[1:].round(2),
+                             'anime_count': counts})
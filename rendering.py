@@ -0,0 +1,309 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+# matplotlib and seaborn are imported by the renderers only, so runs that
+# draw nothing never pay for loading them
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+logger = logging.getLogger(__name__)
+
+# Applied per figure so worker processes render exactly like the main process
+RC_PARAMS = {
+    'font.family': 'DejaVu Sans',
+    'axes.unicode_minus': False,
+}
+
+DPI = 300
+
+# Bump when the renderers change so cached images are not reused
+RENDER_CACHE_VERSION = 1
+
+
+class RenderJob(NamedTuple):
+    kind: str
+    filename: str
+    params: Dict[str, Any]
+
+
+def _new_figure(figsize: Tuple[int, int]) -> 'Figure':
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _save_placeholder(figure: 'Figure', ax, message: str, title: str, filename: str):
+    ax.text(0.5, 0.5, message, ha='center', va='center', fontsize=16, transform=ax.transAxes)
+    ax.set_title(title, fontsize=16, fontweight='bold')
+    figure.savefig(filename, dpi=DPI, bbox_inches='tight')
+
+
+def render_bar_chart(data: pd.DataFrame, title: str, filename: str, x_label: str, y_label: str,
+                     x_col: str = 'genre', y_col: str = 'average_rating'):
+    """Render a bar chart to a PNG file without touching pyplot state"""
+    import matplotlib
+    import seaborn as sns
+
+    with matplotlib.rc_context(RC_PARAMS):
+        figure = _new_figure((14, 8))
+        ax = figure.add_subplot()
+
+        if data.empty:
+            _save_placeholder(figure, ax, 'No data available', title, filename)
+            return
+
+        # Check if required columns exist
+        if x_col not in data.columns or y_col not in data.columns:
+            logger.error(f"Required columns not found: {x_col} or {y_col}")
+            _save_placeholder(figure, ax, 'Data format error', title, filename)
+            return
+
+        bars = ax.bar(data[x_col], data[y_col], color=sns.color_palette("husl", len(data)))
+
+        ax.set_xlabel(x_label, fontsize=12)
+        ax.set_ylabel(y_label, fontsize=12)
+        ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+        ax.tick_params(axis='x', labelrotation=45)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment('right')
+
+        # Add value labels on bars
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width() / 2., height + 0.02,
+                    f'{height:.2f}', ha='center', va='bottom', fontsize=10, fontweight='bold')
+
+        figure.tight_layout()
+        figure.savefig(filename, dpi=DPI, bbox_inches='tight')
+
+
+def render_table_image(data: pd.DataFrame, title: str, filename: str):
+    """Render a table to a PNG file without touching pyplot state"""
+    import matplotlib
+
+    with matplotlib.rc_context(RC_PARAMS):
+        figure = _new_figure((16, 10))
+        ax = figure.add_subplot()
+        ax.axis('off')
+
+        if data.empty:
+            _save_placeholder(figure, ax, 'No data available', title, filename)
+            return
+
+        table = ax.table(cellText=data.values,
+                         colLabels=data.columns,
+                         cellLoc='center',
+                         loc='center',
+                         colColours=['#f0f0f0'] * len(data.columns))
+
+        table.auto_set_font_size(False)
+        table.set_fontsize(9)
+        table.scale(1.2, 2)
+
+        # Style header row
+        for i in range(len(data.columns)):
+            table[(0, i)].set_facecolor('#4F81BD')
+            table[(0, i)].set_text_props(weight='bold', color='white')
+
+        ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+        figure.tight_layout()
+        figure.savefig(filename, dpi=DPI, bbox_inches='tight')
+
+
+RENDERERS = {
+    'bar_chart': render_bar_chart,
+    'table_image': render_table_image,
+}
+
+
+def bar_chart_job(data: pd.DataFrame, title: str, filename: str, x_label: str, y_label: str,
+                  x_col: str = 'genre', y_col: str = 'average_rating') -> RenderJob:
+    return RenderJob('bar_chart', filename, {'data': data, 'title': title, 'x_label': x_label,
+                                             'y_label': y_label, 'x_col': x_col, 'y_col': y_col})
+
+
+def table_image_job(data: pd.DataFrame, title: str, filename: str) -> RenderJob:
+    return RenderJob('table_image', filename, {'data': data, 'title': title})
+
+
+def render_job(job: RenderJob) -> dict:
+    """Render a single job and measure it, returning the error message instead of raising"""
+    start, wall, cpu = time.time(), time.perf_counter(), time.process_time()
+    try:
+        RENDERERS[job.kind](filename=job.filename, **job.params)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    return {
+        'error': error,
+        'start': start,
+        'wall_s': round(time.perf_counter() - wall, 6),
+        'cpu_s': round(time.process_time() - cpu, 6),
+        'pid': os.getpid(),
+    }
+
+
+class RenderCache:
+    """Content-addressed store of rendered images, evicted least recently used first
+
+    Entries are keyed by a hash of the job's data, title and chart parameters,
+    so an unchanged chart is hardlinked (or copied, across filesystems) into the
+    new output folder instead of being drawn again.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 2 ** 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def key(self, job: RenderJob) -> str:
+        import matplotlib
+
+        data = job.params['data']
+        params = {name: value for name, value in job.params.items() if name != 'data'}
+        digest = hashlib.sha1()
+        digest.update(json.dumps([RENDER_CACHE_VERSION, matplotlib.__version__, DPI, RC_PARAMS, job.kind,
+                                  os.path.splitext(job.filename)[1], params], sort_keys=True,
+                                 default=str).encode('utf-8'))
+        digest.update(json.dumps({col: str(dtype) for col, dtype in data.dtypes.items()}).encode('utf-8'))
+        # Cells may hold lists (side genre samples), which pandas cannot hash
+        digest.update(data.to_csv(index=False).encode('utf-8'))
+        return digest.hexdigest()
+
+    def path(self, key: str, filename: str) -> str:
+        return os.path.join(self.cache_dir, key + os.path.splitext(filename)[1])
+
+    def fetch(self, key: str, filename: str) -> bool:
+        """Place the cached image for key at filename; False on a cache miss"""
+        entry = self.path(key, filename)
+        try:
+            _replace_with_link(entry, filename)
+            os.utime(entry)  # Mark as recently used
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Render cache entry {entry} unusable: {e}")
+            return False
+
+    def store(self, key: str, filename: str):
+        """Add a freshly rendered image to the cache"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _replace_with_link(filename, self.path(key, filename))
+        except OSError as e:
+            logger.warning(f"Could not cache {filename}: {e}")
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        try:
+            entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                             for entry in os.scandir(self.cache_dir) if entry.is_file())
+        except FileNotFoundError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                logger.warning(f"Could not evict {path}: {e}")
+
+
+def _replace_with_link(source: str, target: str):
+    """Atomically make target a hardlink to source, or a copy where links are unsupported"""
+    temporary = f"{target}.{os.getpid()}.tmp"
+    try:
+        os.link(source, temporary)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(source, temporary)
+    os.replace(temporary, target)
+
+
+def render_jobs(jobs: List[RenderJob], workers: Optional[int] = None, tracer=None,
+                cache: Optional[RenderCache] = None) -> List[Tuple[RenderJob, str]]:
+    """Render all jobs, in a process pool when more than one worker is requested
+
+    Returns the (job, error) pairs of the jobs that failed. When a tracer is
+    given, every job is recorded as a 'render' span with the worker's timings.
+    With a cache, jobs whose image was rendered before are linked from it and
+    only the rest are drawn.
+    """
+    if cache is not None and jobs:
+        keys = [cache.key(job) for job in jobs]
+        misses, duplicates = {}, []
+        for job, key in zip(jobs, keys):
+            # Never draw into a file that may share its inode with a cache entry
+            if os.path.lexists(job.filename):
+                os.remove(job.filename)
+            if key in misses:
+                duplicates.append((job, key))
+            elif not cache.fetch(key, job.filename):
+                misses[key] = job
+        logger.info(f"Render cache: {len(jobs) - len(misses)} reused, {len(misses)} to render")
+
+        failures = render_jobs(list(misses.values()), workers, tracer)
+        failed = {job.filename for job, _ in failures}
+        for key, job in misses.items():
+            if job.filename not in failed:
+                cache.store(key, job.filename)
+
+        # Identical images within this run are drawn once and linked everywhere else
+        errors = {job.filename: error for job, error in failures}
+        for job, key in duplicates:
+            if not cache.fetch(key, job.filename):
+                failures.append((job, errors.get(misses[key].filename, 'not available in the render cache')))
+        cache.evict()
+        return failures
+
+    if not jobs:
+        return []
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    logger.info(f"Rendering {len(jobs)} images with {workers} worker(s)")
+
+    if workers <= 1:
+        results = [render_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(render_job, job) for job in jobs]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # The worker itself died, e.g. BrokenProcessPool
+                    results.append({'error': f"{type(e).__name__}: {e}"})
+
+    if tracer is not None:
+        for job, result in zip(jobs, results):
+            if 'start' in result:
+                tracer.record({
+                    'name': f"{job.kind} {os.path.basename(job.filename)}", 'cat': 'render',
+                    'rows_in': len(job.params['data']), 'rows_out': None,
+                    'start': result['start'], 'wall_s': result['wall_s'], 'cpu_s': result['cpu_s'],
+                    'pid': result['pid'], 'tid': result['pid'],
+                    'args': {'filename': job.filename, 'error': result['error']},
+                })
+
+    failures = [(job, result['error']) for job, result in zip(jobs, results) if result['error'] is not None]
+    for job, error in failures:
+        logger.error(f"Error rendering {job.filename}: {error}")
+
+    return failures
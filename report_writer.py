@@ -0,0 +1,171 @@
+import logging
+import os
+from typing import Iterator, List, Optional, TextIO
+
+import numpy as np
+import pandas as pd
+
+try:
+    from wcwidth import wcswidth
+except ImportError:  # Display widths fall back to len()
+    wcswidth = None
+
+logger = logging.getLogger(__name__)
+
+# Rows formatted per block when a table is streamed to a file
+TABLE_CHUNK_ROWS = 20_000
+
+_to_str = np.frompyfunc(str, 1, 1)
+
+
+def format_column(values: pd.Series, floatfmt: Optional[str] = None) -> pd.Series:
+    """Format a whole column as strings; floatfmt (e.g. '.2f') applies to float columns"""
+    if floatfmt is not None and pd.api.types.is_float_dtype(values.dtype):
+        numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        return pd.Series(np.char.mod(f'%{floatfmt}', numbers), index=values.index, dtype=object)
+    # str() per cell, so missing values and list cells print as they would in an f-string
+    return pd.Series(_to_str(values.to_numpy(dtype=object)), index=values.index, dtype=object)
+
+
+def _is_numeric(values: pd.Series) -> bool:
+    """Numeric columns are right aligned; nullable ones holding <NA> are shown as text"""
+    if pd.api.types.is_bool_dtype(values.dtype) or not pd.api.types.is_numeric_dtype(values.dtype):
+        return False
+    return not (pd.api.types.is_extension_array_dtype(values.dtype) and values.isna().any())
+
+
+def _display_width(strings: pd.Series) -> np.ndarray:
+    widths = np.array(strings.str.len(), dtype=np.int64)
+    if wcswidth is not None:
+        wide = ~strings.map(str.isascii).to_numpy(dtype=bool)
+        if wide.any():
+            widths[wide] = [max(wcswidth(s), 0) for s in strings[wide]]
+    return widths
+
+
+def _pad(strings: pd.Series, width: int, align: str) -> pd.Series:
+    """Pad every string to the display width, 'left' or 'right' aligned"""
+    fill = width - _display_width(strings)
+    spaces = np.array([' ' * n for n in range(max(int(fill.max(initial=0)), 0) + 1)], dtype=object)
+    padding = pd.Series(spaces[np.clip(fill, 0, None)], index=strings.index)
+    return strings + padding if align == 'left' else padding + strings
+
+
+def _align_decimal(strings: pd.Series) -> pd.Series:
+    """Line numbers up on their decimal point"""
+    parts = strings.str.partition('.')
+    whole = parts[0]
+    fraction = parts[1] + parts[2]
+    return (_pad(whole, int(_display_width(whole).max()), 'right')
+            + _pad(fraction, int(_display_width(fraction).max()), 'left'))
+
+
+def markdown_lines(df: pd.DataFrame, chunk_rows: int = TABLE_CHUNK_ROWS) -> Iterator[str]:
+    """Yield a Markdown table block by block: header first, then chunk_rows rows at a time"""
+    headers = [str(col) for col in df.columns]
+    yield "| " + " | ".join(headers) + " |\n" + "|" + "|".join(["---"] * len(headers)) + "|"
+
+    for start in range(0, len(df), chunk_rows):
+        block = df.iloc[start:start + chunk_rows]
+        rows = "| " + format_column(block.iloc[:, 0])
+        for i in range(1, block.shape[1]):
+            rows = rows + " | " + format_column(block.iloc[:, i])
+        yield "\n".join(rows + " |")
+
+
+def markdown_table(df: pd.DataFrame) -> str:
+    """Convert DataFrame to Markdown table format"""
+    if df.empty:
+        return "*No data available*"
+    return "\n".join(markdown_lines(df))
+
+
+def text_table(df: pd.DataFrame, showindex: bool = True, floatfmt: str = 'g') -> str:
+    """Grid-format text table, laid out like tabulate(df, headers='keys', tablefmt='grid')"""
+    columns: List[pd.Series] = []
+    headers: List[str] = []
+    aligns: List[str] = []
+
+    if showindex:
+        columns.append(format_column(df.index.to_series(index=df.index)))
+        headers.append(str(df.index.name) if df.index.name is not None else '')
+        aligns.append('right' if _is_numeric(df.index.to_series()) else 'left')
+
+    for i, col in enumerate(df.columns):
+        values = df.iloc[:, i]
+        strings = format_column(values, floatfmt)
+        if _is_numeric(values):
+            strings = _align_decimal(strings) if len(strings) else strings
+            aligns.append('right')
+        else:
+            aligns.append('left')
+        columns.append(strings)
+        headers.append(str(col))
+
+    # Like tabulate, columns are at least two characters wider than their header
+    widths = []
+    for strings, header in zip(columns, headers):
+        cell_width = int(_display_width(strings).max()) if len(strings) else 0
+        widths.append(max(cell_width, _display_width(pd.Series([header], dtype=object))[0] + 2))
+
+    border = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+    header_border = border.replace('-', '=')
+    header_line = "| " + " | ".join(_pad(pd.Series([header], dtype=object), width, align)[0]
+                                    for header, width, align in zip(headers, widths, aligns)) + " |"
+
+    lines = [border, header_line, header_border]
+    if len(df):
+        rows = "| " + _pad(columns[0], widths[0], aligns[0])
+        for strings, width, align in zip(columns[1:], widths[1:], aligns[1:]):
+            rows = rows + " | " + _pad(strings, width, align)
+        lines.append(("\n" + border + "\n").join(rows + " |"))
+        lines.append(border)
+    return "\n".join(lines)
+
+
+class MarkdownWriter:
+    """Streams a Markdown document to disk, section by section
+
+    Used as a context manager; the document is written to a temporary file and
+    moved into place when the block exits without an error.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file: Optional[TextIO] = None
+
+    def __enter__(self) -> 'MarkdownWriter':
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.file = open(f"{self.path}.tmp", 'w', encoding='utf-8')
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.file.close()
+        if exc_type is None:
+            os.replace(f"{self.path}.tmp", self.path)
+            logger.info(f"File saved: {self.path}")
+        else:
+            os.remove(f"{self.path}.tmp")
+
+    def write(self, *lines: str):
+        """Write each argument as a line"""
+        for line in lines:
+            self.file.write(line)
+            self.file.write("\n")
+
+    def table(self, df: pd.DataFrame, chunk_rows: int = TABLE_CHUNK_ROWS):
+        """Write a Markdown table followed by a blank line, without building it in memory"""
+        if df.empty:
+            self.write("*No data available*")
+        else:
+            for block in markdown_lines(df, chunk_rows):
+                self.write(block)
+        self.write("")
+
+
+def write_text_table(df: pd.DataFrame, path: str, showindex: bool = True, floatfmt: str = 'g'):
+    """Save a grid-format text table"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text_table(df, showindex=showindex, floatfmt=floatfmt))
+    logger.info(f"File saved: {path}")
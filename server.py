@@ -0,0 +1,255 @@
+import argparse
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pandas as pd
+
+from facets import NUMERIC_FACETS
+from main import RANKINGS, AnimeAnalyzer
+from similarity import SIMILARITY_MEASURES
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of encoded JSON responses"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, key, compute: Callable[[], Tuple[int, bytes]]) -> Tuple[int, bytes]:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+
+        # Computed outside the lock so slow queries do not block cached ones
+        value = compute()
+        if value[0] == 200:
+            with self.lock:
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class AnalyzerService:
+    """Holds the loaded, indexed analyzer and swaps it atomically on reload"""
+
+    def __init__(self, file_path: str, min_anime_count: int = 10, cache_entries: int = 1024):
+        self.file_path = file_path
+        self.min_anime_count = min_anime_count
+        self.cache = ResponseCache(cache_entries)
+        self.analyzer: Optional[AnimeAnalyzer] = None
+        self.version = 0
+        self.loaded_mtime = None
+        self.reload_lock = threading.Lock()
+
+    def load(self) -> bool:
+        """Load and index the dataset, replacing the served analyzer only on success"""
+        with self.reload_lock:
+            mtime = os.stat(self.file_path).st_mtime_ns
+            analyzer = AnimeAnalyzer(self.file_path)
+            if not analyzer.load_and_clean_data():
+                logger.error("Dataset reload failed, keeping the previous version")
+                return False
+            analyzer.analyze_genres(min_anime_count=self.min_anime_count)
+
+            self.analyzer = analyzer
+            self.loaded_mtime = mtime
+            self.version += 1
+            self.cache.clear()
+            logger.info(f"Serving dataset version {self.version} ({analyzer.anime_count} anime)")
+            return True
+
+    def reload_if_changed(self):
+        try:
+            if os.stat(self.file_path).st_mtime_ns != self.loaded_mtime:
+                logger.info("Dataset changed on disk, reloading")
+                self.load()
+        except OSError as e:
+            logger.warning(f"Cannot check dataset for changes: {e}")
+
+    def watch(self, interval: float) -> threading.Thread:
+        """Poll the dataset file and hot-reload it when it changes"""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.reload_if_changed()
+
+        thread = threading.Thread(target=run, name='dataset-watcher', daemon=True)
+        thread.stop = stop
+        thread.start()
+        return thread
+
+    def handle(self, path: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+        """Answer a request from the response cache or the current analyzer"""
+        analyzer, version = self.analyzer, self.version
+        key = (version, path, tuple(sorted(params.items())))
+        return self.cache.get_or_compute(key, lambda: self._dispatch(analyzer, path, params))
+
+    def _dispatch(self, analyzer: AnimeAnalyzer, path: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+        parts = [unquote(part) for part in path.strip('/').split('/') if part]
+
+        try:
+            facets = _facets(params)
+            rank_by = _choice(params, 'rank', 'weighted_rating', RANKINGS)
+            # Facet queries resample their selection for rating intervals, so those are opt-in
+            intervals = _choice(params, 'intervals', '0', ('0', '1')) == '1'
+
+            if parts == ['health']:
+                return _json(200, {'status': 'ok', 'version': self.version, 'anime_count': analyzer.anime_count})
+
+            if parts == ['genres']:
+                min_count = int(params.get('min_count', self.min_anime_count))
+                if facets:
+                    return _frame(analyzer.faceted_genre_summary(facets, min_anime_count=min_count, rank_by=rank_by,
+                                                                 intervals=intervals).reset_index())
+                return _frame(analyzer.summarize_genres(min_count, rank_by=rank_by).reset_index())
+
+            if parts == ['top']:
+                genres = [genre.strip() for genre in params.get('genres', '').split(',') if genre.strip()]
+                if not genres:
+                    return _json(400, {'error': 'genres parameter is required'})
+                return _frame(analyzer.get_top_anime(genres, top_n=int(params.get('n', 5)),
+                                                     by=_choice(params, 'by', 'rating', analyzer.ranking.metrics),
+                                                     match=_choice(params, 'match', 'all', ('all', 'any')),
+                                                     facets=facets))
+
+            if parts == ['search']:
+                if not params.get('q', '').strip():
+                    return _json(400, {'error': 'q parameter is required'})
+                return _frame(analyzer.search_anime(params['q'], limit=int(params.get('n', 10))))
+
+            if len(parts) == 3 and parts[:1] + parts[2:] == ['anime', 'similar']:
+                if analyzer.anime_position(parts[1]) is None:
+                    return _json(404, {'error': f"Unknown anime: {parts[1]}"})
+                weights = [name for name in analyzer.similarity_index().weights if name is not None]
+                return _frame(analyzer.get_similar_anime(parts[1], top_n=int(params.get('n', 10)),
+                                                         measure=_choice(params, 'measure', 'jaccard',
+                                                                         SIMILARITY_MEASURES),
+                                                         weight=_choice(params, 'weight', None, weights)))
+
+            if len(parts) == 3 and parts[0] == 'genres':
+                genre = parts[1]
+                if genre not in analyzer.genre_codes:
+                    return _json(404, {'error': f"Unknown genre: {genre}"})
+
+                if parts[2] == 'top':
+                    by = _choice(params, 'by', 'rating', analyzer.ranking.metrics)
+                    return _frame(analyzer.get_top_anime_for_genre(genre, top_n=int(params.get('n', 5)),
+                                                                   by=by, facets=facets))
+                if parts[2] == 'histogram':
+                    other = params.get('with')
+                    if other and other not in analyzer.genre_codes:
+                        return _json(404, {'error': f"Unknown genre: {other}"})
+                    width = float(params['width']) if params.get('width') else None
+                    return _frame(analyzer.rating_histograms().histogram(genre, other, bin_width=width))
+                if parts[2] == 'side':
+                    return _frame(analyzer.analyze_side_genres(genre, min_count=int(params.get('min_count', 3)),
+                                                               facets=facets, rank_by=rank_by,
+                                                               intervals=intervals or not facets))
+
+            return _json(404, {'error': f"Unknown endpoint: {path}"})
+
+        except ValueError as e:
+            return _json(400, {'error': str(e)})
+
+
+def _choice(params: Dict[str, str], name: str, default: Optional[str], allowed: Sequence[str]) -> Optional[str]:
+    """A query parameter that must be one of the allowed values; a bad value is a 400, not an empty 200"""
+    value = params.get(name, default)
+    if value != default and value not in allowed:
+        raise ValueError(f"Unknown {name}: {value} (expected one of: {', '.join(allowed)})")
+    return value
+
+
+def _facets(params: Dict[str, str]) -> Dict[str, object]:
+    """Facet filters from query parameters: type=TV,Movie and low-high ranges such as
+    episodes=12-26, members=10000- or rating=7-"""
+    facets = {}
+    if params.get('type'):
+        facets['type'] = [value.strip() for value in params['type'].split(',') if value.strip()]
+    for facet in NUMERIC_FACETS:
+        if params.get(facet):
+            low, _, high = params[facet].partition('-')
+            facets[facet] = (float(low) if low.strip() else None, float(high) if high.strip() else None)
+    return facets
+
+
+def _json(status: int, payload) -> Tuple[int, bytes]:
+    return status, json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def _frame(df: pd.DataFrame) -> Tuple[int, bytes]:
+    return 200, df.to_json(orient='records', force_ascii=False).encode('utf-8')
+
+
+def make_handler(service: AnalyzerService):
+    class RequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            status, body = service.handle(url.path, params)
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return RequestHandler
+
+
+def serve(file_path: str, host: str = '127.0.0.1', port: int = 8000, reload_interval: float = 5.0,
+          min_anime_count: int = 10):
+    """Load the dataset once and answer genre queries over HTTP until interrupted"""
+    service = AnalyzerService(file_path, min_anime_count=min_anime_count)
+    if not service.load():
+        raise SystemExit("❌ Veri yüklenirken hata oluştu. Lütfen dosya yolunu kontrol edin.")
+
+    if reload_interval > 0:
+        service.watch(reload_interval)
+
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    print(f"🌐 Sunucu çalışıyor: http://{host}:{server.server_port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='AnimeGenreAnalyst JSON query server')
+    parser.add_argument('--data', default='./dataset/anime.csv', help='Path to anime.csv')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--reload-interval', type=float, default=5.0,
+                        help='Seconds between dataset change checks, 0 disables hot reload')
+    parser.add_argument('--min-count', type=int, default=10, help='Minimum anime count per genre')
+    args = parser.parse_args()
+
+    serve(args.data, args.host, args.port, args.reload_interval, args.min_count)
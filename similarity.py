@@ -0,0 +1,214 @@
+import logging
+from itertools import combinations
+from math import comb
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from genre_index import GenreLists, popcount_rows
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_MEASURES = ('jaccard', 'cosine')
+
+# Most genre-flip masks probed around a query before falling back to a full scan
+SIMILARITY_BALL_KEYS = 20_000
+
+
+def set_similarity(shared: np.ndarray, size_a: np.ndarray, size_b: np.ndarray, measure: str) -> np.ndarray:
+    """Jaccard or cosine similarity of binary genre vectors from their shared and total genre counts"""
+    shared = np.asarray(shared, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if measure == 'jaccard':
+            similarity = shared / (size_a + size_b - shared)
+        elif measure == 'cosine':
+            similarity = shared / np.sqrt(size_a * size_b)
+        else:
+            raise ValueError(f"Unknown similarity measure: {measure}")
+
+    # An empty genre set is similar to nothing
+    return np.nan_to_num(similarity, nan=0.0)
+
+
+def outside_bound(size: int, radius: int, measure: str) -> float:
+    """Highest similarity to a set of `size` genres of any set differing from it in more than `radius` genres"""
+    # Adding genres costs the least: all `size` genres shared, radius + 1 extra ones
+    ratio = size / (size + radius + 1)
+    return ratio if measure == 'jaccard' else float(np.sqrt(ratio))
+
+
+class SimilarityIndex:
+    """Top-k nearest anime by genre set, optionally weighted by a per-anime score
+
+    Similarity depends only on the genre set, and a catalog has far fewer
+    distinct genre sets (signatures) than titles. Titles are grouped by
+    signature, each signature's titles pre-sorted by weight, so a query scores
+    signatures with a bitset AND and popcount, then gathers titles only from
+    signatures whose best possible score can still reach the k-th neighbour.
+
+    With up to 64 genres a signature is one sorted uint64 key, and a query
+    first looks up the signatures one, two, then three genres away from its
+    own by binary search. Every other signature scores at most outside_bound(),
+    so once the k-th neighbour beats that bound the answer is exact without
+    scanning the rest; otherwise only the signatures whose heaviest title
+    could still reach it are added. A weighted score is similarity x weight;
+    weights are expected in [0, 1] and missing weights count as 0. Equal
+    scores keep the given row order (dataset order by default).
+    """
+
+    def __init__(self, genres: GenreLists, weights: Optional[Dict[str, np.ndarray]] = None,
+                 order: Optional[np.ndarray] = None):
+        bitsets = genres.bitsets()
+        if bitsets.shape[1] == 1:
+            # A plain integer sort is much faster than np.unique over rows
+            keys, row_signature = np.unique(bitsets[:, 0], return_inverse=True)
+            self.signatures = keys[:, None]
+        else:
+            self.signatures, row_signature = np.unique(bitsets, axis=0, return_inverse=True)
+        self.row_signature = row_signature.reshape(-1)
+        self.sizes = popcount_rows(self.signatures)
+        self.offsets = np.zeros(len(self.signatures) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.row_signature, minlength=len(self.signatures)), out=self.offsets[1:])
+
+        self.rank = np.arange(len(genres), dtype=np.int64)
+        if order is not None:
+            self.rank[order] = np.arange(len(order))
+        else:
+            order = self.rank
+
+        self.weights = {}
+        self.layouts = {}
+        self.max_weights = {}
+        self.by_max_weight = {}
+        self.sorted_max_weights = {}
+        for name, values in {None: np.ones(len(genres)), **(weights or {})}.items():
+            values = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+            if (values < 0).any():
+                raise ValueError(f"Similarity weights must not be negative: {name}")
+            # Rows grouped by signature, heaviest first, ties in the given order (stable sorts, last key first)
+            layout = order[np.argsort(-values[order], kind='stable')] if name is not None else order
+            layout = layout[np.argsort(self.row_signature[layout], kind='stable')]
+            self.weights[name] = values
+            self.layouts[name] = layout
+            self.max_weights[name] = values[layout[self.offsets[:-1]]]
+            self.by_max_weight[name] = np.argsort(-self.max_weights[name], kind='stable')
+            self.sorted_max_weights[name] = -self.max_weights[name][self.by_max_weight[name]]
+
+        # XOR masks of every flip of up to 1, 2, ... genres, while probing them beats a full scan
+        self.balls: List[np.ndarray] = []
+        if self.signatures.shape[1] == 1:
+            n_genres = len(genres.vocab)
+            limit = min(SIMILARITY_BALL_KEYS, len(self.signatures) // 4)
+            masks = [np.zeros(1, dtype=np.uint64)]
+            radius = 1
+            while radius <= n_genres and sum(map(len, masks)) + comb(n_genres, radius) <= limit:
+                masks.append(np.array([sum(1 << bit for bit in bits) for bits in combinations(range(n_genres), radius)],
+                                      dtype=np.uint64))
+                self.balls.append(np.concatenate(masks))
+                radius += 1
+
+        logger.info(f"Similarity index built: {len(genres)} anime, {len(self.signatures)} distinct genre sets")
+
+    def __len__(self) -> int:
+        return len(self.row_signature)
+
+    def similarity_to(self, signature: int, candidates: np.ndarray, measure: str = 'jaccard') -> np.ndarray:
+        """Similarity of one signature to each candidate signature"""
+        shared = popcount_rows(self.signatures[candidates] & self.signatures[signature])
+        return set_similarity(shared, self.sizes[candidates], self.sizes[signature], measure)
+
+    def top(self, position: int, k: int, measure: str = 'jaccard',
+            weight: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Row positions and scores of the k anime most similar to the given row, itself excluded"""
+        self._check_weight(weight)
+        return self._top_for_signature(self.row_signature[position], k, measure, weight, exclude=position)
+
+    def all_top_k(self, k: int, measure: str = 'jaccard',
+                  weight: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Neighbours of every row as (rows x k) positions and scores, padded with -1 and NaN
+
+        Rows sharing a signature share their neighbours, so each signature is
+        queried once for k + 1 neighbours and every row then drops itself.
+        """
+        self._check_weight(weight)
+        lists = np.full((len(self.signatures), k + 1), -1, dtype=np.int64)
+        scores = np.full((len(self.signatures), k + 1), np.nan)
+        for signature in range(len(self.signatures)):
+            rows, row_scores = self._top_for_signature(signature, k + 1, measure, weight)
+            lists[signature, :len(rows)] = rows
+            scores[signature, :len(rows)] = row_scores
+
+        lists, scores = lists[self.row_signature], scores[self.row_signature]
+        # Move each row's own entry to the end (or keep the order when it is absent) and cut to k
+        keep = np.argsort(lists == np.arange(len(self))[:, None], axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(lists, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+
+    def _check_weight(self, weight: Optional[str]):
+        if weight not in self.weights:
+            raise ValueError(f"Unknown similarity weight: {weight}")
+
+    def _top_for_signature(self, signature: int, k: int, measure: str, weight: Optional[str],
+                           exclude: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        candidates = None
+
+        for radius, masks in enumerate(self.balls, 1):
+            ball = self._lookup(self.signatures[signature, 0] ^ masks)
+            rows, scores = self._top_among(ball, self.similarity_to(signature, ball, measure), k, weight, exclude)
+            if len(rows) < k:
+                continue
+
+            # Signatures outside the ball reach at most bound x their heaviest title's weight
+            bound = outside_bound(self.sizes[signature], radius, measure)
+            reachable = np.searchsorted(self.sorted_max_weights[weight], -scores[-1] / bound * (1 - 1e-12),
+                                        side='right')
+            if reachable == 0:
+                return rows, scores
+            if reachable < len(self.signatures) // 2:
+                outside = self.by_max_weight[weight][:reachable]
+                in_ball = np.zeros(len(self.signatures), dtype=bool)
+                in_ball[ball] = True
+                candidates = np.concatenate([ball, outside[~in_ball[outside]]])
+                break
+
+        if candidates is None:
+            candidates = np.arange(len(self.signatures))
+        return self._top_among(candidates, self.similarity_to(signature, candidates, measure), k, weight, exclude)
+
+    def _lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Signatures present among the given single-word keys"""
+        found = np.minimum(np.searchsorted(self.signatures[:, 0], keys), len(self.signatures) - 1)
+        return found[self.signatures[found, 0] == keys]
+
+    def _leading_rows(self, signatures: np.ndarray, layout: np.ndarray,
+                      limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The first `limit` rows of each given signature in the weight layout, and which signature each is from"""
+        starts = self.offsets[signatures]
+        lengths = np.minimum(self.offsets[signatures + 1] - starts, limit)
+        first = np.cumsum(lengths) - lengths
+        rows = layout[np.repeat(starts - first, lengths) + np.arange(lengths.sum())]
+        return rows, np.repeat(np.arange(len(signatures)), lengths)
+
+    def _top_among(self, signatures: np.ndarray, similarity: np.ndarray, k: int, weight: Optional[str],
+                   exclude: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Best k rows of the given signatures, whose similarities to the query are given"""
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        values, layout = self.weights[weight], self.layouts[weight]
+        bound = similarity * self.max_weights[weight][signatures]
+        wanted = k + (exclude is not None)
+
+        # Seed the k-th best score from the signatures with the highest bounds
+        seeds = np.argpartition(-bound, wanted - 1)[:wanted] if len(bound) > wanted else np.arange(len(bound))
+        rows, owner = self._leading_rows(signatures[seeds], layout, wanted)
+        scores = (similarity[seeds][owner] * values[rows])[rows != exclude]
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k] if len(scores) >= k else 0.0
+
+        # Only signatures whose best title could reach the threshold can contribute
+        candidates = np.flatnonzero((bound >= threshold) & (bound > 0))
+        rows, owner = self._leading_rows(signatures[candidates], layout, wanted)
+        scores = similarity[candidates][owner] * values[rows]
+        keep = (scores > 0) & (rows != exclude)
+        rows, scores = rows[keep], scores[keep]
+
+        best = np.lexsort((self.rank[rows], -scores))[:k]
+        return rows[best], scores[best]
@@ -0,0 +1,201 @@
+import heapq
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_loader import clean_anime_frame, iter_anime_csv
+from genre_index import CooccurrenceStats, GenreLists, top_k_rows_per_genre
+from instrumentation import Instrumentation, traced
+from main import TOP_ANIME_COLUMNS, AnimeAnalyzer
+from rating_stats import RatingHistograms
+from user_ratings import USER_RATING_CHUNK_ROWS
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedTopK:
+    """Keeps the k highest rated records seen so far; earlier rows win ties"""
+
+    def __init__(self, k: int):
+        self.k = k
+        self.heap = []
+
+    def push(self, rating: float, sequence: int, record):
+        entry = (rating, -sequence, record)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+
+    def items(self) -> list:
+        """Records from highest to lowest rating"""
+        return [record for _, _, record in sorted(self.heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+class StreamingAnalyzer(AnimeAnalyzer):
+    """AnimeAnalyzer that reads the CSV in chunks and keeps only running aggregates
+
+    Memory is bounded by the number of genres (co-occurrence matrices and top-k
+    heaps), not by the number of rows: neither df_anime nor df_expanded is kept.
+    """
+
+    def __init__(self, file_path: str, chunk_size: int = 100_000, top_k: int = 5, sample_k: int = 3,
+                 tracer: Instrumentation = None):
+        super().__init__(file_path, use_cache=False, tracer=tracer)
+        self.chunk_size = chunk_size
+        self.top_k = top_k
+        self.sample_k = sample_k
+        self.rows_seen = 0
+        self.top_anime: Dict[str, BoundedTopK] = {}
+        self.pair_samples: Dict[Tuple[str, str], BoundedTopK] = {}
+
+    @property
+    def anime_count(self) -> int:
+        return self.rows_seen
+
+    @traced('load', rows_out=lambda self, result: self.rows_seen)
+    def load_and_clean_data(self) -> bool:
+        """Stream the dataset and accumulate genre statistics chunk by chunk"""
+        try:
+            logger.info("Streaming dataset...")
+            stats = None
+            histograms = None
+            self.rows_seen = 0
+
+            for chunk in iter_anime_csv(self.file_path, self.chunk_size):
+                df, genres = clean_anime_frame(chunk)
+                if df.empty:
+                    continue
+
+                ratings = df['rating'].to_numpy()
+                chunk_stats = CooccurrenceStats.from_lists(genres, ratings)
+                stats = chunk_stats if stats is None else stats.merge(chunk_stats)
+                # Histograms add up across chunks, so quantiles come out as if the whole file had been read
+                chunk_histograms = RatingHistograms.from_lists(genres, ratings)
+                histograms = chunk_histograms if histograms is None else histograms.merge(chunk_histograms)
+
+                self._collect_top_anime(df, genres, ratings)
+                self.rows_seen += len(df)
+
+            if stats is None:
+                logger.error("No valid rows found in dataset")
+                return False
+
+            self.cooccurrence = stats
+            self.histograms = histograms.reindex(stats.vocab)
+            self.genre_vocab = stats.vocab
+            self.genre_codes = stats.codes
+            logger.info(f"Streamed {self.rows_seen} valid rows, {len(self.genre_vocab)} genres")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error streaming data: {e}")
+            return False
+
+    def _collect_top_anime(self, df: pd.DataFrame, genres: GenreLists, ratings: np.ndarray):
+        """Offer each chunk's best rows per genre and per genre pair to the bounded heaps"""
+        order = np.argsort(-ratings, kind='stable')
+        sequence = self.rows_seen + np.arange(len(df))
+
+        names = df['name'].to_numpy()
+        top_positions = top_k_rows_per_genre(genres, order, self.top_k)
+
+        # Only the few rows that can enter a heap are turned into Python records
+        candidates = np.unique(np.concatenate(top_positions))
+        display_cols = [col for col in TOP_ANIME_COLUMNS if col in df.columns]
+        records = dict(zip(candidates, df.iloc[candidates][display_cols].to_dict('records')))
+
+        for code, positions in enumerate(top_positions):
+            heap = self.top_anime.setdefault(genres.vocab[code], BoundedTopK(self.top_k))
+            for position in positions:
+                heap.push(ratings[position], sequence[position], records[position])
+
+        for main_code, main_genre in enumerate(genres.vocab):
+            main_rows = genres.mask(main_code)
+            if not main_rows.any():
+                continue
+            pair_positions = top_k_rows_per_genre(genres, order, self.sample_k, row_mask=main_rows)
+            for side_code, positions in enumerate(pair_positions):
+                if side_code == main_code or not len(positions):
+                    continue
+                key = (main_genre, genres.vocab[side_code])
+                heap = self.pair_samples.setdefault(key, BoundedTopK(self.sample_k))
+                for position in positions:
+                    heap.push(ratings[position], sequence[position], names[position])
+
+    def expand_genres(self):
+        """Nothing to expand: statistics are accumulated while streaming"""
+        logger.info("Streaming mode: skipping genre expansion")
+
+    def facet_index(self):
+        """Facets filter individual anime, which streaming mode does not keep"""
+        raise ValueError("Streaming mode does not support facet filters")
+
+    def rating_statistics(self, row_mask: np.ndarray = None, pairs: bool = True, intervals: bool = True):
+        """Bootstrap intervals resample individual anime, which streaming mode does not keep"""
+        logger.info("Streaming mode: ranking genres by average rating, without rating intervals")
+        return None
+
+    def load_user_ratings(self, file_path: str, chunk_size: int = USER_RATING_CHUNK_ROWS) -> bool:
+        """User ratings are joined to catalog rows, which streaming mode does not keep"""
+        logger.error("Streaming mode does not keep the catalog rows, user ratings cannot be joined")
+        return False
+
+    def get_top_anime_for_genre(self, genre: str, top_n: int = 5, by: str = 'rating',
+                                facets: Dict = None) -> pd.DataFrame:
+        """Get top anime for a specific genre from the bounded heap"""
+        try:
+            if facets:
+                self.facet_index()
+            if by != 'rating':
+                logger.error(f"Streaming mode only keeps top anime by rating, not by {by}")
+                return pd.DataFrame()
+
+            heap = self.top_anime.get(genre)
+            if heap is None:
+                return pd.DataFrame()
+
+            if top_n > self.top_k:
+                logger.warning(f"Only the top {self.top_k} anime per genre are kept in streaming mode")
+
+            return self.format_top_anime(pd.DataFrame(heap.items()[:top_n]))
+
+        except Exception as e:
+            logger.error(f"Error getting top anime for {genre}: {e}")
+            return pd.DataFrame()
+
+    def get_top_anime(self, genres: List[str], top_n: int = 5, by: str = 'rating', match: str = 'all',
+                      facets: Dict = None) -> pd.DataFrame:
+        """Top anime of a single genre by rating, the only ranking the bounded heaps keep"""
+        if len(genres) != 1:
+            raise ValueError("Streaming mode keeps top anime per genre, not for genre combinations")
+        if by != 'rating':
+            raise ValueError(f"Streaming mode only keeps top anime by rating, not by {by}")
+        return self.get_top_anime_for_genre(genres[0], top_n=top_n, facets=facets)
+
+    def analyze_genre_combinations(self, min_support: float = 10, min_size: int = 2,
+                                   max_size: int = None) -> pd.DataFrame:
+        """Combinations need the per-anime genre lists, which streaming mode does not keep"""
+        logger.warning("Streaming mode does not keep the genre lists, skipping genre combinations")
+        return pd.DataFrame()
+
+    def get_similar_anime(self, name: str, top_n: int = 10, measure: str = 'jaccard',
+                          weight: str = None) -> pd.DataFrame:
+        """Similarity needs the per-anime genre lists, which streaming mode does not keep"""
+        logger.warning("Streaming mode does not keep the genre lists, skipping similar anime lookup")
+        return pd.DataFrame()
+
+    def search_anime(self, query: str, limit: int = 10) -> pd.DataFrame:
+        """Title search indexes every title, which streaming mode does not keep"""
+        logger.warning("Streaming mode does not keep the catalog titles, skipping title search")
+        return pd.DataFrame()
+
+    def sample_anime_for_pairs(self, main_genre: str, top_k: int = 3) -> Dict[str, List[str]]:
+        """Highest rated anime names for every (main genre, side genre) pair"""
+        samples = {}
+        for genre in self.genre_vocab:
+            heap = self.pair_samples.get((main_genre, genre))
+            samples[genre] = heap.items()[:top_k] if heap is not None else []
+        return samples
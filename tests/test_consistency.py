@@ -0,0 +1,125 @@
+"""The incremental, streaming and faceted paths must agree with a full in-memory analysis
+
+Every test runs on a small synthetic catalog from benchmark.generate_catalog.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import generate_catalog
+from data_loader import read_anime_csv
+from main import AnimeAnalyzer
+from streaming import StreamingAnalyzer
+
+CATALOG_ROWS = 5000
+
+
+def load(path: str) -> AnimeAnalyzer:
+    analyzer = AnimeAnalyzer(path, use_cache=False)
+    assert analyzer.load_and_clean_data()
+    return analyzer
+
+
+def plain(df: pd.DataFrame) -> pd.DataFrame:
+    """Values of a frame as Python objects with NaN for every missing value, whatever the dtypes"""
+    return df.astype(object).where(df.notna(), np.nan)
+
+
+def assert_same_stats(actual: AnimeAnalyzer, expected: AnimeAnalyzer):
+    """Co-occurrence statistics and rating histograms equal, laid out over the same genres
+
+    Sums are compared up to rounding, which depends on the order rows were added and subtracted in.
+    """
+    assert actual.cooccurrence.vocab == expected.cooccurrence.vocab
+    np.testing.assert_array_equal(actual.cooccurrence.counts, expected.cooccurrence.counts)
+    np.testing.assert_allclose(actual.cooccurrence.sums, expected.cooccurrence.sums, rtol=1e-6)
+    np.testing.assert_allclose(actual.cooccurrence.sumsq, expected.cooccurrence.sumsq, rtol=1e-6)
+    np.testing.assert_array_equal(actual.rating_histograms().counts, expected.rating_histograms().counts)
+
+
+@pytest.fixture(scope='module')
+def catalog(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp('catalog') / 'anime.csv')
+    generate_catalog(path, CATALOG_ROWS, seed=7)
+    return path
+
+
+@pytest.fixture(scope='module')
+def analyzer(catalog) -> AnimeAnalyzer:
+    return load(catalog)
+
+
+def test_apply_delta_matches_full_recompute(catalog, tmp_path):
+    raw = read_anime_csv(catalog)
+    rng = np.random.default_rng(3)
+    old = raw.iloc[:-300]
+
+    # Changed ratings and genres of existing anime, new anime and removed anime
+    changed = old.sample(200, random_state=1).copy()
+    changed['rating'] = rng.uniform(2, 9, len(changed)).round(2).astype(np.float32)
+    changed.loc[changed.index[:20], 'genre'] = 'Comedy, Brand New'
+    delta = pd.concat([changed, raw.iloc[-300:]])
+    removed_ids = old['anime_id'].iloc[:100].to_numpy()
+
+    old_path, new_path = str(tmp_path / 'old.csv'), str(tmp_path / 'new.csv')
+    old.to_csv(old_path, index=False)
+    # apply_delta keeps the untouched rows in place and appends the delta rows
+    untouched = ~old['anime_id'].isin(delta['anime_id']) & ~old['anime_id'].isin(removed_ids)
+    pd.concat([old[untouched], delta]).to_csv(new_path, index=False)
+
+    incremental = load(old_path)
+    incremental.analyze_genres(min_anime_count=5, intervals=False)
+    assert incremental.apply_delta(delta, removed_ids)
+    full = load(new_path)
+    full.analyze_genres(min_anime_count=5, intervals=False)
+
+    assert_same_stats(incremental, full)
+    np.testing.assert_allclose(incremental.rating_statistics(intervals=False).weighted,
+                               full.rating_statistics(intervals=False).weighted, rtol=1e-6)
+    for metric, order in full.ranking.orders.items():
+        np.testing.assert_array_equal(incremental.ranking.orders[metric], order)
+    pd.testing.assert_frame_equal(incremental.genre_summary, full.genre_summary)
+
+
+def test_reloaded_state_matches_saved_analyzer(analyzer, tmp_path):
+    analyzer.analyze_genres(min_anime_count=5, intervals=False)
+    analyzer.save_state(str(tmp_path / 'state'))
+
+    reloaded = AnimeAnalyzer('', use_cache=False)
+    assert reloaded.load_state(str(tmp_path / 'state'))
+    assert reloaded.histograms is not None and reloaded.rating_stats is not None
+    reloaded.analyze_genres(min_anime_count=5, intervals=False)
+
+    assert_same_stats(reloaded, analyzer)
+    pd.testing.assert_frame_equal(reloaded.genre_summary, analyzer.genre_summary)
+
+
+def test_streaming_matches_in_memory(catalog, analyzer):
+    streaming = StreamingAnalyzer(catalog, chunk_size=1000)
+    assert streaming.load_and_clean_data()
+
+    assert streaming.anime_count == analyzer.anime_count
+    assert_same_stats(streaming, analyzer)
+
+    streamed = streaming.summarize_genres(min_anime_count=5, rank_by='average_rating')
+    in_memory = analyzer.summarize_genres(min_anime_count=5, rank_by='average_rating', intervals=False)
+    pd.testing.assert_frame_equal(streamed, in_memory[streamed.columns])
+
+    for genre in ('Comedy', 'Action', 'Yaoi'):
+        # The heaps keep plain records, so only the values are compared
+        streamed_top = streaming.get_top_anime_for_genre(genre, top_n=5)
+        in_memory_top = analyzer.get_top_anime_for_genre(genre, top_n=5)
+        pd.testing.assert_frame_equal(plain(streamed_top), plain(in_memory_top), check_dtype=False)
+
+
+def test_facets_match_subset(analyzer):
+    facets = {'type': ['TV', 'OVA']}
+    view = analyzer.subset(analyzer.type_mask(facets['type']))
+
+    faceted = analyzer.faceted_genre_summary(facets, min_anime_count=5)
+    subset = view.summarize_genres(min_anime_count=5, intervals=False)
+    pd.testing.assert_frame_equal(faceted, subset[faceted.columns])
+
+    faceted_side = analyzer.analyze_side_genres('Comedy', min_count=3, facets=facets)
+    subset_side = view.analyze_side_genres('Comedy', min_count=3, intervals=False)
+    pd.testing.assert_frame_equal(faceted_side, subset_side[faceted_side.columns])
@@ -0,0 +1,113 @@
+import logging
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from data_loader import detect_encoding
+from genre_index import CooccurrenceStats, GenreLists
+
+logger = logging.getLogger(__name__)
+
+# Only the columns the statistics need are parsed; user_id is skipped
+USER_RATING_DTYPES = {
+    'anime_id': 'int32',
+    'rating': 'int8',
+}
+
+USER_RATING_CHUNK_ROWS = 1_000_000
+
+# Score of an anime the user watched but did not rate
+UNRATED = -1
+MIN_SCORE, MAX_SCORE = 1, 10
+
+
+def iter_user_ratings(file_path: str, chunk_size: int = USER_RATING_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Read the anime_id and rating columns of rating.csv in typed chunks of at most chunk_size rows"""
+    encoding = detect_encoding(file_path)
+    logger.info(f"Streaming user ratings with encoding: {encoding}, {chunk_size} rows per chunk")
+
+    with pd.read_csv(file_path, sep=',', encoding=encoding, usecols=list(USER_RATING_DTYPES),
+                     dtype=USER_RATING_DTYPES, chunksize=chunk_size) as reader:
+        yield from reader
+
+
+def anime_lookup(anime_ids: np.ndarray) -> np.ndarray:
+    """Catalog row position of every anime_id up to the largest one, -1 where there is none"""
+    anime_ids = np.asarray(anime_ids, dtype=np.int64)
+    valid = anime_ids >= 0
+    lookup = np.full(int(anime_ids[valid].max(initial=-1)) + 1, -1, dtype=np.int32)
+    lookup[anime_ids[valid]] = np.flatnonzero(valid)
+    return lookup
+
+
+class UserRatings:
+    """Per-anime totals of the user scores in rating.csv
+
+    Ratings are read chunk by chunk and joined to catalog rows through an
+    integer lookup array indexed by anime_id, so memory is bounded by the
+    chunk size and the catalog, not by the millions of ratings. Each chunk is
+    reduced to per-anime score counts, sums and sums of squares with
+    bincount; -1 (watched but not rated) is counted apart and never enters
+    the scores. Per-genre and per-pair statistics are then aggregated from
+    the per-anime totals.
+    """
+
+    def __init__(self, n_rows: int):
+        self.counts = np.zeros(n_rows, dtype=np.int64)
+        self.sums = np.zeros(n_rows)
+        self.sumsq = np.zeros(n_rows)
+        self.unrated = np.zeros(n_rows, dtype=np.int64)
+        self.rows_read = 0
+        self.unknown_anime = 0
+        self.invalid_scores = 0
+
+    @classmethod
+    def from_csv(cls, file_path: str, anime_ids: np.ndarray,
+                 chunk_size: int = USER_RATING_CHUNK_ROWS) -> 'UserRatings':
+        """Accumulate rating.csv against a catalog given by its anime_id column"""
+        lookup = anime_lookup(anime_ids)
+        totals = cls(len(anime_ids))
+        for chunk in iter_user_ratings(file_path, chunk_size):
+            totals.add(lookup, chunk['anime_id'].to_numpy(), chunk['rating'].to_numpy())
+
+        logger.info(f"User ratings loaded: {totals.rows_read} rows, {int(totals.counts.sum())} scores, "
+                    f"{int(totals.unrated.sum())} unrated, {totals.unknown_anime} for anime not in the catalog, "
+                    f"{totals.invalid_scores} invalid")
+        return totals
+
+    def add(self, lookup: np.ndarray, anime_ids: np.ndarray, scores: np.ndarray):
+        """Add one chunk of (anime_id, score) rows"""
+        n_rows = len(self.counts)
+        in_range = (anime_ids >= 0) & (anime_ids < len(lookup))
+        rows = np.where(in_range, lookup[np.where(in_range, anime_ids, 0)], -1)
+
+        known = rows >= 0
+        rated = known & (scores >= MIN_SCORE) & (scores <= MAX_SCORE)
+        unrated = known & (scores == UNRATED)
+
+        rated_rows = rows[rated]
+        values = scores[rated].astype(np.float64)
+        self.counts += np.bincount(rated_rows, minlength=n_rows)
+        self.sums += np.bincount(rated_rows, weights=values, minlength=n_rows)
+        self.sumsq += np.bincount(rated_rows, weights=values * values, minlength=n_rows)
+        self.unrated += np.bincount(rows[unrated], minlength=n_rows)
+
+        self.rows_read += len(rows)
+        self.unknown_anime += int(len(rows) - known.sum())
+        self.invalid_scores += int(known.sum() - rated.sum() - unrated.sum())
+
+    def cooccurrence(self, genres: GenreLists) -> CooccurrenceStats:
+        """Genre x genre statistics of the user scores, each score one observation"""
+        return CooccurrenceStats.from_totals(genres, self.counts, self.sums, self.sumsq)
+
+    def unrated_cooccurrence(self, genres: GenreLists) -> np.ndarray:
+        """Genre x genre counts of watched-but-unrated entries"""
+        zeros = np.zeros(len(self.unrated))
+        return CooccurrenceStats.from_totals(genres, self.unrated, zeros, zeros).counts
+
+    def anime_table(self) -> pd.DataFrame:
+        """Per catalog row: mean user score, number of scores and number of unrated entries"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = self.sums / self.counts
+        return pd.DataFrame({'user_rating': means, 'rating_count': self.counts, 'unrated_count': self.unrated})